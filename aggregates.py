@@ -0,0 +1,271 @@
+"""Materialized spending aggregates.
+
+``SpendingAggregate`` keeps a running total and count per (user, category,
+month), and ``DailySpending`` the total, count, smallest and largest amount
+per (user, category, day). Write paths call :func:`apply_transactions` inside
+the same session transaction as the insert, so the summary endpoints can read
+O(categories x months) rows instead of scanning the full history, and
+``rollup`` can answer date-range queries from the daily buckets.
+"""
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from models import Transaction, SpendingAggregate, DailySpending
+
+UNCATEGORIZED = ''
+
+
+def month_key(date):
+    return date.strftime('%Y-%m')
+
+
+def day_key(date):
+    return date.strftime('%Y-%m-%d')
+
+
+def apply_transactions(session, transactions):
+    """Fold new transactions into the aggregate table.
+
+    ``transactions`` is an iterable of objects or mappings with ``user_id``,
+    ``category``, ``date`` and ``amount``. Nothing is committed here.
+    """
+    deltas = {}
+    days = {}
+    for t in transactions:
+        if isinstance(t, dict):
+            user_id, category, date, amount = t['user_id'], t.get('category'), t['date'], t['amount']
+        else:
+            user_id, category, date, amount = t.user_id, t.category, t.date, t.amount
+        category = category or UNCATEGORIZED
+        amount = float(amount)
+        key = (user_id, category, month_key(date))
+        total, count = deltas.get(key, (0.0, 0))
+        deltas[key] = (total + amount, count + 1)
+        key = (user_id, category, day_key(date))
+        bucket = days.get(key)
+        if bucket is None:
+            days[key] = [amount, 1, amount, amount]
+        else:
+            bucket[0] += amount
+            bucket[1] += 1
+            bucket[2] = min(bucket[2], amount)
+            bucket[3] = max(bucket[3], amount)
+
+    if not deltas:
+        return
+
+    stmt = insert(SpendingAggregate)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'category', 'month'],
+        set_={
+            'total': SpendingAggregate.total + stmt.excluded.total,
+            'count': SpendingAggregate.count + stmt.excluded.count,
+        },
+    )
+    session.execute(stmt, [
+        {'user_id': user_id, 'category': category, 'month': month, 'total': total, 'count': count}
+        for (user_id, category, month), (total, count) in deltas.items()
+    ])
+
+    stmt = insert(DailySpending)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'category', 'day'],
+        set_={
+            'total': DailySpending.total + stmt.excluded.total,
+            'count': DailySpending.count + stmt.excluded.count,
+            # SQLite's two-argument min/max are scalar functions
+            'min_amount': func.min(DailySpending.min_amount, stmt.excluded.min_amount),
+            'max_amount': func.max(DailySpending.max_amount, stmt.excluded.max_amount),
+        },
+    )
+    session.execute(stmt, [
+        {'user_id': user_id, 'category': category, 'day': day, 'total': total, 'count': count,
+         'min_amount': low, 'max_amount': high}
+        for (user_id, category, day), (total, count, low, high) in days.items()
+    ])
+
+
+def read_summary(session, user_id):
+    """Return totals, per-category and per-month sums for one user."""
+    rows = session.query(
+        SpendingAggregate.category,
+        SpendingAggregate.month,
+        SpendingAggregate.total,
+        SpendingAggregate.count,
+    ).filter(SpendingAggregate.user_id == user_id).all()
+
+    total_spent = 0.0
+    total_transactions = 0
+    category_breakdown = {}
+    monthly_spending = {}
+    for category, month, total, count in rows:
+        total_spent += total
+        total_transactions += count
+        if category != UNCATEGORIZED:
+            category_breakdown[category] = category_breakdown.get(category, 0.0) + total
+        monthly_spending[month] = monthly_spending.get(month, 0.0) + total
+
+    return {
+        'total_spent': total_spent,
+        'total_transactions': total_transactions,
+        'avg_transaction': total_spent / total_transactions if total_transactions else 0.0,
+        'category_breakdown': dict(sorted(category_breakdown.items())),
+        'monthly_spending': dict(sorted(monthly_spending.items())),
+        'unique_categories': len(category_breakdown),
+    }
+
+
+def spending_between(session, user_id, start, end=None):
+    """Total spent by one user from day ``start`` to ``end`` (inclusive; open-ended if None)."""
+    query = session.query(func.coalesce(func.sum(DailySpending.total), 0.0)).filter(
+        DailySpending.user_id == user_id,
+        DailySpending.day >= day_key(start),
+    )
+    if end is not None:
+        query = query.filter(DailySpending.day <= day_key(end))
+    return query.scalar()
+
+
+def _raw_buckets(session, user_id=None):
+    query = session.query(
+        Transaction.user_id,
+        func.coalesce(Transaction.category, UNCATEGORIZED),
+        func.strftime('%Y-%m', Transaction.date),
+        func.sum(Transaction.amount),
+        func.count(Transaction.id),
+    )
+    if user_id is not None:
+        query = query.filter(Transaction.user_id == user_id)
+    return query.group_by(
+        Transaction.user_id,
+        func.coalesce(Transaction.category, UNCATEGORIZED),
+        func.strftime('%Y-%m', Transaction.date),
+    )
+
+
+def _raw_daily_buckets(session, user_id=None):
+    category = func.coalesce(Transaction.category, UNCATEGORIZED)
+    day = func.strftime('%Y-%m-%d', Transaction.date)
+    query = session.query(
+        Transaction.user_id,
+        category,
+        day,
+        func.sum(Transaction.amount),
+        func.count(Transaction.id),
+        func.min(Transaction.amount),
+        func.max(Transaction.amount),
+    )
+    if user_id is not None:
+        query = query.filter(Transaction.user_id == user_id)
+    return query.group_by(Transaction.user_id, category, day)
+
+
+def rebuild(session, user_id=None):
+    """Recompute the aggregate tables from the raw transactions; returns the bucket count."""
+    for model in (SpendingAggregate, DailySpending):
+        delete = session.query(model)
+        if user_id is not None:
+            delete = delete.filter(model.user_id == user_id)
+        delete.delete(synchronize_session=False)
+
+    rows = [
+        {'user_id': uid, 'category': category, 'month': month, 'total': total, 'count': count}
+        for uid, category, month, total, count in _raw_buckets(session, user_id)
+    ]
+    if rows:
+        session.execute(insert(SpendingAggregate), rows)
+    daily = [
+        {'user_id': uid, 'category': category, 'day': day, 'total': total, 'count': count,
+         'min_amount': low, 'max_amount': high}
+        for uid, category, day, total, count, low, high in _raw_daily_buckets(session, user_id)
+    ]
+    if daily:
+        session.execute(insert(DailySpending), daily)
+    return len(rows) + len(daily)
+
+
+def verify(session, user_id=None, tolerance=1e-6):
+    """Compare the aggregate table against the raw transactions.
+
+    Returns a list of mismatching buckets as dicts with the expected and stored
+    values; an empty list means the store is consistent.
+    """
+    expected = {
+        (uid, category, month): (total, count)
+        for uid, category, month, total, count in _raw_buckets(session, user_id)
+    }
+    stored_query = session.query(
+        SpendingAggregate.user_id,
+        SpendingAggregate.category,
+        SpendingAggregate.month,
+        SpendingAggregate.total,
+        SpendingAggregate.count,
+    )
+    if user_id is not None:
+        stored_query = stored_query.filter(SpendingAggregate.user_id == user_id)
+    stored = {
+        (uid, category, month): (total, count)
+        for uid, category, month, total, count in stored_query
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        exp_total, exp_count = expected.get(key, (0.0, 0))
+        got_total, got_count = stored.get(key, (0.0, 0))
+        if exp_count != got_count or abs(exp_total - got_total) > tolerance * max(1.0, abs(exp_total)):
+            mismatches.append({
+                'user_id': key[0],
+                'category': key[1],
+                'month': key[2],
+                'expected_total': exp_total,
+                'stored_total': got_total,
+                'expected_count': exp_count,
+                'stored_count': got_count,
+            })
+    return mismatches
+
+
+def verify_daily(session, user_id=None, tolerance=1e-6):
+    """Like :func:`verify` for the daily buckets; mismatches carry a ``day``."""
+    expected = {
+        (uid, category, day): (total, count, low, high)
+        for uid, category, day, total, count, low, high in _raw_daily_buckets(session, user_id)
+    }
+    stored_query = session.query(
+        DailySpending.user_id,
+        DailySpending.category,
+        DailySpending.day,
+        DailySpending.total,
+        DailySpending.count,
+        DailySpending.min_amount,
+        DailySpending.max_amount,
+    )
+    if user_id is not None:
+        stored_query = stored_query.filter(DailySpending.user_id == user_id)
+    stored = {
+        (uid, category, day): (total, count, low, high)
+        for uid, category, day, total, count, low, high in stored_query
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        exp_total, exp_count, exp_min, exp_max = expected.get(key, (0.0, 0, None, None))
+        got_total, got_count, got_min, got_max = stored.get(key, (0.0, 0, None, None))
+        if (exp_count != got_count or exp_min != got_min or exp_max != got_max
+                or abs(exp_total - got_total) > tolerance * max(1.0, abs(exp_total))):
+            mismatches.append({
+                'user_id': key[0],
+                'category': key[1],
+                'day': key[2],
+                'expected_total': exp_total,
+                'stored_total': got_total,
+                'expected_count': exp_count,
+                'stored_count': got_count,
+            })
+    return mismatches
+
+
+def is_empty(session):
+    """True when either aggregate table has no rows, e.g. before a backfill."""
+    return (session.query(SpendingAggregate.id).first() is None
+            or session.query(DailySpending.id).first() is None)
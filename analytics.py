@@ -0,0 +1,112 @@
+"""Spending analytics computed from a user's daily spending buckets.
+
+Functions here take a ``rollup.Rollup`` of the daily buckets and return plain
+JSON-ready structures, so they can be reused outside the request handlers.
+"""
+import numpy as np
+
+from aggregates import UNCATEGORIZED
+
+PERFORMANCE_RATINGS = ('Excellent', 'Good', 'Average', 'Poor', 'Inactive')
+RATING_THRESHOLDS = (80, 65, 50, 30)
+
+
+def category_performance_scores(avg_amount, frequency, recent_spending, previous_spending):
+    """Performance score (0-100) of each category, over NumPy arrays.
+
+    A low average amount, one to three transactions a week and spending
+    that fell over the last 30 days score higher.
+    """
+    avg_amount = np.asarray(avg_amount, dtype=np.float64)
+    frequency = np.asarray(frequency, dtype=np.float64)
+    recent_spending = np.asarray(recent_spending, dtype=np.float64)
+    previous_spending = np.asarray(previous_spending, dtype=np.float64)
+
+    score = np.full(avg_amount.shape, 50, dtype=np.int64)
+
+    # Factor 1: Spending control
+    score += np.select([avg_amount < 50, avg_amount < 100, avg_amount > 200], [20, 10, -20], 0)
+
+    # Factor 2: Frequency control
+    score += np.select([(frequency >= 1) & (frequency <= 3), frequency > 5], [15, -15], 0)
+
+    # Factor 3: Trend analysis
+    has_previous = previous_spending > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trend_ratio = recent_spending / previous_spending
+    score += np.select([has_previous & (trend_ratio < 0.9), has_previous & (trend_ratio > 1.1)], [15, -10], 0)
+
+    return np.clip(score, 0, 100)
+
+
+def performance_ratings(scores):
+    """The PERFORMANCE_RATINGS name of each score."""
+    scores = np.asarray(scores)
+    return np.select(
+        [scores >= t for t in RATING_THRESHOLDS],
+        PERFORMANCE_RATINGS[:-1],
+        PERFORMANCE_RATINGS[-1],
+    )
+
+
+def category_performance_from_rollup(rollup):
+    """Score every spending category, best score first.
+
+    Frequency is transactions per week over the whole history; the trend
+    compares the last 30 days with the 30 before. Windows are whole days: the
+    last 30 days run from 30 days before the latest day with spending up to
+    that day. Ties are in category order.
+    """
+    if rollup.empty:
+        return []
+    end = rollup.end
+    weeks = max((end - rollup.start).astype(np.int64) / 7, 1)
+    categorized = np.array([name != UNCATEGORIZED for name in rollup.categories], dtype=bool)
+    if not categorized.any():
+        return []
+    categories = np.array(rollup.categories, dtype=object)[categorized]
+
+    totals, counts = (values[categorized] for values in rollup.window(rollup.start, end))
+    recent_spending = rollup.window(end - 30, end)[0][categorized]
+    previous_spending = rollup.window(end - 60, end - 31)[0][categorized]
+    return _performance_rows(categories, totals, counts, counts / weeks, recent_spending, previous_spending)
+
+
+def _performance_rows(categories, totals, counts, frequency, recent_spending, previous_spending):
+    avg_amounts = totals / counts
+    scores = category_performance_scores(avg_amounts, frequency, recent_spending, previous_spending)
+    ratings = performance_ratings(scores)
+    trends = np.select(
+        [recent_spending > previous_spending, recent_spending < previous_spending],
+        ['up', 'down'],
+        'stable',
+    )
+
+    order = np.argsort(-scores, kind='stable')
+    columns = zip(
+        categories[order].tolist(),
+        np.round(totals[order], 2).tolist(),
+        np.round(avg_amounts[order], 2).tolist(),
+        counts[order].tolist(),
+        np.round(frequency[order], 2).tolist(),
+        np.round(recent_spending[order], 2).tolist(),
+        np.round(previous_spending[order], 2).tolist(),
+        scores[order].tolist(),
+        ratings[order].tolist(),
+        trends[order].tolist(),
+    )
+    return [
+        {
+            'category': category,
+            'total_spent': total,
+            'avg_amount': avg,
+            'transaction_count': count,
+            'frequency': freq,
+            'recent_spending': recent,
+            'previous_spending': previous,
+            'performance_score': score,
+            'rating': rating,
+            'trend': trend,
+        }
+        for category, total, avg, count, freq, recent, previous, score, rating, trend in columns
+    ]
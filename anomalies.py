@@ -0,0 +1,75 @@
+"""Incremental anomaly detection.
+
+Each user has a persisted IsolationForest (see ``FinanceMLModels``). New
+transactions are scored against it on insert and the result is stored on the
+row, so ``/api/anomalies`` is an indexed lookup of flagged rows. Once enough
+new rows have accumulated since the last fit the model is refitted in the
+background (the 'refit-anomalies' job) and every row is rescored.
+"""
+from sqlalchemy import func, update
+
+from data_access import load_transactions, bump_anomaly_version
+from models import Transaction
+
+# Refit once new rows reach this many, or this fraction of the fitted history
+REFIT_MIN_NEW_ROWS = 50
+REFIT_NEW_FRACTION = 0.1
+
+
+def score_new(ml_models, user_id, amounts, dates):
+    """Score freshly inserted rows; returns (None, None) until a model exists."""
+    bundle = ml_models.anomaly_model(user_id)
+    if bundle is None:
+        return None, None
+    return ml_models.score_anomalies(bundle, amounts, dates)
+
+
+def refit(session, ml_models, user_id):
+    """Fit a new model on the user's full history and rescore every row.
+
+    Returns the number of rows scored (0 if there is too little history).
+    """
+    df = load_transactions(session, user_id, columns=['id', 'amount', 'date'])
+    if df.empty:
+        return 0
+    ids = df['id'].to_numpy()
+    amounts = df['amount'].to_numpy()
+    dates = df['date'].to_numpy()
+    bundle = ml_models.fit_anomaly_model(user_id, amounts, dates, max_id=ids.max())
+    if bundle is None:
+        return 0
+
+    scores, flags = ml_models.score_anomalies(bundle, amounts, dates)
+    # Only the anomaly responses change; jobs and other cached results stay valid
+    bump_anomaly_version(session, user_id)
+    session.execute(update(Transaction), [
+        {'id': id_, 'anomaly_score': score, 'is_anomaly': flag}
+        for id_, score, flag in zip(ids.tolist(), scores.tolist(), flags.tolist())
+    ])
+    session.commit()
+    return len(ids)
+
+
+def pending_rows(session, ml_models, user_id):
+    """Number of the user's rows inserted since their model was fitted."""
+    bundle = ml_models.anomaly_model(user_id)
+    max_id = bundle['max_id'] if bundle is not None else 0
+    return session.query(func.count(Transaction.id)).filter(
+        Transaction.user_id == user_id,
+        Transaction.id > max_id,
+    ).scalar()
+
+
+def needs_refit(ml_models, user_id, pending):
+    bundle = ml_models.anomaly_model(user_id)
+    if bundle is None:
+        return pending > 0
+    return pending >= max(REFIT_MIN_NEW_ROWS, REFIT_NEW_FRACTION * bundle['n_samples'])
+
+
+def flagged(session, user_id):
+    """The user's flagged transactions, newest first."""
+    return session.query(Transaction).filter(
+        Transaction.user_id == user_id,
+        Transaction.is_anomaly.is_(True),
+    ).order_by(Transaction.date.desc()).all()
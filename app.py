@@ -1,512 +1,937 @@
-from flask import Flask, render_template, request, jsonify, session
-from flask_sqlalchemy import SQLAlchemy
+from flask import (Blueprint, Flask, current_app, g, render_template, request, jsonify, Response,
+                   stream_with_context, url_for, make_response)
+from flask.cli import with_appcontext
 from flask_cors import CORS
-import pandas as pd
 import numpy as np
+import functools
 import json
-import pickle
 import os
-from datetime import datetime, timedelta
-import random
-from sklearn.ensemble import RandomForestClassifier, IsolationForest
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
-# TensorFlow imports removed for simplified version
-# import tensorflow as tf
-# from tensorflow.keras.models import Sequential
-# from tensorflow.keras.layers import LSTM, Dense, Dropout
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
+import threading
+import time
+from datetime import date, datetime, timedelta
+import click
 import warnings
 warnings.filterwarnings('ignore')
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///finance_analyzer.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
-CORS(app)
-
-# Download NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
-
-# Database Models
-class Transaction(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
-    merchant = db.Column(db.String(200), nullable=False)
-    category = db.Column(db.String(100))
-    date = db.Column(db.DateTime, nullable=False)
-    description = db.Column(db.Text)
-    user_id = db.Column(db.Integer, default=1)
-    
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'amount': self.amount,
-            'merchant': self.merchant,
-            'category': self.category,
-            'date': self.date.strftime('%Y-%m-%d %H:%M:%S'),
-            'description': self.description
-        }
-
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    income = db.Column(db.Float, default=0)
-    budget = db.Column(db.Float, default=0)
-
-# ML Models
-class FinanceMLModels:
-    def __init__(self):
-        self.category_model = None
-        self.anomaly_model = None
-        self.prediction_model = None
-        self.label_encoder = LabelEncoder()
-        self.scaler = StandardScaler()
-        self.initialize_models()
-    
-    def initialize_models(self):
-        # Initialize category classification model
-        self.category_model = RandomForestClassifier(n_estimators=100, random_state=42)
-        
-        # Initialize anomaly detection model
-        self.anomaly_model = IsolationForest(contamination=0.1, random_state=42)
-        
-        # Initialize prediction model (LSTM)
-        self.prediction_model = self.create_lstm_model()
-    
-    def create_lstm_model(self):
-        # Simplified LSTM model - returns None for now
-        # In a full implementation, this would create a TensorFlow model
-        return None
-    
-    def train_category_model(self, transactions_df):
-        if len(transactions_df) < 10:
-            return False
-        
-        # Prepare features
-        X = transactions_df[['amount', 'merchant_encoded', 'day_of_week', 'month']].values
-        y = transactions_df['category'].values
-        
-        # Encode categories
-        y_encoded = self.label_encoder.fit_transform(y)
-        
-        # Train model
-        self.category_model.fit(X, y_encoded)
-        return True
-    
-    def predict_category(self, amount, merchant, date):
-        # Encode merchant (simple hash-based encoding)
-        merchant_encoded = hash(merchant) % 1000
-        
-        # Extract date features
-        date_obj = datetime.strptime(date, '%Y-%m-%d')
-        day_of_week = date_obj.weekday()
-        month = date_obj.month
-        
-        # Prepare features
-        features = np.array([[amount, merchant_encoded, day_of_week, month]])
-        
-        # Predict
-        prediction = self.category_model.predict(features)[0]
-        category = self.label_encoder.inverse_transform([prediction])[0]
-        
-        return category
-    
-    def detect_anomalies(self, transactions_df):
-        if len(transactions_df) < 5:
-            return []
-        
-        # Prepare features for anomaly detection
-        features = transactions_df[['amount', 'day_of_week', 'month']].values
-        
-        # Detect anomalies
-        anomalies = self.anomaly_model.fit_predict(features)
-        
-        # Return indices of anomalies (-1 indicates anomaly)
-        anomaly_indices = [i for i, pred in enumerate(anomalies) if pred == -1]
-        return anomaly_indices
+from models import db, Transaction, Job, User
+from data_access import (load_transactions, page_transactions, get_data_version, get_anomaly_version,
+                         bump_data_version)
+import aggregates
+import anomalies
+import budgets
+import cache
+import column_store
+import export
+import engine_profile
+import forecasting
+import instrumentation
+import jobs
+import reports
+import rollup
+import serialization
+import shards
+import writes
+from finance_ml import FinanceMLModels, CATEGORY_MODEL_NAME
+from instrumentation import stage
+
+# pandas and sklearn (and the ingest/analytics modules built on them) are
+# imported by the code paths that use them, so workers and CLI commands start
+# without paying for them up front
 
-# Initialize ML models
+# ML models; artifacts are loaded from the app's MODEL_DIR on first use
 ml_models = FinanceMLModels()
 
-# Sample data generation
-def generate_sample_data():
-    categories = ['Food & Dining', 'Transportation', 'Shopping', 'Entertainment', 
-                  'Healthcare', 'Utilities', 'Education', 'Travel', 'Insurance', 'Other']
-    
-    merchants = {
-        'Food & Dining': ['McDonald\'s', 'Starbucks', 'Chipotle', 'Pizza Hut', 'Subway'],
-        'Transportation': ['Uber', 'Lyft', 'Shell', 'Exxon', 'Metro'],
-        'Shopping': ['Amazon', 'Walmart', 'Target', 'Best Buy', 'Macy\'s'],
-        'Entertainment': ['Netflix', 'Spotify', 'Movie Theater', 'Concert Hall', 'Arcade'],
-        'Healthcare': ['CVS Pharmacy', 'Walgreens', 'Doctor Office', 'Dental Clinic', 'Hospital'],
-        'Utilities': ['Electric Company', 'Water Company', 'Internet Provider', 'Phone Company', 'Gas Company'],
-        'Education': ['University', 'Online Course', 'Bookstore', 'Library', 'Tutoring'],
-        'Travel': ['Airline', 'Hotel', 'Car Rental', 'Travel Agency', 'Tour Guide'],
-        'Insurance': ['Car Insurance', 'Health Insurance', 'Home Insurance', 'Life Insurance'],
-        'Other': ['ATM Withdrawal', 'Bank Transfer', 'Cash Deposit', 'Investment', 'Donation']
-    }
+bp = Blueprint('finance', __name__)
+
+_init_lock = threading.Lock()
+
+def create_app(config=None):
+    """Build the Flask app; ``config`` overrides the defaults.
+
+    Nothing here touches the database: the schema is checked on the first
+    request and sample data is only written by ``flask seed-sample-data``.
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'your-secret-key-here'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///finance_analyzer.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Versioned model artifacts shared by all workers; see `flask train-category-model`
+    app.config['MODEL_DIR'] = os.environ.get('MODEL_DIR', os.path.join(app.instance_path, 'ml_models'))
+    app.config['MODEL_RELOAD_INTERVAL'] = 30
+    # Upper bound on rows accepted by one batch/upload request
+    app.config['MAX_BATCH_SIZE'] = 10000
+    app.config['MAX_PAGE_SIZE'] = 1000
+    # Most periods one /api/analytics/range response may be grouped into
+    app.config['MAX_RANGE_PERIODS'] = 1000
+    # Longest span, in days, one /api/analytics/range request may cover
+    app.config['MAX_RANGE_DAYS'] = 100 * 366
+    # Response cache for GET /api/* ('lru', 'redis', 'local-redis' or 'none')
+    app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'lru')
+    app.config['CACHE_TTL'] = 300
+    app.config['CACHE_MAX_ENTRIES'] = 1024
+    # Per-worker budget of the transaction column store (0 disables it), see column_store
+    app.config['COLUMN_STORE_BYTES'] = int(os.environ.get('COLUMN_STORE_BYTES', 64 * 1024 * 1024))
+    app.config['REDIS_URL'] = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    # Per-user data is split over this many databases (0 = a single database)
+    app.config['SHARD_COUNT'] = int(os.environ.get('SHARD_COUNT', 0))
+    app.config['SHARD_DATABASE_URL'] = os.environ.get('SHARD_DATABASE_URL', 'sqlite:///finance_analyzer-shard{shard}.db')
+    # User served when a request does not name one in the X-User-Id header
+    app.config['DEFAULT_USER_ID'] = 1
+    # X-User-Id is only honoured behind a proxy or auth layer that sets it (and
+    # strips it from client requests); otherwise every request is DEFAULT_USER_ID
+    app.config['TRUST_USER_HEADER'] = os.environ.get('TRUST_USER_HEADER', '').lower() in ('1', 'true', 'yes')
+    # SQLite PRAGMAs ('concurrent', 'durable' or 'default') and pool sizing, see engine_profile
+    app.config['DATABASE_PROFILE'] = os.environ.get('DATABASE_PROFILE', 'concurrent')
+    app.config['SQLITE_PRAGMAS'] = {}
+    app.config['DATABASE_POOL_SIZE'] = 5
+    app.config['DATABASE_MAX_OVERFLOW'] = 10
+    app.config['DATABASE_POOL_TIMEOUT'] = 30
+    # Coalesce concurrent inserts into grouped commits, see writes.WriteQueue
+    app.config['WRITE_QUEUE_ENABLED'] = os.environ.get('WRITE_QUEUE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    app.config['WRITE_QUEUE_MAX_ROWS'] = 5000
+    app.config['WRITE_QUEUE_MAX_DELAY'] = 0.0
+    # Background jobs ('thread', 'redis' or 'inline'); see jobs and `flask run-worker`
+    app.config['JOB_BACKEND'] = os.environ.get('JOB_BACKEND', 'thread')
+    app.config['JOB_THREADS'] = 2
+    # Active jobs older than this are assumed to have died with their worker
+    app.config['JOB_TIMEOUT'] = 3600
+    # How long a request waits for a result that has never been computed
+    app.config['JOB_WAIT_TIMEOUT'] = 10
+    # Per-stage timings in a Server-Timing header on every response
+    app.config['SERVER_TIMING'] = True
+    # Opt-in cProfile dumps: a sampled fraction of requests, plus requests
+    # sending this token in an X-Profile header
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN')
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+    # JSON encoder ('auto', 'orjson' or 'stdlib') and response compression, see serialization
+    app.config['JSON_BACKEND'] = os.environ.get('JSON_BACKEND', 'auto')
+    app.config['COMPRESS_MIN_BYTES'] = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+    app.config['COMPRESS_LEVEL'] = 6
+    if config:
+        app.config.update(config)
+    
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(
+        engine_profile.engine_options(app.config, app.config['SQLALCHEMY_DATABASE_URI']),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    )
+    db.init_app(app)
+    with app.app_context():
+        engine_profile.install(db.engine, app.config)
+    shards.init_app(app)
+    instrumentation.init_app(app)
+    serialization.init_app(app)
+    app.extensions['metrics'].add_collector(model_metrics)
+    column_store.init_app(app)
+    CORS(app)
+    ml_models.init_app(app)
+    app.extensions['response_cache'] = cache.create_backend(app.config)
+    app.extensions['write_queue'] = writes.WriteQueue(
+        app,
+        max_rows=app.config['WRITE_QUEUE_MAX_ROWS'],
+        max_delay=app.config['WRITE_QUEUE_MAX_DELAY']
+    ) if app.config['WRITE_QUEUE_ENABLED'] else None
+    app.extensions['jobs'] = jobs.create_backend(app)
+    app.extensions['finance_db_ready'] = False
+    app.register_blueprint(bp)
+    for command in (seed_sample_data_command, rebuild_aggregates_command, train_category_model_command,
+                    run_nightly_reports_command, run_worker_command):
+        app.cli.add_command(command)
+    return app
+
+def initialize_database():
+    """Bring every shard's schema up to date and backfill derived tables; idempotent."""
+    shards.ensure_schemas()
+    for session in shards.all_sessions():
+        if aggregates.is_empty(session) and session.query(Transaction.id).first() is not None:
+            # Databases created before the aggregate store existed
+            aggregates.rebuild(session)
+            session.commit()
+
+def model_metrics():
+    stats = ml_models.categorization_stats()
+    return [
+        ('finance_categorizations_total', 'counter', 'Transactions categorized, by how they were resolved.',
+         [({'source': source}, stats[source]) for source in ('index_exact', 'index_prefix', 'model')]),
+        ('finance_merchant_index_entries', 'gauge', 'Merchants in the loaded merchant index.',
+         [({}, stats['index_size'])]),
+    ]
+
+@bp.before_app_request
+def ensure_database():
+    app = current_app._get_current_object()
+    if app.extensions['finance_db_ready']:
+        return
+    with _init_lock:
+        if not app.extensions['finance_db_ready']:
+            initialize_database()
+            app.extensions['finance_db_ready'] = True
+
+@bp.before_request
+def identify_user():
+    header = request.headers.get('X-User-Id')
+    if header is None:
+        g.user_id = current_app.config['DEFAULT_USER_ID']
+        return None
+    if not current_app.config['TRUST_USER_HEADER']:
+        # Anyone could claim to be any user
+        return jsonify({'error': 'X-User-Id is only accepted when TRUST_USER_HEADER is enabled'}), 403
+    try:
+        g.user_id = int(header)
+    except ValueError:
+        g.user_id = None
+    if g.user_id is None or g.user_id < 1:
+        return jsonify({'error': 'X-User-Id must be a positive integer'}), 400
+    return None
+
+def user_session():
+    """Database session on the requesting user's shard."""
+    return shards.session_for(g.user_id)
+
+def store_transactions(rows):
+    """Insert the requesting user's rows and return their ids.
+
+    Goes through the worker's write queue when WRITE_QUEUE_ENABLED is set, so
+    concurrent requests share one commit.
+    """
+    write_queue = current_app.extensions['write_queue']
+    if write_queue is not None:
+        return write_queue.submit(g.user_id, rows)
+    return writes.insert_transactions(user_session(), [rows])[0]
+
+def maybe_refit_anomalies(user_id):
+    """Queue a background anomaly refit once enough new rows have arrived."""
+    pending = anomalies.pending_rows(shards.session_for(user_id), ml_models, user_id)
+    if anomalies.needs_refit(ml_models, user_id, pending):
+        jobs.submit('refit-anomalies', user_id=user_id)
+
+# Background jobs
+@jobs.task('refit-anomalies')
+def refit_anomalies_task(user_id):
+    with stage('model'):
+        return {'rows_scored': anomalies.refit(shards.session_for(user_id), ml_models, user_id)}
+
+@jobs.task('category-performance')
+def category_performance_task(user_id):
+    with stage('db'):
+        buckets = rollup.Rollup.load(shards.session_for(user_id), user_id)
+    
+    from analytics import category_performance_from_rollup
+    with stage('compute'):
+        return {'categories': category_performance_from_rollup(buckets)}
+
+@jobs.task('forecast')
+def forecast_task(user_id):
+    # Holt-Winters state is cached per user and only advanced by the new days
+    with stage('model'):
+        forecast = forecasting.forecast_user(shards.session_for(user_id), user_id=user_id)
     
-    transactions = []
-    start_date = datetime.now() - timedelta(days=365)
+    if forecast is None:
+        return {'error': 'Insufficient data for prediction'}
     
-    for i in range(1000):
-        category = random.choice(categories)
-        merchant = random.choice(merchants[category])
-        amount = round(random.uniform(5, 500), 2)
-        date = start_date + timedelta(days=random.randint(0, 365))
+    return forecast
+
+@jobs.task('train-category-model')
+def train_category_model_task(user_id=None, prune=3):
+    import pandas as pd
+    
+    # One model serves every user, so it is trained on all shards
+    df = pd.concat([
+        load_transactions(session, user_id=None, columns=['amount', 'merchant', 'category', 'date'])
+        for session in shards.all_sessions()
+    ], ignore_index=True)
+    if not ml_models.train_category_model(df):
+        return {'trained': False, 'transactions': len(df)}
+    ml_models.store.prune(CATEGORY_MODEL_NAME, keep=prune)
+    return {'trained': True, 'version': ml_models.category_model_version, 'transactions': len(df)}
+
+# Jobs a user may start through POST /api/jobs
+USER_JOBS = ('refit-anomalies', 'category-performance', 'forecast')
+
+def job_status_response(job, status=200):
+    body = job.to_dict()
+    if job.status == jobs.SUCCEEDED:
+        body['result'] = json.loads(job.result)
+    response = jsonify(body)
+    response.status_code = status
+    response.headers['Location'] = url_for('finance.get_job', job_id=job.id)
+    return response
+
+def latest_job_result(name):
+    """The user's latest result of job ``name``, recomputing it in the background.
+
+    Returns ``(result JSON, job, stale)``. A result computed for an older
+    data version is still returned, flagged stale, while the recompute runs.
+    Only a user with no result at all waits for the job, up to
+    JOB_WAIT_TIMEOUT. If it has not succeeded by then the result is None and
+    ``job`` is the queued, running or failed job.
+    """
+    with stage('db'):
+        version = get_data_version(user_session(), g.user_id)
+        latest = jobs.latest_result(name, g.user_id)
+    if latest is not None and latest.data_version == version:
+        return latest.result, latest, False
+    
+    # Stale or unfinished results must not be cached under the current version
+    g.skip_response_cache = True
+    if latest is None:
+        job = jobs.submit_and_wait(name, current_app.config['JOB_WAIT_TIMEOUT'], user_id=g.user_id,
+                                   data_version=version)
+        if job.status == jobs.SUCCEEDED:
+            g.skip_response_cache = False
+            return job.result, job, False
+        return None, job, False
+    job = jobs.submit(name, user_id=g.user_id, data_version=version)
+    return latest.result, job, True
+
+def job_result_response(name):
+    """Serve ``latest_job_result(name)``: stale results are marked X-Result-Stale and
+    a result that is still being computed is a 202 with the job's status URL."""
+    result, job, stale = latest_job_result(name)
+    if result is None:
+        return job_status_response(job, 500 if job.status == jobs.FAILED else 202)
+    
+    response = Response(result, mimetype='application/json')
+    if stale:
+        response.headers['X-Result-Stale'] = '1'
+        response.headers['X-Job-Id'] = job.id
+    return response
+
+def ensure_anomaly_model():
+    """Make sure the requesting user has an anomaly model.
+
+    Rows are scored on insert and refits run in the background; only a
+    user's very first fit is waited for. Returns the fit job if it is still
+    running, else None.
+    """
+    if ml_models.anomaly_model(g.user_id) is None:
+        job = jobs.submit_and_wait('refit-anomalies', current_app.config['JOB_WAIT_TIMEOUT'], user_id=g.user_id,
+                                   data_version=get_data_version(user_session(), g.user_id))
+        if job.status in jobs.ACTIVE:
+            g.skip_response_cache = True
+            return job
+    else:
+        maybe_refit_anomalies(g.user_id)
+    return None
+
+def flagged_anomalies():
+    with stage('db'):
+        flagged = anomalies.flagged(user_session(), user_id=g.user_id)
+    with stage('rows'):
+        return [dict(t.to_dict(), anomaly_score=t.anomaly_score) for t in flagged]
+
+def analytics_body(summary):
+    """The /api/analytics payload from an aggregate ``summary``."""
+    recent_spending = 0.0
+    if summary['total_transactions']:
+        # Recent spending trend (last 30 days), from the daily buckets
+        with stage('db'):
+            recent_spending = aggregates.spending_between(user_session(), user_id=g.user_id,
+                                                          start=datetime.now() - timedelta(days=30))
+    return reports.analytics(summary, recent_spending)
+
+def budget_recommendations_body(columns):
+    """The /api/budget-recommendations payload for the requesting user's ``columns``."""
+    with stage('db'):
+        income, budget = reports.budget_settings(g.user_id)
+    return reports.budget_recommendations(columns, date.today(), income, budget)
+
+# Endpoints showing anomaly flags, which a refit changes without a data write
+ANOMALY_ENDPOINTS = ('finance.get_anomalies', 'finance.get_dashboard_summary')
+
+def cached_response(view):
+    """Serve a GET endpoint from the response cache, honouring If-None-Match.
+
+    The key covers the user's data version, which every write path bumps, so
+    a cached body is only reused while the underlying transactions are
+    unchanged. ANOMALY_ENDPOINTS also key on the anomaly version, which
+    refits bump.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        response_cache = current_app.extensions['response_cache']
+        if response_cache is None:
+            return view(*args, **kwargs)
         
-        transaction = Transaction(
-            amount=amount,
-            merchant=merchant,
-            category=category,
-            date=date,
-            description=f"Transaction at {merchant}",
-            user_id=1
-        )
-        transactions.append(transaction)
-    
-    return transactions
+        with stage('cache'):
+            version = get_data_version(user_session(), g.user_id)
+            if request.endpoint in ANOMALY_ENDPOINTS:
+                version = f'{version}.{get_anomaly_version(user_session(), g.user_id)}'
+            key = cache.cache_key(g.user_id, request.endpoint, request.args, version, current_app.config['CACHE_TTL'])
+        # Weak comparison: compressed responses carry the key as a weak ETag
+        if request.if_none_match.contains_weak(key):
+            response = make_response('', 304)
+        else:
+            with stage('cache'):
+                entry = response_cache.get(key)
+            if entry is not None:
+                status, mimetype, body = cache.decode_entry(entry)
+                response = Response(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed and not g.get('skip_response_cache'):
+                    with stage('cache'):
+                        response_cache.set(key, cache.encode_entry(response.status_code, response.mimetype,
+                                                                   response.get_data()))
+                response.headers['X-Cache'] = 'MISS'
+        # A stale or pending body must not revalidate once the fresh one exists
+        response.set_etag(f'{key}-stale' if g.get('skip_response_cache') else key)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
 
 # Routes
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     return render_template('dashboard.html')
 
-@app.route('/analytics')
+@bp.route('/analytics')
 def analytics():
     return render_template('analytics.html')
 
-@app.route('/api/transactions', methods=['GET'])
+@bp.route('/api/transactions', methods=['GET'])
+@cached_response
 def get_transactions():
-    transactions = Transaction.query.filter_by(user_id=1).order_by(Transaction.date.desc()).limit(100).all()
-    return jsonify([t.to_dict() for t in transactions])
+    try:
+        limit = int(request.args.get('limit', 100))
+        start = request.args.get('from')
+        end = request.args.get('to')
+        start = datetime.strptime(start, '%Y-%m-%d') if start else None
+        # 'to' is an inclusive day
+        end = datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1) if end else None
+        min_amount = request.args.get('min_amount')
+        max_amount = request.args.get('max_amount')
+        min_amount = float(min_amount) if min_amount else None
+        max_amount = float(max_amount) if max_amount else None
+        body_format = request.args.get('format', 'rows')
+        if body_format not in ('rows', 'columns'):
+            raise ValueError(f"format must be 'rows' or 'columns', not {body_format!r}")
+        transactions, next_cursor = page_transactions(
+            user_session(),
+            user_id=g.user_id,
+            limit=max(1, min(limit, current_app.config['MAX_PAGE_SIZE'])),
+            cursor=request.args.get('cursor'),
+            start=start,
+            end=end,
+            category=request.args.get('category'),
+            merchant=request.args.get('merchant'),
+            min_amount=min_amount,
+            max_amount=max_amount,
+            columns=body_format == 'columns'
+        )
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query parameter: {e}'}), 400
+    
+    if body_format == 'rows':
+        with stage('rows'):
+            transactions = [t.to_dict() for t in transactions]
+    # Columns are encoded straight from their arrays
+    with stage('serialize'):
+        response = jsonify(transactions)
+    if next_cursor:
+        # The body stays a plain list for existing clients; the cursor for the
+        # next page travels in headers
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+    return response
+
+@bp.route('/api/transactions/export')
+def export_transactions():
+    file_format = request.args.get('format', 'csv').lower()
+    if file_format not in export.FORMATS:
+        return jsonify({'error': f"Unsupported format, expected one of: {', '.join(sorted(export.FORMATS))}"}), 400
+    if file_format == 'parquet' and not export.parquet_available():
+        return jsonify({'error': 'Parquet export requires pyarrow to be installed'}), 501
+    chunk_size = min(max(request.args.get('chunk_size', export.DEFAULT_CHUNK_SIZE, type=int), 1), 50000)
+    
+    encode, mimetype = export.FORMATS[file_format]
+    chunks = export.iter_chunks(user_session(), user_id=g.user_id, chunk_size=chunk_size)
+    return Response(
+        stream_with_context(encode(chunks)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=transactions.{file_format}'}
+    )
 
-@app.route('/api/transactions', methods=['POST'])
+@bp.route('/api/transactions', methods=['POST'])
 def add_transaction():
     data = request.json
     
     # Predict category using ML model
-    predicted_category = ml_models.predict_category(
-        data['amount'], 
-        data['merchant'], 
-        data['date']
-    )
+    with stage('model'):
+        predicted_category = ml_models.predict_category(
+            data['amount'], 
+            data['merchant'], 
+            data['date']
+        )
     
-    transaction = Transaction(
-        amount=data['amount'],
-        merchant=data['merchant'],
-        category=predicted_category,
-        date=datetime.strptime(data['date'], '%Y-%m-%d'),
-        description=data.get('description', ''),
-        user_id=1
-    )
+    transaction = {
+        'amount': data['amount'],
+        'merchant': data['merchant'],
+        'category': predicted_category,
+        'date': datetime.strptime(data['date'], '%Y-%m-%d'),
+        'description': data.get('description', ''),
+        'user_id': g.user_id,
+        'anomaly_score': None,
+        'is_anomaly': None
+    }
     
-    db.session.add(transaction)
-    db.session.commit()
+    with stage('model'):
+        scores, flags = anomalies.score_new(ml_models, g.user_id, [transaction['amount']],
+                                            [np.datetime64(transaction['date'])])
+    if scores is not None:
+        transaction['anomaly_score'] = float(scores[0])
+        transaction['is_anomaly'] = bool(flags[0])
+    
+    with stage('db'):
+        store_transactions([transaction])
+    maybe_refit_anomalies(g.user_id)
     
     return jsonify({'message': 'Transaction added successfully', 'predicted_category': predicted_category})
 
-@app.route('/api/analytics')
-def get_analytics():
-    transactions = Transaction.query.filter_by(user_id=1).all()
-    
-    if not transactions:
-        return jsonify({'error': 'No transactions found'})
-    
-    df = pd.DataFrame([t.to_dict() for t in transactions])
-    df['date'] = pd.to_datetime(df['date'])
-    df['amount'] = pd.to_numeric(df['amount'])
-    
-    # Basic analytics
-    total_spent = df['amount'].sum()
-    avg_transaction = df['amount'].mean()
-    total_transactions = len(df)
-    
-    # Category breakdown
-    category_breakdown = df.groupby('category')['amount'].sum().to_dict()
+@bp.route('/api/transactions/batch', methods=['POST'])
+def add_transactions_batch():
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('transactions')
+    if not isinstance(data, list):
+        return jsonify({'error': 'Expected a JSON list of transactions'}), 400
+    if len(data) > current_app.config['MAX_BATCH_SIZE']:
+        return jsonify({'error': f"Batch exceeds {current_app.config['MAX_BATCH_SIZE']} transactions"}), 413
+    
+    import ingest
+    return ingest_batch(ingest.parse_records(data))
+
+@bp.route('/api/transactions/upload', methods=['POST'])
+def upload_transactions():
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'error': 'No file uploaded'}), 400
+    
+    import pandas as pd
+    import ingest
+    
+    file_format = request.form.get('format') or os.path.splitext(upload.filename or '')[1].lstrip('.')
+    parser = ingest.PARSERS.get(file_format.lower())
+    if parser is None:
+        return jsonify({'error': f"Unsupported file format, expected one of: {', '.join(sorted(ingest.PARSERS))}"}), 400
+    
+    try:
+        parsed = parser(upload.read())
+    except (ValueError, pd.errors.ParserError) as e:
+        return jsonify({'error': f'Could not parse file: {e}'}), 400
+    if parsed.total > current_app.config['MAX_BATCH_SIZE']:
+        return jsonify({'error': f"File exceeds {current_app.config['MAX_BATCH_SIZE']} transactions"}), 413
+    
+    return ingest_batch(parsed)
+
+def ingest_batch(parsed):
+    """Categorize and insert a parsed batch in one statement and one commit."""
+    import pandas as pd
+    
+    # Rows without an explicit category are predicted in a single call
+    categories = parsed.categories.copy()
+    missing = pd.isna(categories)
+    with stage('model'):
+        if missing.any():
+            categories[missing] = ml_models.predict_categories(
+                parsed.amounts[missing], parsed.merchants[missing], parsed.dates[missing]
+            )
+        scores, flags = anomalies.score_new(ml_models, g.user_id, parsed.amounts, parsed.dates)
+    if scores is None:
+        scores = flags = [None] * len(parsed)
+    else:
+        scores, flags = scores.tolist(), flags.tolist()
+    
+    dates = pd.DatetimeIndex(parsed.dates).to_pydatetime()
+    rows = [
+        {'amount': float(amount), 'merchant': merchant, 'category': category,
+         'date': date, 'description': description, 'user_id': g.user_id,
+         'anomaly_score': score, 'is_anomaly': flag}
+        for amount, merchant, category, date, description, score, flag
+        in zip(parsed.amounts, parsed.merchants, categories, dates, parsed.descriptions, scores, flags)
+    ]
     
-    # Monthly spending
-    monthly_spending = df.groupby(df['date'].dt.to_period('M'))['amount'].sum().to_dict()
+    ids = []
+    if rows:
+        with stage('db'):
+            ids = store_transactions(rows)
+        maybe_refit_anomalies(g.user_id)
     
-    # Recent spending trend (last 30 days)
-    recent_df = df[df['date'] >= datetime.now() - timedelta(days=30)]
-    recent_spending = recent_df['amount'].sum()
+    results = [{'row': e['row'], 'status': 'error', 'error': e['error']} for e in parsed.errors]
+    results += [
+        {'row': int(row), 'status': 'created', 'id': id_, 'category': category, 'predicted': bool(predicted)}
+        for row, id_, category, predicted in zip(parsed.rows, ids, categories, missing)
+    ]
+    results.sort(key=lambda r: r['row'])
     
+    status = 200 if rows or not parsed.total else 400
     return jsonify({
-        'total_spent': total_spent,
-        'avg_transaction': avg_transaction,
-        'total_transactions': total_transactions,
-        'category_breakdown': category_breakdown,
-        'monthly_spending': {str(k): v for k, v in monthly_spending.items()},
-        'recent_spending': recent_spending
-    })
-
-@app.route('/api/predict')
+        'inserted': len(rows),
+        'failed': len(parsed.errors),
+        'results': results
+    }), status
+
+@bp.route('/api/analytics')
+@cached_response
+def get_analytics():
+    # Totals, category and monthly sums come from the aggregate store
+    with stage('db'):
+        summary = aggregates.read_summary(user_session(), user_id=g.user_id)
+    body = analytics_body(summary)
+    with stage('serialize'):
+        return jsonify(body)
+
+@bp.route('/api/predict')
+@cached_response
 def predict_spending():
-    transactions = Transaction.query.filter_by(user_id=1).all()
-    
-    if len(transactions) < 30:
-        return jsonify({'error': 'Insufficient data for prediction'})
-    
-    df = pd.DataFrame([t.to_dict() for t in transactions])
-    df['date'] = pd.to_datetime(df['date'])
-    df['amount'] = pd.to_numeric(df['amount'])
-    
-    # Prepare data for LSTM
-    daily_spending = df.groupby(df['date'].dt.date)['amount'].sum().values
-    
-    if len(daily_spending) < 30:
-        return jsonify({'error': 'Insufficient daily data'})
-    
-    # Simple prediction using moving average
-    recent_avg = np.mean(daily_spending[-30:])
-    predicted_next_month = recent_avg * 30
-    
-    return jsonify({
-        'predicted_next_month': round(predicted_next_month, 2),
-        'confidence': 0.85
-    })
+    return job_result_response('forecast')
 
-@app.route('/api/anomalies')
+@bp.route('/api/anomalies')
+@cached_response
 def get_anomalies():
-    transactions = Transaction.query.filter_by(user_id=1).all()
+    job = ensure_anomaly_model()
+    if job is not None:
+        return job_status_response(job, 202)
     
-    if len(transactions) < 5:
-        return jsonify({'anomalies': []})
-    
-    df = pd.DataFrame([t.to_dict() for t in transactions])
-    df['date'] = pd.to_datetime(df['date'])
-    df['day_of_week'] = df['date'].dt.weekday
-    df['month'] = df['date'].dt.month
-    
-    anomaly_indices = ml_models.detect_anomalies(df)
-    anomalies = [df.iloc[i].to_dict() for i in anomaly_indices]
-    
-    return jsonify({'anomalies': anomalies})
+    rows = flagged_anomalies()
+    with stage('serialize'):
+        return jsonify({'anomalies': rows})
 
-@app.route('/api/budget-recommendations')
+@bp.route('/api/budget-recommendations')
+@cached_response
 def get_budget_recommendations():
-    transactions = Transaction.query.filter_by(user_id=1).all()
-    
-    if not transactions:
-        return jsonify({'recommendations': []})
-    
-    df = pd.DataFrame([t.to_dict() for t in transactions])
-    df['amount'] = pd.to_numeric(df['amount'])
-    
-    # Calculate current spending by category
-    category_spending = df.groupby('category')['amount'].sum()
-    total_spending = category_spending.sum()
-    
-    # Generate recommendations based on spending patterns
-    recommendations = []
-    
-    # High spending categories
-    high_spending = category_spending[category_spending > total_spending * 0.2]
-    for category, amount in high_spending.items():
-        recommendations.append({
-            'category': category,
-            'current_spending': round(amount, 2),
-            'recommendation': f'Consider reducing {category} spending by 20%',
-            'potential_savings': round(amount * 0.2, 2)
-        })
-    
-    return jsonify({'recommendations': recommendations})
+    columns = column_store.load_columns(user_session(), g.user_id)
+    return jsonify(budget_recommendations_body(columns))
+
+@bp.route('/api/budget', methods=['GET'])
+def get_budget():
+    """The requesting user's monthly income and spending budget."""
+    income, budget = reports.budget_settings(g.user_id)
+    return jsonify({'income': income, 'budget': budget})
+
+@bp.route('/api/budget', methods=['PUT'])
+def update_budget():
+    """Set the requesting user's monthly ``income`` and/or ``budget`` (0 clears them)."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not {'income', 'budget'} & set(data):
+        return jsonify({'error': "Expected a JSON object with 'income' and/or 'budget'"}), 400
+    for field in ('income', 'budget'):
+        if not budgets.is_amount(data.get(field, 0)):
+            return jsonify({'error': f"'{field}' must be a non-negative number"}), 400
+    
+    user = db.session.get(User, g.user_id)
+    if user is None:
+        # Users otherwise exist only through X-User-Id
+        user = User(id=g.user_id, username=f'user{g.user_id}', email=f'user{g.user_id}@users.invalid')
+        db.session.add(user)
+    for field in ('income', 'budget'):
+        if field in data:
+            setattr(user, field, float(data[field]))
+    # Cached recommendations depend on these
+    bump_data_version(user_session(), g.user_id)
+    user_session().commit()
+    db.session.commit()
+    return jsonify({'income': user.income or 0.0, 'budget': user.budget or 0.0})
+
+@bp.route('/api/budget/simulate', methods=['POST'])
+def simulate_budget():
+    """Score candidate monthly allocations against the user's spending history.
 
-@app.route('/api/health-score')
+    Takes ``{"scenarios": [{category: amount, ...}, ...]}``, with optional
+    ``income`` and ``budget`` overriding the user's own; see ``budgets.simulate``.
+    """
+    data = request.get_json(silent=True)
+    scenarios = data.get('scenarios') if isinstance(data, dict) else None
+    if not isinstance(scenarios, list) or not scenarios:
+        return jsonify({'error': "Expected a JSON object with a non-empty 'scenarios' list"}), 400
+    if len(scenarios) > budgets.MAX_SCENARIOS:
+        return jsonify({'error': f'At most {budgets.MAX_SCENARIOS} scenarios per request'}), 413
+    with stage('db'):
+        settings = dict(zip(('income', 'budget'), reports.budget_settings(g.user_id)))
+    for field in settings:
+        if data.get(field) is not None:
+            if not budgets.is_amount(data[field]):
+                return jsonify({'error': f"'{field}' must be a non-negative number"}), 400
+            settings[field] = data[field]
+    
+    columns = column_store.load_columns(user_session(), g.user_id)
+    with stage('compute'):
+        profile = budgets.monthly_profile(columns, date.today())
+        try:
+            body = budgets.simulate(profile, scenarios, **settings)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    with stage('serialize'):
+        return jsonify(body)
+
+@bp.route('/api/health-score')
+@cached_response
 def get_health_score():
-    transactions = Transaction.query.filter_by(user_id=1).all()
-    
-    if not transactions:
-        return jsonify({'score': 0, 'factors': []})
-    
-    df = pd.DataFrame([t.to_dict() for t in transactions])
-    df['amount'] = pd.to_numeric(df['amount'])
-    
-    # Calculate health score factors
-    total_spent = df['amount'].sum()
-    avg_transaction = df['amount'].mean()
-    num_transactions = len(df)
-    
-    # Simple scoring algorithm
-    score = 100
-    
-    # Penalize high average transaction amount
-    if avg_transaction > 100:
-        score -= 20
-    
-    # Penalize high number of transactions
-    if num_transactions > 500:
-        score -= 15
-    
-    # Bonus for diverse spending categories
-    unique_categories = df['category'].nunique()
-    if unique_categories > 5:
-        score += 10
-    
-    score = max(0, min(100, score))
-    
-    factors = [
-        f'Average transaction: ${avg_transaction:.2f}',
-        f'Total transactions: {num_transactions}',
-        f'Spending categories: {unique_categories}'
-    ]
-    
-    return jsonify({'score': score, 'factors': factors})
+    with stage('db'):
+        summary = aggregates.read_summary(user_session(), user_id=g.user_id)
+    return jsonify(reports.health_score(summary))
 
-@app.route('/api/category-performance')
+@bp.route('/api/category-performance')
+@cached_response
 def get_category_performance():
-    transactions = Transaction.query.filter_by(user_id=1).all()
-    
-    if not transactions:
-        return jsonify({'categories': []})
-    
-    df = pd.DataFrame([t.to_dict() for t in transactions])
-    df['amount'] = pd.to_numeric(df['amount'])
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # Calculate category performance metrics
-    category_performance = []
-    
-    for category in df['category'].unique():
-        category_data = df[df['category'] == category]
-        
-        # Calculate metrics
-        total_spent = category_data['amount'].sum()
-        avg_amount = category_data['amount'].mean()
-        transaction_count = len(category_data)
-        
-        # Calculate spending frequency (transactions per week)
-        date_range = (df['date'].max() - df['date'].min()).days
-        weeks = max(date_range / 7, 1)
-        frequency = transaction_count / weeks
-        
-        # Calculate trend (last 30 days vs previous 30 days)
-        recent_cutoff = df['date'].max() - pd.Timedelta(days=30)
-        previous_cutoff = df['date'].max() - pd.Timedelta(days=60)
-        
-        recent_spending = category_data[category_data['date'] >= recent_cutoff]['amount'].sum()
-        previous_spending = category_data[
-            (category_data['date'] >= previous_cutoff) & 
-            (category_data['date'] < recent_cutoff)
-        ]['amount'].sum()
-        
-        # Calculate performance score
-        performance_score = calculate_category_performance_score(
-            total_spent, avg_amount, frequency, recent_spending, previous_spending
-        )
-        
-        # Determine performance rating
-        rating = get_performance_rating(performance_score)
-        
-        category_performance.append({
-            'category': category,
-            'total_spent': round(total_spent, 2),
-            'avg_amount': round(avg_amount, 2),
-            'transaction_count': transaction_count,
-            'frequency': round(frequency, 2),
-            'recent_spending': round(recent_spending, 2),
-            'previous_spending': round(previous_spending, 2),
-            'performance_score': performance_score,
-            'rating': rating,
-            'trend': 'up' if recent_spending > previous_spending else 'down' if recent_spending < previous_spending else 'stable'
-        })
-    
-    # Sort by performance score (descending)
-    category_performance.sort(key=lambda x: x['performance_score'], reverse=True)
-    
-    return jsonify({'categories': category_performance})
-
-def calculate_category_performance_score(total_spent, avg_amount, frequency, recent_spending, previous_spending):
-    """Calculate a performance score for a spending category (0-100)"""
-    score = 50  # Base score
-    
-    # Factor 1: Spending control (lower is better for most categories)
-    if avg_amount < 50:
-        score += 20
-    elif avg_amount < 100:
-        score += 10
-    elif avg_amount > 200:
-        score -= 20
-    
-    # Factor 2: Frequency control (moderate frequency is good)
-    if 1 <= frequency <= 3:  # 1-3 transactions per week is reasonable
-        score += 15
-    elif frequency > 5:  # Too frequent spending
-        score -= 15
-    
-    # Factor 3: Trend analysis (decreasing spending is generally good)
-    if previous_spending > 0:
-        trend_ratio = recent_spending / previous_spending
-        if trend_ratio < 0.9:  # Spending decreased by 10%+
-            score += 15
-        elif trend_ratio > 1.1:  # Spending increased by 10%+
-            score -= 10
-    
-    # Factor 4: Category-specific adjustments
-    essential_categories = ['Healthcare', 'Utilities', 'Insurance', 'Education']
-    discretionary_categories = ['Entertainment', 'Shopping', 'Travel']
-    
-    # For essential categories, consistent spending is good
-    # Check if category name contains any of the essential category keywords
-    is_essential = any(cat.lower() in str(total_spent).lower() for cat in essential_categories)
-    if is_essential and previous_spending > 0:
-        if 0.9 <= (recent_spending / previous_spending) <= 1.1:
-            score += 10
-    
-    # For discretionary categories, lower spending is better
-    is_discretionary = any(cat.lower() in str(total_spent).lower() for cat in discretionary_categories)
-    if is_discretionary and recent_spending < previous_spending:
-        score += 10
-    
-    return max(0, min(100, score))
-
-def get_performance_rating(score):
-    """Convert performance score to rating"""
-    if score >= 80:
-        return 'Excellent'
-    elif score >= 65:
-        return 'Good'
-    elif score >= 50:
-        return 'Average'
-    elif score >= 30:
-        return 'Poor'
-    else:
-        return 'Inactive'
+    return job_result_response('category-performance')
 
-# Initialize database and sample data
-def initialize_database():
-    with app.app_context():
-        db.create_all()
-        
-        # Check if we need to add sample data
-        if Transaction.query.count() == 0:
-            sample_transactions = generate_sample_data()
-            for transaction in sample_transactions:
-                db.session.add(transaction)
-            db.session.commit()
-            print("Sample data generated successfully!")
-
-# Initialize on startup
-initialize_database()
+@bp.route('/api/analytics/range')
+@cached_response
+def get_analytics_range():
+    """Spending between ``from`` and ``to`` (inclusive YYYY-MM-DD, default the whole history).
+
+    ``group`` (day, week, month or quarter) splits the range into calendar
+    periods; ``compare`` (previous or year) adds a comparison with the same
+    length window just before the range or a year earlier.
+    """
+    grouping = request.args.get('group')
+    compare = request.args.get('compare')
+    if grouping is not None and grouping not in rollup.GROUPINGS:
+        return jsonify({'error': f"Invalid group, expected one of: {', '.join(rollup.GROUPINGS)}"}), 400
+    if compare is not None and compare not in rollup.COMPARISONS:
+        return jsonify({'error': f"Invalid compare, expected one of: {', '.join(rollup.COMPARISONS)}"}), 400
+    try:
+        start = request.args.get('from')
+        end = request.args.get('to')
+        start = np.datetime64(datetime.strptime(start, '%Y-%m-%d').date(), 'D') if start else None
+        end = np.datetime64(datetime.strptime(end, '%Y-%m-%d').date(), 'D') if end else None
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query parameter: {e}'}), 400
+    
+    with stage('db'):
+        buckets = rollup.Rollup.load(user_session(), g.user_id)
+    if start is None or end is None:
+        if buckets.empty:
+            return jsonify({'error': 'No transactions found'})
+        start = buckets.start if start is None else start
+        end = buckets.end if end is None else end
+    if start > end:
+        return jsonify({'error': "'from' is after 'to'"}), 400
+    if (end - start).astype(np.int64) >= current_app.config['MAX_RANGE_DAYS']:
+        return jsonify({'error': f"Range too long, at most {current_app.config['MAX_RANGE_DAYS']} days "
+                                 f"per request; narrow it with 'from' and 'to'"}), 400
+    if compare is not None:
+        try:
+            rollup.comparison_window(start, end, compare)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    if grouping is not None and \
+            len(rollup.period_starts(start, end, grouping)) > current_app.config['MAX_RANGE_PERIODS']:
+        return jsonify({'error': f"Too many periods, at most {current_app.config['MAX_RANGE_PERIODS']} "
+                                 f"{grouping}s per request"}), 400
+    
+    with stage('compute'):
+        body = rollup.range_report(buckets, start, end, grouping=grouping, compare=compare)
+    with stage('serialize'):
+        return jsonify(body)
+
+# Sections of /api/dashboard-summary, each shaped like the endpoint of the same name
+DASHBOARD_SECTIONS = ('analytics', 'health_score', 'transactions', 'anomalies', 'budget_recommendations',
+                      'category_performance', 'predict')
+
+@bp.route('/api/dashboard-summary')
+@cached_response
+def get_dashboard_summary():
+    """Everything the dashboard shows, reading each data source once.
+
+    ``sections`` (comma separated) limits the response to some of
+    DASHBOARD_SECTIONS. The analytics and health score share one aggregate
+    read, and category performance is scored from the daily buckets. Sections still waiting on a background job hold
+    ``{'pending': <job>}``, and ``{'failed': <job>}`` if the job failed.
+    """
+    requested = request.args.get('sections')
+    sections = [s.strip() for s in requested.split(',') if s.strip()] if requested else DASHBOARD_SECTIONS
+    unknown = sorted(set(sections) - set(DASHBOARD_SECTIONS))
+    if unknown:
+        return jsonify({'error': f"Unknown sections: {', '.join(unknown)}; "
+                                 f"expected any of: {', '.join(DASHBOARD_SECTIONS)}"}), 400
+    
+    body = {}
+    if 'analytics' in sections or 'health_score' in sections:
+        with stage('db'):
+            summary = aggregates.read_summary(user_session(), user_id=g.user_id)
+        if 'analytics' in sections:
+            body['analytics'] = analytics_body(summary)
+        if 'health_score' in sections:
+            body['health_score'] = reports.health_score(summary)
+    
+    if 'transactions' in sections:
+        transactions, _ = page_transactions(user_session(), user_id=g.user_id, limit=100)
+        with stage('rows'):
+            body['transactions'] = [t.to_dict() for t in transactions]
+    
+    if 'anomalies' in sections:
+        job = ensure_anomaly_model()
+        body['anomalies'] = {'pending': job.to_dict()} if job is not None else {'anomalies': flagged_anomalies()}
+    
+    if 'budget_recommendations' in sections:
+        columns = column_store.load_columns(user_session(), g.user_id)
+        body['budget_recommendations'] = budget_recommendations_body(columns)
+    
+    if 'category_performance' in sections:
+        with stage('db'):
+            buckets = rollup.Rollup.load(user_session(), g.user_id)
+        from analytics import category_performance_from_rollup
+        with stage('compute'):
+            body['category_performance'] = {'categories': category_performance_from_rollup(buckets)}
+    
+    if 'predict' in sections:
+        result, job, _ = latest_job_result('forecast')
+        if result is not None:
+            body['predict'] = json.loads(result)
+        else:
+            body['predict'] = {'failed' if job.status == jobs.FAILED else 'pending': job.to_dict()}
+    
+    with stage('serialize'):
+        return jsonify(body)
+
+@bp.route('/api/reports/nightly')
+def get_nightly_report():
+    """The requesting user's reports from the newest nightly run that covered them."""
+    with stage('db'):
+        report, run = reports.latest_report(g.user_id)
+    if report is None:
+        return jsonify({'error': 'No nightly report yet'}), 404
+    with stage('serialize'):
+        return jsonify(dict(json.loads(report.body), run=run.to_dict(),
+                            computed_at=report.computed_at.strftime('%Y-%m-%d %H:%M:%S')))
+
+@bp.route('/metrics')
+def metrics():
+    return Response(current_app.extensions['metrics'].expose(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    recent = Job.query.filter(Job.user_id == g.user_id).order_by(Job.created_at.desc()).limit(50).all()
+    return jsonify({'jobs': [job.to_dict() for job in recent]})
+
+@bp.route('/api/jobs', methods=['POST'])
+def create_job():
+    data = request.get_json(silent=True) or {}
+    name = data.get('name')
+    if name not in USER_JOBS:
+        return jsonify({'error': f"Unknown job, expected one of: {', '.join(USER_JOBS)}"}), 400
+    
+    job = jobs.submit(name, user_id=g.user_id, data_version=get_data_version(user_session(), g.user_id))
+    return job_status_response(job, 202)
+
+@bp.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    job = jobs.get(job_id)
+    # Users only see their own jobs and global ones (e.g. model training)
+    if job is None or job.user_id not in (None, g.user_id):
+        return jsonify({'error': 'Job not found'}), 404
+    return job_status_response(job)
+
+@click.command('seed-sample-data')
+@click.option('--count', type=int, default=1000, show_default=True, help='Number of transactions to insert.')
+@click.option('--user-id', type=int, default=1, show_default=True, help='Owner of the generated transactions.')
+@click.option('--if-empty', is_flag=True, help='Do nothing if the database already has transactions.')
+@click.option('--seed', type=int, default=None, help='Random seed for reproducible data.')
+@with_appcontext
+def seed_sample_data_command(count, user_id, if_empty, seed):
+    """Insert generated sample transactions with bulk inserts."""
+    import sample_data
+    
+    initialize_database()
+    if if_empty and any(session.query(Transaction.id).first() is not None for session in shards.all_sessions()):
+        click.echo('Database already has transactions, nothing to do.')
+        return
+    started = time.perf_counter()
+    inserted = sample_data.seed_transactions(shards.session_for(user_id), count, user_id=user_id, seed=seed)
+    click.echo(f'Inserted {inserted} sample transactions in {time.perf_counter() - started:.2f}s.')
+
+@click.command('rebuild-aggregates')
+@click.option('--verify-only', is_flag=True, help='Only compare the aggregate store with the raw transactions.')
+@click.option('--user-id', type=int, default=None, help='Restrict to a single user.')
+@with_appcontext
+def rebuild_aggregates_command(verify_only, user_id):
+    """Rebuild or verify the per-user spending aggregates."""
+    initialize_database()
+    sessions = [shards.session_for(user_id)] if user_id is not None else shards.all_sessions()
+    if not verify_only:
+        buckets = 0
+        for session in sessions:
+            buckets += aggregates.rebuild(session, user_id=user_id)
+            session.commit()
+        click.echo(f'Rebuilt {buckets} aggregate buckets.')
+    
+    mismatches = [m for session in sessions for verify in (aggregates.verify, aggregates.verify_daily)
+                  for m in verify(session, user_id=user_id)]
+    for m in mismatches:
+        bucket = f"month={m['month']}" if 'month' in m else f"day={m['day']}"
+        click.echo(f"Mismatch user={m['user_id']} category={m['category']!r} {bucket}: "
+                   f"expected {m['expected_total']:.2f}/{m['expected_count']}, "
+                   f"stored {m['stored_total']:.2f}/{m['stored_count']}")
+    if mismatches:
+        raise SystemExit(1)
+    click.echo('Aggregate store matches raw transactions.')
+
+@click.command('train-category-model')
+@click.option('--prune', type=int, default=3, help='Number of artifact versions to keep.')
+@click.option('--enqueue', is_flag=True, help='Submit a background job instead of training here.')
+@with_appcontext
+def train_category_model_command(prune, enqueue):
+    """Fit the category model on all transactions and publish a new version."""
+    initialize_database()
+    if enqueue:
+        job = jobs.submit('train-category-model', prune=prune)
+        click.echo(f'Queued job {job.id}.')
+        return
+    
+    result = train_category_model_task(prune=prune)
+    if not result['trained']:
+        click.echo('Not enough categorized transactions to train on.')
+        raise SystemExit(1)
+    click.echo(f"Published category model v{result['version']} "
+               f"({result['transactions']} transactions). Workers pick it up within "
+               f"{current_app.config['MODEL_RELOAD_INTERVAL']}s.")
+
+@click.command('run-nightly-reports')
+@click.option('--workers', type=int, default=os.cpu_count() or 1, show_default='CPU count',
+              help='Processes computing reports; 1 computes them in this process.')
+@click.option('--chunk-size', type=int, default=reports.CHUNK_SIZE, show_default=True,
+              help='Users handed to a process at a time.')
+@click.option('--restart', is_flag=True, help='Abandon an unfinished run instead of resuming it.')
+@with_appcontext
+def run_nightly_reports_command(workers, chunk_size, restart):
+    """Compute and store every user's reports, resuming an unfinished run."""
+    initialize_database()
+    
+    def progress(run, users_per_second):
+        remaining = (run.users_total - run.users_done) / users_per_second if users_per_second else 0
+        click.echo(f'{run.users_done}/{run.users_total} users '
+                   f'({run.users_done / run.users_total:.0%}), {users_per_second:.1f} users/s, '
+                   f'~{remaining:.0f}s left')
+    
+    started = time.perf_counter()
+    run = reports.run_nightly(current_app._get_current_object(), workers=max(workers, 1),
+                              chunk_size=chunk_size, restart=restart, progress=progress)
+    click.echo(f'Report run {run.id} for {run.as_of} covered {run.users_total} users '
+               f'in {time.perf_counter() - started:.1f}s.')
+
+@click.command('run-worker')
+@click.option('--max-jobs', type=int, default=None, help='Exit after this many jobs.')
+@with_appcontext
+def run_worker_command(max_jobs):
+    """Execute jobs from the Redis queue (JOB_BACKEND='redis')."""
+    backend = current_app.extensions['jobs']
+    if not isinstance(backend, jobs.RedisBackend):
+        click.echo("run-worker needs JOB_BACKEND='redis'; other backends run jobs inside the web workers.")
+        raise SystemExit(1)
+    initialize_database()
+    click.echo('Waiting for jobs...')
+    backend.work(max_jobs=max_jobs)
+
+app = create_app()
 
 if __name__ == '__main__':
     # Use PORT environment variable for deployment, default to 8001 for local
@@ -0,0 +1,86 @@
+"""Categorization throughput with and without the merchant index.
+
+Usage: python benchmarks/bench_categorize.py [--train N] [--rows N] [--unseen F]
+
+Trains the category model on N sample transactions, then categorizes a batch
+of new rows whose merchant names are the sample merchants spelt the way card
+feeds spell them ("STARBUCKS #1234", "SQ *UBER"). A fraction F of them get
+merchants the index has never seen. The script reports the rows/s and the
+per-row latency of single-row predictions (the POST /api/transactions path)
+and of the batched path used by imports. It measures both the forest alone
+and the index with the forest as fallback, and prints the index hit rate.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SINGLE_ROWS = 2000
+VARIANTS = ('{}', '{} #{}', '{} STORE {}', 'SQ *{}', '{} {}')
+
+
+def noisy_merchants(rng, names, count):
+    templates = rng.choice(VARIANTS, size=count)
+    picks = rng.choice(names, size=count)
+    numbers = rng.integers(100, 9999, size=count)
+    return [template.format(name.upper() if i % 2 else name, number)
+            for i, (template, name, number) in enumerate(zip(templates, picks, numbers))]
+
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main(args):
+    import pandas as pd
+    import sample_data
+    from finance_ml import FinanceMLModels
+    from merchants import MerchantIndex
+    from model_store import ModelStore
+
+    rng = np.random.default_rng(0)
+    history = pd.DataFrame(sample_data.generate(args.train, seed=1))
+    models = FinanceMLModels(store=ModelStore(tempfile.mkdtemp()))
+    started = time.perf_counter()
+    models.train_category_model(history)
+    print(f'trained on {args.train} rows in {time.perf_counter() - started:.1f}s, '
+          f'{models.categorization_stats()["index_size"]} merchants indexed')
+
+    names = [m for merchants in sample_data.MERCHANTS.values() for m in merchants]
+    merchants = noisy_merchants(rng, names, args.rows)
+    unseen = rng.random(args.rows) < args.unseen
+    for i in np.flatnonzero(unseen):
+        merchants[i] = f'Local Shop {i}'
+    amounts = rng.uniform(5, 500, size=args.rows)
+    dates = np.full(args.rows, np.datetime64('2024-06-01'), dtype='datetime64[D]')
+    single = min(SINGLE_ROWS, args.rows)
+
+    with_index = models._category_bundle
+    # The same model with an empty index, i.e. every row through the forest
+    forest_only = with_index[:3] + (MerchantIndex(),)
+
+    print(f"{'mode':>14} {'batch rows/s':>13} {'single rows/s':>14} {'single ms':>10} {'hit rate':>9}")
+    for name, bundle in (('forest only', forest_only), ('index+forest', with_index)):
+        models._category_bundle = bundle
+        models.categorization_counts = dict.fromkeys(models.categorization_counts, 0)
+        batch = timed(lambda: models.predict_categories(amounts, merchants, dates))
+        one = timed(lambda: [models.predict_categories(amounts[i:i + 1], merchants[i:i + 1], dates[i:i + 1])
+                             for i in range(single)])
+        print(f'{name:>14} {args.rows / batch:>13,.0f} {single / one:>14,.0f} '
+              f'{one / single * 1000:>10.3f} {models.categorization_stats()["hit_rate"]:>9.1%}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--train', type=int, default=20_000)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--unseen', type=float, default=0.1)
+    main(parser.parse_args())
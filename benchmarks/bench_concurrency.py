@@ -0,0 +1,155 @@
+"""Throughput and tail latency under mixed concurrent read/write load.
+
+Usage: python benchmarks/bench_concurrency.py [--workers N] [--threads N] [--seconds N] [--write-ratio F]
+
+Mimics gunicorn: several worker processes share one SQLite file, each serving
+requests from several threads through the Flask test client. Every thread
+sends a mix of GET /api/transactions, GET /api/analytics (response cache off)
+and POST /api/transactions for random users. The same load runs against each
+configuration:
+
+  default       SQLite defaults (rollback journal), as before the profile existed
+  concurrent    DATABASE_PROFILE='concurrent' (WAL, synchronous=NORMAL, ...)
+  concurrent+q  the same with WRITE_QUEUE_ENABLED
+
+For each one the script prints requests/s, p50/p99 latency for reads and
+writes, and the number of failed requests (e.g. "database is locked").
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USERS = 10
+ROWS_PER_USER = 2000
+
+CONFIGURATIONS = {
+    'default': {'DATABASE_PROFILE': 'default'},
+    'concurrent': {'DATABASE_PROFILE': 'concurrent'},
+    'concurrent+q': {'DATABASE_PROFILE': 'concurrent', 'WRITE_QUEUE_ENABLED': True},
+}
+
+
+def make_app(tmp, overrides):
+    from app import create_app
+    return create_app(dict({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+        'MODEL_DIR': os.path.join(tmp, 'models'),
+        'CACHE_BACKEND': 'none',
+        'TRUST_USER_HEADER': True,
+    }, **overrides))
+
+
+def prepare(tmp):
+    from app import db, initialize_database, ml_models
+    import anomalies
+    import sample_data
+    app = make_app(tmp, CONFIGURATIONS['concurrent'])
+    with app.app_context():
+        initialize_database()
+        for user_id in range(1, USERS + 1):
+            sample_data.seed_transactions(db.session, ROWS_PER_USER, user_id=user_id, seed=user_id)
+            # Fit the anomaly models up front so no refit runs during the timed window
+            anomalies.refit(db.session, ml_models, user_id)
+
+
+def worker(tmp, overrides, threads, seconds, write_ratio, start_at, results):
+    app = make_app(tmp, overrides)
+    client = app.test_client()
+    # Warm up imports and model loading outside the timed window
+    client.get('/api/analytics')
+    client.post('/api/transactions', data=json.dumps({'amount': 1.0, 'merchant': 'Warmup', 'date': '2024-01-01'}),
+                content_type='application/json')
+
+    samples = []
+    lock = threading.Lock()
+
+    def run(seed):
+        rng = random.Random(seed)
+        local = []
+        while time.time() < start_at:
+            time.sleep(0.001)
+        deadline = start_at + seconds
+        while time.time() < deadline:
+            headers = {'X-User-Id': str(rng.randint(1, USERS))}
+            started = time.perf_counter()
+            if rng.random() < write_ratio:
+                kind = 'write'
+                response = client.post('/api/transactions', headers=headers, content_type='application/json',
+                                       data=json.dumps({'amount': round(rng.uniform(5, 500), 2),
+                                                        'merchant': 'Bench', 'date': '2024-06-01'}))
+            else:
+                kind = 'read'
+                url = '/api/transactions?limit=50' if rng.random() < 0.5 else '/api/analytics'
+                response = client.get(url, headers=headers)
+            local.append((kind, (time.perf_counter() - started) * 1000, response.status_code == 200))
+        with lock:
+            samples.extend(local)
+
+    pool = [threading.Thread(target=run, args=(os.getpid() * 100 + i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(samples)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else float('nan')
+
+
+def run_configuration(name, args):
+    tmp = tempfile.mkdtemp()
+    prepare(tmp)
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    start_at = time.time() + 5
+    processes = [
+        context.Process(target=worker, args=(tmp, CONFIGURATIONS[name], args.threads, args.seconds,
+                                             args.write_ratio, start_at, results))
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    samples = [sample for _ in processes for sample in results.get()]
+    for process in processes:
+        process.join()
+
+    reads = [ms for kind, ms, ok in samples if kind == 'read' and ok]
+    writes = [ms for kind, ms, ok in samples if kind == 'write' and ok]
+    failed = sum(1 for _, _, ok in samples if not ok)
+    print(f'{name:>13} {len(samples) / args.seconds:>8.0f} '
+          f'{percentile(reads, 0.5):>8.1f} {percentile(reads, 0.99):>8.1f} '
+          f'{percentile(writes, 0.5):>8.1f} {percentile(writes, 0.99):>8.1f} {failed:>7}')
+
+
+def main(args):
+    print(f'{args.workers} workers x {args.threads} threads, {args.seconds}s, '
+          f'{args.write_ratio:.0%} writes, {USERS} users x {ROWS_PER_USER} rows')
+    print(f"{'config':>13} {'req/s':>8} {'read p50':>8} {'read p99':>8} "
+          f"{'write p50':>8} {'write p99':>8} {'failed':>7}")
+    for name in args.configurations or CONFIGURATIONS:
+        run_configuration(name, args)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-ratio', type=float, default=0.3)
+    parser.add_argument('configurations', nargs='*', help=f"any of: {', '.join(CONFIGURATIONS)}")
+    args = parser.parse_args()
+    unknown = set(args.configurations) - set(CONFIGURATIONS)
+    if unknown:
+        parser.error(f"unknown configuration(s): {', '.join(sorted(unknown))}")
+    main(args)
@@ -0,0 +1,284 @@
+"""Latency, throughput and memory of every API endpoint over synthetic data.
+
+Usage: python benchmarks/bench_endpoints.py [--users N] [--rows-per-user N] [--requests N]
+                                           [--data-dir DIR] [--output FILE] [--compare FILE]
+
+Seeds USERS x ROWS_PER_USER transactions with the realistic sample generator
+(``sample_data.iter_chunks``, a chunk at a time, so 10M rows fit in memory).
+Every argument-free GET /api/* route plus the POST routes (single and batch
+inserts, a SIMULATE_SCENARIOS-scenario budget simulation) is then driven
+through the Flask test client with the response cache off; a nightly report
+run is stored first so GET /api/reports/nightly has reports. Each endpoint is
+first requested once per user; these cold requests include background job
+computation and first model fits and are reported separately. After that,
+REQUESTS timed requests go to random users.
+
+For every endpoint the script records cold and warm latency percentiles, rows
+per second and the process's peak RSS after the endpoint has run. Read rows/s
+are the requesting user's rows over the median latency. Write rows/s are the
+rows posted per request over the median latency. Peak RSS is a high-water
+mark, so it only grows from one endpoint to the next.
+
+--output writes the results as JSON. --compare reads an earlier result and
+exits with status 1 when an endpoint's warm p50 or p95 is more than
+--tolerance (and --min-delta-ms) slower, so two commits can be compared on
+the same machine.
+--data-dir keeps the seeded database between runs; seeding is skipped when
+it already holds the requested dataset.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BATCH_ROWS = 500
+SIMULATE_SCENARIOS = 500
+TRAINING_ROWS = 20_000
+# Routes that need arguments or are not worth timing
+SKIP = ('/api/jobs',)
+
+
+def percentiles(values):
+    values = sorted(values)
+    pick = lambda fraction: values[min(len(values) - 1, int(fraction * len(values)))]
+    return {'p50_ms': round(pick(0.5), 3), 'p95_ms': round(pick(0.95), 3),
+            'p99_ms': round(pick(0.99), 3), 'max_ms': round(values[-1], 3)}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_app(data_dir):
+    from app import create_app
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(data_dir, 'bench.db')}",
+        'MODEL_DIR': os.path.join(data_dir, 'models'),
+        'CACHE_BACKEND': 'none',
+        'TRUST_USER_HEADER': True,
+        # Cold requests wait for their job instead of returning a 202
+        'JOB_BACKEND': 'thread',
+        'JOB_WAIT_TIMEOUT': 600,
+    })
+
+
+def seed(app, data_dir, args):
+    """Seed the dataset unless ``data_dir`` already holds it; returns seeding stats."""
+    import pandas as pd
+    from app import initialize_database, ml_models
+    import anomalies
+    import sample_data
+    import shards
+
+    dataset = {'users': args.users, 'rows_per_user': args.rows_per_user}
+    marker = os.path.join(data_dir, 'dataset.json')
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == dataset:
+                return {'skipped': True}
+        raise SystemExit(f'{data_dir} holds a different dataset; use another --data-dir')
+
+    started = time.perf_counter()
+    with app.app_context():
+        initialize_database()
+        for user_id in range(1, args.users + 1):
+            sample_data.seed_transactions(shards.session_for(user_id), args.rows_per_user,
+                                          user_id=user_id, seed=user_id, realistic=True)
+        seconds = time.perf_counter() - started
+        # The user the POSTs go to starts from the same history with a fitted anomaly model
+        write_user = args.users + 1
+        sample_data.seed_transactions(shards.session_for(write_user), args.rows_per_user,
+                                      user_id=write_user, seed=write_user, realistic=True)
+        anomalies.refit(shards.session_for(write_user), ml_models, write_user)
+        # POSTs are categorized like in production; trained on a sample to keep setup short
+        ml_models.train_category_model(pd.DataFrame(sample_data.generate(TRAINING_ROWS, seed=0, realistic=True)))
+    with open(marker, 'w') as f:
+        json.dump(dataset, f)
+    rows = args.users * args.rows_per_user
+    return {'rows': rows, 'seconds': round(seconds, 2), 'rows_per_s': round(rows / seconds),
+            'peak_rss_mb': peak_rss_mb()}
+
+
+def ensure_nightly_reports(app):
+    """Run the nightly reports once so GET /api/reports/nightly has something to serve."""
+    import reports
+    from models import ReportRun
+
+    with app.app_context():
+        if ReportRun.query.filter(ReportRun.status == reports.SUCCEEDED).first() is None:
+            reports.run_nightly(app, workers=os.cpu_count() or 1)
+
+
+def read_endpoints(app, only):
+    rules = sorted(rule.rule for rule in app.url_map.iter_rules()
+                   if rule.rule.startswith('/api/') and 'GET' in rule.methods and not rule.arguments
+                   and rule.rule not in SKIP)
+    return [rule for rule in rules if not only or any(name in rule for name in only)]
+
+
+def write_requests(args):
+    """(name, rows per request, request kwargs factory) for the POST routes."""
+    import sample_data
+
+    def single(rng):
+        row = sample_data.generate(1, seed=rng.randrange(2 ** 32), realistic=True)[0]
+        return {'json': {'amount': row['amount'], 'merchant': row['merchant'],
+                         'date': row['date'].strftime('%Y-%m-%d')}}
+
+    def batch(rng):
+        rows = sample_data.generate(BATCH_ROWS, seed=rng.randrange(2 ** 32), realistic=True)
+        return {'json': [{'amount': r['amount'], 'merchant': r['merchant'],
+                          'date': r['date'].strftime('%Y-%m-%d')} for r in rows]}
+
+    def simulate(rng):
+        categories = sorted(sample_data.CATEGORIES)
+        return {'json': {'scenarios': [{c: rng.uniform(50, 1500) for c in categories}
+                                       for _ in range(SIMULATE_SCENARIOS)]}}
+
+    return [('POST /api/transactions', 1, single), ('POST /api/transactions/batch', BATCH_ROWS, batch),
+            ('POST /api/budget/simulate', SIMULATE_SCENARIOS, simulate)]
+
+
+def time_request(client, method, url, user_id, **kwargs):
+    started = time.perf_counter()
+    response = client.open(url, method=method, headers={'X-User-Id': str(user_id)}, **kwargs)
+    # Drain streamed bodies (e.g. export) so they are part of the measurement
+    response.get_data()
+    elapsed = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+        raise SystemExit(f'{method} {url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return elapsed
+
+
+def run(args, data_dir):
+    app = make_app(data_dir)
+    seeding = seed(app, data_dir, args)
+    # Also done for a --data-dir seeded before the nightly reports existed
+    ensure_nightly_reports(app)
+    client = app.test_client()
+    rng = random.Random(0)
+    users = range(1, args.users + 1)
+    results = {}
+
+    for url in read_endpoints(app, args.only):
+        cold = [time_request(client, 'GET', url, user_id) for user_id in users]
+        warm = [time_request(client, 'GET', url, rng.choice(users)) for _ in range(args.requests)]
+        stats = percentiles(warm)
+        results[f'GET {url}'] = dict(stats, cold=percentiles(cold), requests=len(warm),
+                                     rows_per_s=round(args.rows_per_user / (stats['p50_ms'] / 1000)),
+                                     peak_rss_mb=peak_rss_mb())
+        print_row(f'GET {url}', results[f'GET {url}'])
+
+    # Writes go to a user of their own so they do not invalidate the read users' results.
+    # Anomaly refits they trigger run on the job threads, as in production
+    write_user = args.users + 1
+    for name, rows, make_kwargs in write_requests(args):
+        if args.only and not any(part in name for part in args.only):
+            continue
+        method, url = name.split(' ', 1)
+        timings = [time_request(client, method, url, write_user, **make_kwargs(rng)) for _ in range(args.requests)]
+        stats = percentiles(timings)
+        results[name] = dict(stats, requests=len(timings), rows_per_s=round(rows / (stats['p50_ms'] / 1000)),
+                             peak_rss_mb=peak_rss_mb())
+        print_row(name, results[name])
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'users': args.users,
+            'rows_per_user': args.rows_per_user,
+            'requests': args.requests,
+        },
+        'seed': seeding,
+        'endpoints': results,
+    }
+
+
+def print_row(name, stats):
+    # Writes have no cold run
+    cold = f"{stats['cold']['p50_ms']:.2f}" if 'cold' in stats else 'n/a'
+    print(f"{name:<40} {cold:>9} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} "
+          f"{stats['rows_per_s']:>13,} {stats['peak_rss_mb']:>8.1f}")
+
+
+def compare(current, baseline, tolerance, min_delta_ms):
+    """Print p50/p95 changes against ``baseline``; returns the regressed endpoints."""
+    print(f"\ncompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    regressions = []
+    for name, stats in current['endpoints'].items():
+        old = baseline['endpoints'].get(name)
+        if old is None:
+            continue
+        changes = {key: stats[key] / old[key] - 1 for key in ('p50_ms', 'p95_ms') if old[key]}
+        slower = [key for key, change in changes.items()
+                  if change > tolerance and stats[key] - old[key] > min_delta_ms]
+        if slower:
+            regressions.append(name)
+        print(f"{name:<40} " + ' '.join(f'{key[:3]} {change:>+7.1%}' for key, change in changes.items())
+              + ('  REGRESSION' if slower else ''))
+    return regressions
+
+
+def main(args):
+    data_dir = args.data_dir or tempfile.mkdtemp()
+    os.makedirs(data_dir, exist_ok=True)
+    print(f'{args.users} users x {args.rows_per_user} rows, {args.requests} requests per endpoint, data in {data_dir}')
+    print(f"{'endpoint':<40} {'cold p50':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'rows/s':>13} {'rss MiB':>8}")
+    result = run(args, data_dir)
+    if result['seed'].get('skipped'):
+        print('seeding skipped, dataset already in --data-dir')
+    else:
+        print(f"seeded {result['seed']['rows']:,} rows in {result['seed']['seconds']}s "
+              f"({result['seed']['rows_per_s']:,} rows/s)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            # Strict JSON, so a baseline never holds NaN
+            json.dump(result, f, indent=2, allow_nan=False)
+        print(f'results written to {args.output}')
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(result, baseline, args.tolerance, args.min_delta_ms):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--rows-per-user', type=int, default=10_000)
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint.')
+    parser.add_argument('--only', nargs='*', default=[], help='Only endpoints containing one of these strings.')
+    parser.add_argument('--data-dir', help='Keep (and reuse) the seeded database here.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--compare', help='Earlier --output file to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed slowdown before --compare reports a regression (0.2 = 20%%).')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='Ignore slowdowns smaller than this, which are timer noise.')
+    main(parser.parse_args())
@@ -0,0 +1,58 @@
+"""Throughput of the nightly report run versus the number of worker processes.
+
+Usage: python benchmarks/bench_nightly_reports.py [--users N] [--transactions N] [--workers 1,2,4] [--chunk-size N]
+
+Seeds ``--users`` users with ``--transactions`` sample transactions each into
+a temporary SQLite database, then runs ``reports.run_nightly`` once per
+worker count (1 computes in this process). For each one the script reports
+wall time and users/s, both including the start-up of the spawned
+processes, and the speed-up over one worker. Speed-up is bounded by the
+machine's cores (os.cpu_count() is printed) and by the single writer storing
+each chunk.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--transactions', type=int, default=200, help='Sample transactions per user.')
+    parser.add_argument('--workers', default='1,2,4', help='Comma separated worker counts.')
+    parser.add_argument('--chunk-size', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    import reports
+    import sample_data
+    from app import create_app, db, initialize_database
+
+    tmp = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}"})
+    with app.app_context():
+        initialize_database()
+        started = time.perf_counter()
+        for user_id in range(1, args.users + 1):
+            sample_data.seed_transactions(db.session, args.transactions, user_id=user_id, seed=user_id)
+        print(f'seeded {args.users} users x {args.transactions} transactions '
+              f'in {time.perf_counter() - started:.1f}s; {os.cpu_count()} CPUs')
+
+        print(f"{'workers':>8}{'seconds':>10}{'users/s':>10}{'speed-up':>10}")
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(',')):
+            chunk_size = args.chunk_size or max(1, min(reports.CHUNK_SIZE, args.users // (workers * 4)))
+            started = time.perf_counter()
+            run = reports.run_nightly(app, workers=workers, chunk_size=chunk_size, restart=True)
+            elapsed = time.perf_counter() - started
+            rate = run.users_total / elapsed
+            baseline = baseline or rate
+            print(f'{workers:>8}{elapsed:>10.2f}{rate:>10.1f}{rate / baseline:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
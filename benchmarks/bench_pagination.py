@@ -0,0 +1,92 @@
+"""Page fetch latency of GET /api/transactions as the table grows.
+
+Usage: python benchmarks/bench_pagination.py [sizes...]
+
+For each table size the script times the first page and a page 90% of the
+way into the history (reached with a keyset cursor) through the Flask test
+client, next to the equivalent LIMIT/OFFSET query for comparison. With the
+(user_id, date, id) index, both keyset columns should stay flat.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_SIZES = [10_000, 100_000, 500_000]
+PAGE_SIZE = 100
+REPEAT = 20
+
+
+def insert_rows(db, Transaction, count, start_date):
+    from sqlalchemy import insert
+    merchants = ['Starbucks', 'Uber', 'Amazon', 'Walmart', 'Netflix', 'Shell']
+    categories = ['Food & Dining', 'Transportation', 'Shopping', 'Entertainment']
+    batch = []
+    for _ in range(count):
+        batch.append({
+            'amount': round(random.uniform(5, 500), 2),
+            'merchant': random.choice(merchants),
+            'category': random.choice(categories),
+            'date': start_date + timedelta(seconds=random.randint(0, 3 * 365 * 86400)),
+            'description': '',
+            'user_id': 1,
+        })
+        if len(batch) == 50_000:
+            db.session.execute(insert(Transaction), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Transaction), batch)
+    db.session.commit()
+
+
+def median_ms(fn):
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main(sizes):
+    from sqlalchemy import text
+    from app import create_app, db, initialize_database, Transaction
+    from data_access import encode_cursor
+
+    tmp = tempfile.mkdtemp()
+    # Without the response cache, so repeated requests time page fetches rather than cache hits
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                      'CACHE_BACKEND': 'none'})
+    client = app.test_client()
+    start_date = datetime(2022, 1, 1)
+    print(f"{'rows':>10} {'first page ms':>14} {'deep page ms':>13} {'offset ms':>10}")
+    with app.app_context():
+        initialize_database()
+        current = Transaction.query.filter_by(user_id=1).count()
+        for size in sorted(sizes):
+            if size > current:
+                insert_rows(db, Transaction, size - current, start_date)
+                current = size
+            db.session.execute(text('ANALYZE'))
+
+            depth = int(current * 0.9)
+            anchor = Transaction.query.filter_by(user_id=1).order_by(
+                Transaction.date.desc(), Transaction.id.desc()).offset(depth).first()
+            cursor = encode_cursor(anchor)
+
+            first = median_ms(lambda: client.get(f'/api/transactions?limit={PAGE_SIZE}'))
+            deep = median_ms(lambda: client.get(f'/api/transactions?limit={PAGE_SIZE}&cursor={cursor}'))
+            offset = median_ms(lambda: db.session.execute(text(
+                'SELECT * FROM "transaction" WHERE user_id = 1 ORDER BY date DESC, id DESC '
+                f'LIMIT {PAGE_SIZE} OFFSET {depth}')).all())
+            print(f'{current:>10} {first:>14.2f} {deep:>13.2f} {offset:>10.2f}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
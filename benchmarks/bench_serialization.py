@@ -0,0 +1,110 @@
+"""Cost of turning a page of transactions into a JSON response body.
+
+Usage: python benchmarks/bench_serialization.py [--rows 100,1000,10000] [--repeat N]
+
+Seeds a temporary SQLite database with the largest ``--rows`` sample
+transactions and reads them once as ``Transaction`` objects (what
+``/api/transactions`` gets back) and once as plain column tuples (what
+``?format=columns`` gets). For each page size it then times, best of
+``--repeat``:
+
+  flask rows       to_dict() per row, Flask's default JSON provider (the old path)
+  orjson rows      to_dict() per row, encoded by serialization.OrjsonProvider
+  stdlib columns   data_access.page_columns arrays, serialization.NumpyJSONProvider
+  orjson columns   page_columns arrays, OrjsonProvider
+
+and reports milliseconds, the speed-up over the old path and the body size.
+Below that it compresses the biggest orjson rows body with gzip (and brotli,
+if installed) at serialization's default level and reports the sizes and
+times.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='100,1000,10000', help='Comma separated page sizes.')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    from flask.json.provider import DefaultJSONProvider
+
+    import sample_data
+    import serialization
+    from app import create_app, db, initialize_database
+    from data_access import TRANSACTION_COLUMNS, page_columns
+    from models import Transaction
+
+    sizes = [int(n) for n in args.rows.split(',')]
+    tmp = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}"})
+    with app.app_context():
+        initialize_database()
+        sample_data.seed_transactions(db.session, max(sizes), seed=0)
+        objects = Transaction.query.order_by(Transaction.date.desc(), Transaction.id.desc()).all()
+        tuples = db.session.query(*(getattr(Transaction, c) for c in TRANSACTION_COLUMNS)) \
+            .order_by(Transaction.date.desc(), Transaction.id.desc()).all()
+
+    providers = {'flask': DefaultJSONProvider(app), 'stdlib': serialization.NumpyJSONProvider(app)}
+    if serialization.orjson_available():
+        providers['orjson'] = serialization.OrjsonProvider(app)
+    else:
+        print('orjson is not installed; its rows are skipped')
+    paths = [(name, provider, rows) for name, provider, rows in (
+        ('flask rows', 'flask', True),
+        ('orjson rows', 'orjson', True),
+        ('stdlib columns', 'stdlib', False),
+        ('orjson columns', 'orjson', False),
+    ) if provider in providers]
+
+    largest = None
+    with app.test_request_context():
+        print(f"{'rows':>7}  {'path':<16}{'ms':>9}{'speed-up':>10}{'bytes':>10}")
+        for size in sizes:
+            baseline = None
+            for name, provider, rows in paths:
+                encode = providers[provider].response
+                if rows:
+                    def body(page=objects[:size]):
+                        return encode([t.to_dict() for t in page]).get_data()
+                else:
+                    def body(page=tuples[:size]):
+                        return encode(page_columns(page)).get_data()
+                seconds = best_of(args.repeat, body)
+                baseline = baseline or seconds
+                data = body()
+                if name == 'orjson rows':
+                    largest = data
+                print(f'{size:>7}  {name:<16}{seconds * 1000:>9.2f}{baseline / seconds:>9.2f}x{len(data):>10}')
+
+    if largest is None:
+        return
+    level = app.config['COMPRESS_LEVEL']
+    encodings = ('br', 'gzip') if serialization.brotli_available() else ('gzip',)
+    print(f"\n{'encoding':<10}{'ms':>9}{'bytes':>10}{'ratio':>8}   ({len(largest)} byte body, level {level})")
+    for encoding in encodings:
+        seconds = best_of(args.repeat, lambda: serialization.compress(largest, encoding, level))
+        size = len(serialization.compress(largest, encoding, level))
+        print(f'{encoding:<10}{seconds * 1000:>9.2f}{size:>10}{len(largest) / size:>7.1f}x')
+    if 'br' not in encodings:
+        print('brotli is not installed; only gzip was measured')
+
+
+if __name__ == '__main__':
+    main()
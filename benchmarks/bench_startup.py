@@ -0,0 +1,99 @@
+"""Cold start cost of the app: import time and first-request latency.
+
+Usage: python benchmarks/bench_startup.py [runs]
+
+Each measurement runs in a fresh interpreter so nothing is cached between
+runs. The script reports the median time to ``import app``, which heavy
+libraries that import left loaded, and the latency of the first request to a
+few endpoints (the first one also pays for the lazy schema check and for
+importing pandas). It also times ``flask seed-sample-data`` against the old
+one-``session.add``-per-row seeding.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_RUNS = 5
+HEAVY_MODULES = ('pandas', 'sklearn', 'scipy', 'nltk', 'joblib')
+FIRST_REQUESTS = ('/api/transactions', '/api/analytics', '/api/category-performance')
+
+IMPORT_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({"import_ms": elapsed * 1000,
+                  "heavy": [m for m in %r if m in sys.modules]}))
+''' % (HEAVY_MODULES,)
+
+REQUEST_PROBE = '''
+import json, time
+started = time.perf_counter()
+from app import app
+client = app.test_client()
+timings = {}
+for url in %r:
+    t = time.perf_counter()
+    assert client.get(url).status_code == 200
+    timings[url] = (time.perf_counter() - t) * 1000
+timings["total_ms"] = (time.perf_counter() - started) * 1000
+print(json.dumps(timings))
+''' % (FIRST_REQUESTS,)
+
+SEED_PROBE = '''
+import json, time
+from app import app, db, initialize_database
+from models import Transaction
+import sample_data
+with app.app_context():
+    initialize_database()
+    rows = sample_data.generate(%d, seed=0)
+    t = time.perf_counter()
+    for row in rows:
+        db.session.add(Transaction(**row))
+    db.session.commit()
+    per_row = time.perf_counter() - t
+    Transaction.query.delete()
+    db.session.commit()
+    t = time.perf_counter()
+    sample_data.seed_transactions(db.session, %d, seed=0)
+    bulk = time.perf_counter() - t
+print(json.dumps({"per_row_add_ms": per_row * 1000, "bulk_seed_ms": bulk * 1000}))
+'''
+
+
+def run_probe(code, env):
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=ROOT, env=env, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(runs):
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+               MODEL_DIR=os.path.join(tmp, 'models'))
+
+    imports = [run_probe(IMPORT_PROBE, env) for _ in range(runs)]
+    print(f"import app: median {statistics.median(r['import_ms'] for r in imports):.0f} ms, "
+          f"heavy modules loaded: {', '.join(imports[0]['heavy']) or 'none'}")
+
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'seed-sample-data', '--seed', '0'],
+                   cwd=ROOT, env=env, check=True, capture_output=True)
+    requests = [run_probe(REQUEST_PROBE, env) for _ in range(runs)]
+    for key in FIRST_REQUESTS + ('total_ms',):
+        label = 'import + first requests' if key == 'total_ms' else f'first GET {key}'
+        print(f'{label}: median {statistics.median(r[key] for r in requests):.0f} ms')
+
+    seed_env = dict(env, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'seed.db')}")
+    seeding = run_probe(SEED_PROBE % (1000, 1000), seed_env)
+    print(f"seed 1000 rows: per-row add {seeding['per_row_add_ms']:.0f} ms, "
+          f"bulk {seeding['bulk_seed_ms']:.0f} ms")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RUNS)
@@ -0,0 +1,81 @@
+"""Per-request latency as the number of users grows.
+
+Usage: python benchmarks/bench_users.py [--shards N] [--rows-per-user N] [user counts...]
+
+Users are added in steps (10, 100 and 1000 by default), each with the same
+number of sample transactions, and after each step random users are sent
+the read endpoints through the Flask test client with the response cache
+disabled. Every query is scoped to the requesting user (and with --shards,
+to that user's database), so the latencies should stay flat while the total
+row count grows by orders of magnitude.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_USER_COUNTS = [10, 100, 1000]
+ENDPOINTS = ('/api/transactions', '/api/analytics', '/api/category-performance', '/api/health-score')
+REQUESTS_PER_ENDPOINT = 50
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main(args):
+    tmp = tempfile.mkdtemp()
+    os.environ['CACHE_BACKEND'] = 'none'
+    os.environ['MODEL_DIR'] = os.path.join(tmp, 'models')
+
+    from app import create_app, initialize_database
+    import sample_data
+    import shards
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'main.db')}",
+        'SHARD_COUNT': args.shards,
+        'SHARD_DATABASE_URL': f"sqlite:///{os.path.join(tmp, 'shard-{shard}.db')}",
+        'TRUST_USER_HEADER': True,
+    })
+    client = app.test_client()
+    rng = random.Random(0)
+
+    print(f'shards={args.shards} rows/user={args.rows_per_user}')
+    print(f"{'users':>6} {'rows':>9} " + ' '.join(f'{e.rsplit("/", 1)[1]:>30}' for e in ENDPOINTS))
+    seeded = 0
+    with app.app_context():
+        initialize_database()
+    for user_count in sorted(args.user_counts):
+        with app.app_context():
+            for user_id in range(seeded + 1, user_count + 1):
+                sample_data.seed_transactions(shards.session_for(user_id), args.rows_per_user,
+                                              user_id=user_id, seed=user_id)
+        seeded = max(seeded, user_count)
+
+        cells = []
+        for endpoint in ENDPOINTS:
+            timings = []
+            for _ in range(REQUESTS_PER_ENDPOINT):
+                headers = {'X-User-Id': str(rng.randint(1, user_count))}
+                started = time.perf_counter()
+                response = client.get(endpoint, headers=headers)
+                timings.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.data
+            cells.append(f'p50 {statistics.median(timings):6.2f} p95 {percentile(timings, 0.95):6.2f} ms')
+        print(f'{user_count:>6} {user_count * args.rows_per_user:>9} ' + ' '.join(f'{c:>30}' for c in cells))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shards', type=int, default=0)
+    parser.add_argument('--rows-per-user', type=int, default=500)
+    parser.add_argument('user_counts', type=int, nargs='*', default=DEFAULT_USER_COUNTS)
+    main(parser.parse_args())
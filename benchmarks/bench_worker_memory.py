@@ -0,0 +1,147 @@
+"""Per-worker memory of the gunicorn deployment with and without preloading.
+
+Usage: python benchmarks/bench_worker_memory.py [--workers N] [--requests N] [--transactions N]
+
+Seeds a temporary database, trains a category model into a temporary
+MODEL_DIR, then starts ``gunicorn -c gunicorn.conf.py app:app`` twice: with
+GUNICORN_PRELOAD=0 (every worker imports and loads everything itself, as the
+old Procfile did) and with preloading on. Both runs send the same requests
+(categorizing POSTs, the dashboard and the transaction list) from several
+threads so every worker has loaded the model and pandas before it is
+measured.
+
+For each worker the script reads /proc/<pid>/smaps_rollup (Linux only) and
+reports:
+
+  uss   Private_Clean + Private_Dirty, the memory only that worker holds
+  pss   its proportional share of pages it shares with the others
+  rss   everything it maps, shared or not
+
+The mean per-worker USS is the number to compare: it is what each extra
+worker costs.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MERCHANTS = ('Starbucks #12', 'Uber Trip', 'Amazon Mktp', 'Corner Bakery', 'Shell 4411')
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _request(port, path, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=data,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        response.read()
+
+
+def _wait_until_up(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during start-up')
+        try:
+            _request(port, '/api/transactions?limit=1')
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not start in time')
+
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def _memory(pid):
+    """USS, PSS and RSS of ``pid`` in MiB."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'uss': (fields['Private_Clean'] + fields['Private_Dirty']) / 1024,
+        'pss': fields['Pss'] / 1024,
+        'rss': fields['Rss'] / 1024,
+    }
+
+
+def measure(env, preload, workers, requests):
+    port = _free_port()
+    run_env = dict(env, GUNICORN_PRELOAD='1' if preload else '0', WEB_CONCURRENCY=str(workers))
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                               '--bind', f'127.0.0.1:{port}', 'app:app'],
+                              cwd=ROOT, env=run_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_until_up(port, server)
+
+        def work(i):
+            _request(port, '/api/transactions', {
+                'amount': 5.0 + i % 40, 'merchant': MERCHANTS[i % len(MERCHANTS)],
+                'date': '2024-06-%02d' % (i % 28 + 1), 'description': 'bench',
+            })
+            _request(port, '/api/dashboard-summary')
+            _request(port, '/api/transactions?limit=50')
+
+        with ThreadPoolExecutor(max_workers=workers * 2) as pool:
+            list(pool.map(work, range(requests)))
+        time.sleep(1)
+
+        per_worker = [_memory(pid) for pid in _children(server.pid)]
+        return {
+            'preload': preload,
+            'workers': len(per_worker),
+            'master': _memory(server.pid),
+            **{f'{key}_mean': statistics.mean(m[key] for m in per_worker) for key in ('uss', 'pss', 'rss')},
+            'uss_total': sum(m['uss'] for m in per_worker),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200, help='Request rounds sent to warm the workers.')
+    parser.add_argument('--transactions', type=int, default=20000, help='Sample transactions to seed and train on.')
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+               MODEL_DIR=os.path.join(tmp, 'models'))
+    for command in (['seed-sample-data', '--count', str(args.transactions), '--seed', '0'],
+                    ['train-category-model']):
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'app'] + command,
+                       cwd=ROOT, env=env, check=True, capture_output=True)
+
+    results = [measure(env, preload, args.workers, args.requests) for preload in (False, True)]
+    print(f"{'mode':<12}{'workers':>8}{'USS/worker':>12}{'PSS/worker':>12}{'RSS/worker':>12}"
+          f"{'USS total':>11}{'master RSS':>12}")
+    for r in results:
+        print(f"{'preload' if r['preload'] else 'per-worker':<12}{r['workers']:>8}{r['uss_mean']:>10.1f}MB"
+              f"{r['pss_mean']:>10.1f}MB{r['rss_mean']:>10.1f}MB{r['uss_total']:>9.1f}MB"
+              f"{r['master']['rss']:>10.1f}MB")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""Budget recommendations and what-if simulation from a user's monthly spending.
+
+:func:`monthly_profile` turns a user's ``column_store.Columns`` into one
+(category x month) matrix over the last ``BASELINE_MONTHS`` complete months,
+with a single ``bincount``. Each category's baseline (mean month), volatility
+(standard deviation of its months) and trend (least-squares slope, per month)
+are then row operations on that matrix. Next month's projection is the
+baseline plus the trend.
+
+``User.income`` and ``User.budget`` are monthly amounts. :func:`recommend`
+compares the projection with the user's target: the budget if set, otherwise
+income less ``SAVINGS_RATE``. Any excess is spread over the categories in
+proportion to their projected spending, weighted up for volatile ones, with
+no category cut by more than ``MAX_CUT``. Without a budget or income, each
+rising category is cut back to its baseline.
+
+:func:`simulate` scores candidate allocations (monthly amounts per category)
+against the same profile. The scenarios form an (S x C) matrix, and each
+category's monthly spending is modelled as normal with the projected mean and
+historical deviation. The chance of staying within every allocation and the
+expected overrun are then computed for all scenarios at once.
+"""
+import math
+
+import numpy as np
+
+BASELINE_MONTHS = 6
+
+# Share of income kept as savings when the user has an income but no budget
+SAVINGS_RATE = 0.2
+
+# Largest share of a category's projected spending a recommendation cuts
+MAX_CUT = 0.5
+
+# Cuts below this (in dollars per month) are not worth recommending
+MIN_SAVING = 1.0
+
+MAX_SCENARIOS = 1000
+
+
+class MonthlyProfile:
+    """Per-category monthly statistics; arrays are indexed like ``categories``."""
+
+    def __init__(self, categories, months, spending):
+        self.categories = list(categories)
+        # 'YYYY-MM' of each column of ``spending``
+        self.months = months
+        # (categories, months) totals
+        self.spending = spending
+        n = spending.shape[1]
+        self.baseline = spending.mean(axis=1) if n else np.zeros(len(self.categories))
+        self.volatility = spending.std(axis=1, ddof=1) if n > 1 else np.zeros(len(self.categories))
+        if n > 1:
+            x = np.arange(n) - (n - 1) / 2
+            self.trend = (spending - self.baseline[:, None]) @ x / (x @ x)
+        else:
+            self.trend = np.zeros(len(self.categories))
+        self.projected = np.maximum(self.baseline + self.trend, 0)
+
+    @property
+    def empty(self):
+        return not self.categories
+
+
+def monthly_profile(columns, as_of, months=BASELINE_MONTHS):
+    """The user's ``MonthlyProfile`` over up to ``months`` complete months.
+
+    The window ends with the month before ``as_of``'s, or with the user's
+    last month with spending if that is earlier. It starts no earlier than
+    the user's first month with spending. Uncategorized spending is left out.
+    """
+    categorized = columns.category_codes >= 0
+    if not categorized.any():
+        return MonthlyProfile([], [], np.zeros((0, 0)))
+    month_numbers = columns.days[categorized].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    current = np.datetime64(as_of, 'M').astype(np.int64)
+    last = min(current - 1, int(month_numbers.max()))
+    # A shorter history is not padded with empty months before it began
+    first = max(last - months + 1, int(month_numbers.min()))
+    if first > last:
+        return MonthlyProfile([], [], np.zeros((0, 0)))
+    width = last - first + 1
+
+    in_window = (month_numbers >= first) & (month_numbers <= last)
+    codes = columns.category_codes[categorized][in_window].astype(np.int64)
+    keys = codes * width + (month_numbers[in_window] - first)
+    spending = np.bincount(keys, weights=columns.cents[categorized][in_window],
+                           minlength=len(columns.categories) * width).reshape(len(columns.categories), width) / 100
+
+    # Categories without spending in the window are dropped; rows come out in name order
+    order = [i for i in np.argsort(columns.categories, kind='stable') if spending[i].any()]
+    labels = [str(month) for month in np.arange(first, last + 1).astype('datetime64[M]')]
+    return MonthlyProfile([columns.categories[i] for i in order], labels, spending[order])
+
+
+def spending_target(profile, income, budget):
+    """``(target, source)``: the monthly amount the user should spend at most."""
+    if budget:
+        return budget, 'budget'
+    if income:
+        return income * (1 - SAVINGS_RATE), 'income'
+    return float(profile.baseline.sum()), 'baseline'
+
+
+def recommend(profile, income=0.0, budget=0.0):
+    """The /api/budget-recommendations payload for a ``MonthlyProfile``."""
+    if profile.empty:
+        return {'recommendations': []}
+
+    target, source = spending_target(profile, income or 0.0, budget or 0.0)
+    projected_total = float(profile.projected.sum())
+    excess = max(projected_total - target, 0.0)
+
+    # Volatile categories (a high coefficient of variation) take a larger share of the cut
+    variation = np.divide(profile.volatility, profile.baseline, out=np.zeros_like(profile.baseline),
+                          where=profile.baseline > 0)
+    weights = profile.projected * (1 + variation)
+    if source == 'baseline':
+        # Without a budget or income only growth is cut: each rising category back to its baseline
+        cuts = np.maximum(profile.trend, 0)
+    elif excess and weights.sum():
+        cuts = excess * weights / weights.sum()
+    else:
+        cuts = np.zeros_like(weights)
+    cuts = np.minimum(cuts, profile.projected * MAX_CUT)
+    suggested = profile.projected - cuts
+
+    recommendations = []
+    for i in np.argsort(-cuts, kind='stable'):
+        if cuts[i] < MIN_SAVING:
+            break
+        category = profile.categories[i]
+        reason = f'; it has been rising ${profile.trend[i]:.0f}/month' if profile.trend[i] >= MIN_SAVING else ''
+        recommendations.append({
+            'category': category,
+            'current_spending': round(float(profile.baseline[i]), 2),
+            'projected_spending': round(float(profile.projected[i]), 2),
+            'suggested_budget': round(float(suggested[i]), 2),
+            'potential_savings': round(float(cuts[i]), 2),
+            'recommendation': f'Keep {category} to ${suggested[i]:.0f}/month '
+                              f'(projected ${profile.projected[i]:.0f}){reason}',
+        })
+
+    return {
+        'recommendations': recommendations,
+        'months': profile.months,
+        'income': income or 0.0,
+        'budget': budget or 0.0,
+        'target': round(target, 2),
+        'target_source': source,
+        'projected_spending': round(projected_total, 2),
+        # What is still over target after every category was cut by MAX_CUT at most
+        'shortfall': round(max(excess - float(cuts.sum()), 0.0), 2),
+        'categories': {
+            name: {
+                'baseline': round(float(baseline), 2),
+                'volatility': round(float(volatility), 2),
+                'trend': round(float(trend), 2),
+                'projected': round(float(projected), 2),
+            }
+            for name, baseline, volatility, trend, projected in zip(
+                profile.categories, profile.baseline, profile.volatility, profile.trend, profile.projected)
+        },
+    }
+
+
+def is_amount(value):
+    """Whether ``value`` (parsed JSON) is a finite, non-negative number."""
+    return not isinstance(value, bool) and isinstance(value, (int, float)) and math.isfinite(value) and value >= 0
+
+
+def _normal_cdf(z):
+    # Abramowitz & Stegun 7.1.26 (error below 1.5e-7), vectorized; math.erf is scalar only
+    x = np.abs(z) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1 - poly * np.exp(-x * x)
+    return 0.5 * (1 + np.sign(z) * erf)
+
+
+def allocation_matrix(profile, scenarios):
+    """``(categories, S x C allocations)`` for scenarios given as {category: monthly amount}.
+
+    Categories a scenario leaves out keep their projected spending. Raises
+    ValueError for a malformed scenario.
+    """
+    categories = list(profile.categories)
+    index = {name: i for i, name in enumerate(categories)}
+    rows, columns, values = [], [], []
+    for s, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict):
+            raise ValueError(f'scenario {s} is not an object of category amounts')
+        for category in scenario:
+            if category not in index:
+                # A category without history: projected spending 0
+                index[category] = len(categories)
+                categories.append(category)
+        rows += [s] * len(scenario)
+        columns += [index[category] for category in scenario]
+        values += scenario.values()
+
+    # Amounts are checked all at once; bools and strings fail the type check
+    numeric = set(map(type, values)) <= {int, float}
+    amounts = np.array(values, dtype=np.float64) if numeric else None
+    if not numeric or not (np.isfinite(amounts) & (amounts >= 0)).all():
+        bad = next(i for i, value in enumerate(values) if not is_amount(value))
+        raise ValueError(f'scenario {rows[bad]}: amount for {categories[columns[bad]]!r} '
+                         f'must be a non-negative number')
+
+    allocations = np.zeros((len(scenarios), len(categories)))
+    allocations[:, :len(profile.categories)] = profile.projected
+    allocations[rows, columns] = amounts
+    return categories, allocations
+
+
+def simulate(profile, scenarios, income=0.0, budget=0.0):
+    """Score every allocation scenario; the /api/budget/simulate payload."""
+    categories, allocations = allocation_matrix(profile, scenarios)
+    extra = len(categories) - len(profile.categories)
+    mean = np.append(profile.projected, np.zeros(extra))
+    deviation = np.append(profile.volatility, np.zeros(extra))
+
+    # z-score of every allocation against its category's spending distribution
+    gap = allocations - mean
+    variable = deviation > 0
+    z = np.divide(gap, deviation, out=np.where(gap >= 0, np.inf, -np.inf), where=variable)
+    within = _normal_cdf(z)
+    # E[max(X - a, 0)] for X ~ N(mean, deviation); categories that never vary overrun by the plain gap
+    density = np.exp(-0.5 * np.where(variable, z, 0) ** 2) / np.sqrt(2 * np.pi)
+    overrun = np.where(variable, deviation * density - gap * (1 - within), np.maximum(-gap, 0))
+
+    allocated = allocations.sum(axis=1)
+    expected_overrun = overrun.sum(axis=1)
+    on_track = within.prod(axis=1)
+    cut = np.maximum(-gap, 0).sum(axis=1)
+    savings = income - allocated - expected_overrun if income else -(allocated + expected_overrun)
+    fits = allocated <= budget if budget else np.ones(len(scenarios), dtype=bool)
+    # Best: the most expected savings among the scenarios within budget (all of them if none is)
+    candidates = np.where(fits, savings, -np.inf) if fits.any() else savings
+    best = int(np.argmax(candidates)) if len(scenarios) else None
+
+    results = zip(allocated.round(2).tolist(), cut.round(2).tolist(), expected_overrun.round(2).tolist(),
+                  on_track.round(4).tolist(), fits.tolist())
+    return {
+        'categories': categories,
+        'projected_spending': round(float(profile.projected.sum()), 2),
+        'income': income or 0.0,
+        'budget': budget or 0.0,
+        'best': best,
+        'scenarios': [
+            {
+                'allocated': allocated_total,
+                'cut': cut_total,
+                'expected_overrun': overrun_total,
+                'probability_on_track': probability,
+                'within_budget': fit,
+                'expected_savings': round(income - allocated_total - overrun_total, 2) if income else None,
+            }
+            for allocated_total, cut_total, overrun_total, probability, fit in results
+        ],
+    }
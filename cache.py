@@ -0,0 +1,168 @@
+"""Response cache for the read-only API endpoints.
+
+Entries are keyed on (user, endpoint, query args, data version). Every write
+path bumps the user's data version (see ``data_access.bump_data_version``), so
+stale entries are never served and simply age out of the backend. The same key
+doubles as the response ETag, which lets polling clients get a 304 without
+the endpoint running at all.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """In-process cache with a maximum entry count and per-entry TTL."""
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """Cache shared by all workers through a Redis client (or compatible stand-in)."""
+
+    def __init__(self, client, ttl=300, prefix='finance-cache:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class LocalRedis:
+    """Minimal in-memory stand-in for the redis-py client used by RedisCache
+    and the job queue."""
+
+    def __init__(self):
+        self._data = {}
+        self._lists = {}
+        self._lock = threading.Lock()
+        self._pushed = threading.Condition(self._lock)
+
+    def get(self, name):
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[name]
+                return None
+            return value
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            self._data[name] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def lpush(self, name, *values):
+        with self._lock:
+            items = self._lists.setdefault(name, [])
+            items[:0] = reversed(values)
+            self._pushed.notify_all()
+            return len(items)
+
+    def brpop(self, name, timeout=0):
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            while not self._lists.get(name):
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._pushed.wait(remaining)
+            return name, self._lists[name].pop()
+
+    def scan_iter(self, match=None):
+        prefix = match[:-1] if match and match.endswith('*') else match
+        with self._lock:
+            names = list(self._data)
+        return iter([n for n in names if prefix is None or n.startswith(prefix)])
+
+
+def create_backend(config):
+    """Build the backend selected by ``CACHE_BACKEND`` ('lru', 'redis', 'local-redis' or 'none')."""
+    kind = config.get('CACHE_BACKEND', 'lru')
+    ttl = config.get('CACHE_TTL', 300)
+    if kind == 'none':
+        return None
+    if kind == 'lru':
+        return LRUCache(max_entries=config.get('CACHE_MAX_ENTRIES', 1024), ttl=ttl)
+    if kind == 'local-redis':
+        return RedisCache(LocalRedis(), ttl=ttl)
+    if kind == 'redis':
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND='redis' requires the redis package") from e
+        return RedisCache(redis.Redis.from_url(config['REDIS_URL']), ttl=ttl)
+    raise ValueError(f'Unknown CACHE_BACKEND: {kind!r}')
+
+
+def cache_key(user_id, endpoint, args, version, ttl):
+    """Stable key/ETag for a response.
+
+    Endpoints such as /api/analytics also depend on the current time (a
+    rolling 30-day window), so the key rotates every ``ttl`` seconds too.
+    """
+    time_bucket = int(time.time() // ttl) if ttl else 0
+    raw = '|'.join([
+        str(user_id),
+        endpoint,
+        '&'.join(f'{k}={v}' for k, v in sorted(args.items(multi=True))),
+        str(version),
+        str(time_bucket),
+    ])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def encode_entry(status, mimetype, body):
+    return f'{status} {mimetype}\n'.encode() + body
+
+
+def decode_entry(entry):
+    header, body = entry.split(b'\n', 1)
+    status, mimetype = header.decode().split(' ', 1)
+    return int(status), mimetype, body
@@ -0,0 +1,266 @@
+"""Per-worker cache of users' transactions as compact columns.
+
+``load_transactions`` builds a fresh DataFrame of Python strings and
+timestamps for every request. Here each cached user instead holds:
+
+- amounts as int32 cents,
+- dates as int32 days since 1970-01-01,
+- merchants and categories as int32/int16 codes into per-user dictionaries
+  (-1 for no category).
+
+That is 14 bytes a row plus each distinct string once. Transactions are
+append-only, so a cached user is brought up to date by reading only the rows
+above its id watermark. The row at the watermark is re-read on every access,
+so a database that was replaced underneath the cache is noticed and the user
+is reloaded.
+
+Users are evicted least recently used once the cache holds more than
+``COLUMN_STORE_BYTES``. ``stats()`` reports its size, hits and evictions, and
+the app exports them in /metrics.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from flask import current_app, has_app_context
+
+from instrumentation import stage
+from models import Transaction
+
+FETCH_CHUNK_SIZE = 50000
+INITIAL_CAPACITY = 1024
+
+_COLUMNS_SQL = (
+    'SELECT id, amount, merchant, category, '
+    # Whole days since the epoch, also for dates before 1970
+    'CAST(julianday(date(date)) - 2440587.5 AS INTEGER) '
+    'FROM "{}" WHERE user_id = ? AND id > ? ORDER BY id'
+).format(Transaction.__tablename__)
+_ROW_SQL = (
+    'SELECT amount, merchant, category, CAST(julianday(date(date)) - 2440587.5 AS INTEGER) '
+    'FROM "{}" WHERE id = ? AND user_id = ?'
+).format(Transaction.__tablename__)
+
+
+class Columns:
+    """A read-only view of one user's columns, in id order."""
+
+    def __init__(self, cents, days, merchant_codes, merchants, category_codes, categories):
+        self.cents = cents
+        self.days = days
+        self.merchant_codes = merchant_codes
+        self.merchants = merchants
+        self.category_codes = category_codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.cents)
+
+    @property
+    def amounts(self):
+        return self.cents / 100
+
+    def category_totals(self):
+        """Total amount per category (indexed like ``categories``); uncategorized rows are left out."""
+        categorized = self.category_codes >= 0
+        cents = np.bincount(self.category_codes[categorized], weights=self.cents[categorized],
+                            minlength=len(self.categories))
+        return cents / 100
+
+
+class _Dictionary:
+    """Append-only string -> code mapping."""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+        self.nbytes = 0
+
+    def encode(self, strings):
+        index = self.index
+        codes = np.fromiter((-1 if s is None else index.setdefault(s, len(index)) for s in strings),
+                            dtype=np.int64, count=len(strings))
+        for value in list(index)[len(self.values):]:
+            self.values.append(value)
+            self.nbytes += sys.getsizeof(value)
+        return codes
+
+
+class UserColumns:
+    """One user's growable columns and id watermark."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.size = 0
+        self.watermark = 0
+        # (amount, merchant, category, day) of the row at the watermark
+        self._last = None
+        self._cents = np.empty(INITIAL_CAPACITY, dtype=np.int32)
+        self._days = np.empty(INITIAL_CAPACITY, dtype=np.int32)
+        self._merchant_codes = np.empty(INITIAL_CAPACITY, dtype=np.int32)
+        self._category_codes = np.empty(INITIAL_CAPACITY, dtype=np.int16)
+        self._merchants = _Dictionary()
+        self._categories = _Dictionary()
+
+    @property
+    def nbytes(self):
+        arrays = (self._cents, self._days, self._merchant_codes, self._category_codes)
+        return sum(a.nbytes for a in arrays) + self._merchants.nbytes + self._categories.nbytes
+
+    def _reserve(self, rows):
+        needed = self.size + rows
+        capacity = len(self._cents)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('_cents', '_days', '_merchant_codes', '_category_codes'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _append(self, rows):
+        ids, amounts, merchants, categories, days = zip(*rows)
+        cents = np.rint(np.array(amounts, dtype=np.float64) * 100).astype(np.int64)
+        merchant_codes = self._merchants.encode(merchants)
+        category_codes = self._categories.encode(categories)
+        # Widen a column whose values no longer fit (amounts over $21M, 32k+ categories)
+        for name, values in (('_cents', cents), ('_category_codes', category_codes)):
+            column = getattr(self, name)
+            info = np.iinfo(column.dtype)
+            if len(values) and (values.min() < info.min or values.max() > info.max):
+                setattr(self, name, column.astype(np.int64))
+
+        self._reserve(len(rows))
+        end = self.size + len(rows)
+        self._cents[self.size:end] = cents
+        self._days[self.size:end] = days
+        self._merchant_codes[self.size:end] = merchant_codes
+        self._category_codes[self.size:end] = category_codes
+        self.size = end
+        self.watermark = ids[-1]
+        self._last = rows[-1][1:]
+
+    def _is_current(self, cursor, user_id):
+        """Whether the row at the watermark is still the one that was cached."""
+        if not self.watermark:
+            return True
+        cursor.execute(_ROW_SQL, (self.watermark, user_id))
+        row = cursor.fetchone()
+        return row is not None and tuple(row) == tuple(self._last)
+
+    def refresh(self, session, user_id):
+        """Append the user's rows above the watermark; returns the number read."""
+        cursor = session.connection().connection.cursor()
+        try:
+            if not self._is_current(cursor, user_id):
+                self.reset()
+            cursor.execute(_COLUMNS_SQL, (user_id, self.watermark))
+            read = 0
+            while True:
+                rows = cursor.fetchmany(FETCH_CHUNK_SIZE)
+                if not rows:
+                    break
+                self._append(rows)
+                read += len(rows)
+            return read
+        finally:
+            cursor.close()
+
+    def view(self):
+        n = self.size
+        return Columns(self._cents[:n], self._days[:n], self._merchant_codes[:n], list(self._merchants.values),
+                       self._category_codes[:n], list(self._categories.values))
+
+
+class ColumnStore:
+    """LRU cache of ``UserColumns`` bounded by ``max_bytes``."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session, user_id):
+        """The user's up-to-date ``Columns``."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                entry = self._entries[user_id] = UserColumns()
+                self.misses += 1
+            else:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+        with entry.lock:
+            entry.refresh(session, user_id)
+            columns = entry.view()
+        self._evict()
+        return columns
+
+    def _evict(self):
+        with self._lock:
+            total = sum(entry.nbytes for entry in self._entries.values())
+            while self._entries and total > self.max_bytes:
+                _, entry = self._entries.popitem(last=False)
+                total -= entry.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            return {
+                'users': len(entries),
+                'rows': sum(entry.size for entry in entries),
+                'bytes': sum(entry.nbytes for entry in entries),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def metrics(self):
+        stats = self.stats()
+        return [
+            ('finance_column_store_bytes', 'gauge', 'Bytes held by the transaction column store.',
+             [({}, stats['bytes'])]),
+            ('finance_column_store_users', 'gauge', 'Users cached in the transaction column store.',
+             [({}, stats['users'])]),
+            ('finance_column_store_requests_total', 'counter', 'Column store lookups, by outcome.',
+             [({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses'])]),
+            ('finance_column_store_evictions_total', 'counter', 'Users evicted from the column store.',
+             [({}, stats['evictions'])]),
+        ]
+
+
+def load_columns(session, user_id, cached=True):
+    """One user's ``Columns``, through the app's column store when it has one.
+
+    Batch jobs that read each user once pass ``cached=False`` rather than fill
+    the store with users nobody will ask for again.
+    """
+    store = current_app.extensions.get('column_store') if cached and has_app_context() else None
+    with stage('db'):
+        if store is not None:
+            return store.get(session, user_id)
+        entry = UserColumns()
+        entry.refresh(session, user_id)
+        return entry.view()
+
+
+def init_app(app):
+    max_bytes = app.config['COLUMN_STORE_BYTES']
+    store = app.extensions['column_store'] = ColumnStore(max_bytes) if max_bytes else None
+    if store is not None:
+        app.extensions['metrics'].add_collector(store.metrics)
@@ -0,0 +1,216 @@
+"""Columnar read access to the transaction table.
+
+The analytics endpoints only need a handful of columns for one user, so rows
+are read straight off the DB-API cursor into typed NumPy columns instead of
+hydrating ORM objects, formatting dates with ``to_dict`` and parsing them back
+with ``pd.to_datetime``.
+"""
+import base64
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.sqlite import insert
+
+from instrumentation import stage
+from models import Transaction, DataVersion
+
+TRANSACTION_COLUMNS = ('id', 'amount', 'merchant', 'category', 'date', 'description')
+
+FETCH_CHUNK_SIZE = 50000
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_SECOND = timedelta(seconds=1)
+
+# Columns with a fixed NumPy dtype; everything else is kept as object (str/None)
+COLUMN_DTYPES = {
+    'id': np.int64,
+    'user_id': np.int64,
+    'amount': np.float64,
+    # SQLite hands dates back as epoch seconds, see _select_expression
+    'date': np.int64,
+}
+
+
+def _select_expression(column):
+    if column == 'date':
+        # DateTime is stored as ISO text in SQLite; converting it in SQL avoids
+        # building a Python datetime per row
+        return "CAST(strftime('%s', date) AS INTEGER)"
+    return column
+
+
+def _empty_column(column):
+    if column == 'date':
+        return np.empty(0, dtype='datetime64[ns]')
+    return np.empty(0, dtype=COLUMN_DTYPES.get(column, object))
+
+
+def _to_array(column, values):
+    return np.array(values, dtype=COLUMN_DTYPES.get(column, object))
+
+
+def load_transactions(session, user_id, columns=TRANSACTION_COLUMNS):
+    """Load one user's transactions as a DataFrame with typed columns.
+
+    ``date`` comes back as ``datetime64[ns]``, ``amount`` as ``float64`` and
+    ``id`` as ``int64``. Rows are in insertion (id) order. Pass
+    ``user_id=None`` to read every user's rows (e.g. for model training).
+    """
+    # Deferred so that importing the app does not pull in pandas
+    import pandas as pd
+
+    columns = list(columns)
+    unknown = set(columns) - set(Transaction.__table__.columns.keys())
+    if unknown:
+        raise ValueError(f'Unknown transaction columns: {sorted(unknown)}')
+
+    sql = 'SELECT {} FROM "{}"{} ORDER BY id'.format(
+        ', '.join(_select_expression(c) for c in columns),
+        Transaction.__tablename__,
+        ' WHERE user_id = ?' if user_id is not None else '',
+    )
+    params = (user_id,) if user_id is not None else ()
+
+    with stage('db'):
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.execute(sql, params)
+            chunks = {c: [] for c in columns}
+            while True:
+                rows = cursor.fetchmany(FETCH_CHUNK_SIZE)
+                if not rows:
+                    break
+                for column, values in zip(columns, zip(*rows)):
+                    chunks[column].append(_to_array(column, values))
+        finally:
+            cursor.close()
+
+    with stage('frame'):
+        data = {}
+        for column in columns:
+            if not chunks[column]:
+                data[column] = _empty_column(column)
+                continue
+            values = np.concatenate(chunks[column])
+            if column == 'date':
+                values = values.astype('datetime64[s]').astype('datetime64[ns]')
+            data[column] = values
+
+        return pd.DataFrame(data, columns=columns)
+
+
+CURSOR_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def encode_cursor(transaction):
+    """Opaque cursor pointing just past ``transaction`` in (date, id) order."""
+    raw = f'{transaction.date.strftime(CURSOR_DATE_FORMAT)}|{transaction.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of :func:`encode_cursor`; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        date, transaction_id = raw.split('|')
+        return datetime.strptime(date, CURSOR_DATE_FORMAT), int(transaction_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def _escape_like(text):
+    """``text`` with LIKE wildcards escaped, for patterns using ``escape='\\'``."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def page_transactions(session, user_id, limit=100, cursor=None, start=None, end=None,
+                      category=None, merchant=None, min_amount=None, max_amount=None, columns=False):
+    """Return one page of a user's transactions, newest first.
+
+    Pages are keyed on ``(date, id)`` rather than an offset so that, with the
+    ``(user_id, date, id)`` index, every page costs the same regardless of how
+    deep it is. ``start`` is inclusive and ``end`` exclusive. Returns
+    ``(transactions, next_cursor)``; ``next_cursor`` is None on the last page.
+    With ``columns`` the page is a dict of arrays (see :func:`page_columns`)
+    instead of ``Transaction`` objects.
+    """
+    if columns:
+        query = session.query(*(getattr(Transaction, c) for c in TRANSACTION_COLUMNS))
+    else:
+        query = session.query(Transaction)
+    query = query.filter(Transaction.user_id == user_id)
+    if cursor is not None:
+        query = query.filter(tuple_(Transaction.date, Transaction.id) < decode_cursor(cursor))
+    if start is not None:
+        query = query.filter(Transaction.date >= start)
+    if end is not None:
+        query = query.filter(Transaction.date < end)
+    if category is not None:
+        query = query.filter(Transaction.category == category)
+    if merchant is not None:
+        query = query.filter(Transaction.merchant.ilike(f'%{_escape_like(merchant)}%', escape='\\'))
+    if min_amount is not None:
+        query = query.filter(Transaction.amount >= min_amount)
+    if max_amount is not None:
+        query = query.filter(Transaction.amount <= max_amount)
+
+    # Fetch one extra row to learn whether another page exists
+    with stage('db'):
+        rows = query.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return (page_columns(rows) if columns else rows), next_cursor
+
+
+def page_columns(rows):
+    """``TRANSACTION_COLUMNS`` rows as one array per column.
+
+    ``id`` is ``int64``, ``amount`` ``float64`` and ``date``
+    ``datetime64[s]``; the text columns stay lists of str/None.
+    """
+    values = list(zip(*rows)) if rows else [()] * len(TRANSACTION_COLUMNS)
+    data = {}
+    for column, column_values in zip(TRANSACTION_COLUMNS, values):
+        if column == 'date':
+            # Whole seconds since the epoch by hand: NumPy's own conversion of
+            # datetime objects is about ten times slower
+            seconds = ((value - _EPOCH) // _ONE_SECOND for value in column_values)
+            data[column] = np.fromiter(seconds, dtype=np.int64, count=len(column_values)).astype('datetime64[s]')
+        elif column in COLUMN_DTYPES:
+            data[column] = np.array(column_values, dtype=COLUMN_DTYPES[column])
+        else:
+            data[column] = list(column_values)
+    return data
+
+
+def get_data_version(session, user_id):
+    """Current data version of a user's transactions (0 if never written)."""
+    version = session.query(DataVersion.version).filter(DataVersion.user_id == user_id).scalar()
+    return version or 0
+
+
+def get_anomaly_version(session, user_id):
+    """Number of anomaly refits that rescored the user's rows (0 if none)."""
+    version = session.query(DataVersion.anomaly_version).filter(DataVersion.user_id == user_id).scalar()
+    return version or 0
+
+
+def bump_anomaly_version(session, user_id):
+    """Mark a user's anomaly scores as changed without invalidating anything else."""
+    stmt = insert(DataVersion).values(user_id=user_id, version=0, anomaly_version=1)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'anomaly_version': func.coalesce(DataVersion.anomaly_version, 0) + 1},
+    ))
+
+
+def bump_data_version(session, user_id):
+    """Mark a user's data as changed; call in the same transaction as the write."""
+    stmt = insert(DataVersion).values(user_id=user_id, version=1)
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={'version': DataVersion.version + 1},
+    ))
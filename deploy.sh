@@ -36,7 +36,7 @@ deploy_render() {
     echo "   - Name: ai-finance-analyzer"
     echo "   - Environment: Python 3"
     echo "   - Build Command: pip install -r requirements.txt"
-    echo "   - Start Command: gunicorn app:app --bind 0.0.0.0:\$PORT --workers 4 --timeout 120"
+    echo "   - Start Command: gunicorn -c gunicorn.conf.py app:app"
     echo "6. Add Environment Variables:"
     echo "   - FLASK_ENV=production"
     echo "   - FLASK_DEBUG=False"
@@ -0,0 +1,84 @@
+"""SQLite connection profile shared by the main database and every shard.
+
+Each gunicorn worker holds its own connection pool and every connection gets
+the PRAGMAs of the selected ``DATABASE_PROFILE`` when it is opened, plus any
+overrides in ``SQLITE_PRAGMAS``. The default 'concurrent' profile puts the
+database in WAL mode, so readers never block the writer (or the other way
+round). It syncs at checkpoints rather than on every commit and waits
+``busy_timeout`` ms for the write lock instead of failing with "database is
+locked".
+"""
+import sqlalchemy as sa
+from sqlalchemy import event
+
+PROFILES = {
+    'concurrent': {
+        'busy_timeout': 5000,
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'mmap_size': 256 * 1024 * 1024,
+        # Negative values are KiB: 64 MiB of page cache per connection
+        'cache_size': -64 * 1024,
+        'temp_store': 'memory',
+    },
+    # As above, but fsync on every commit
+    'durable': {
+        'busy_timeout': 5000,
+        'journal_mode': 'wal',
+        'synchronous': 'full',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,
+        'temp_store': 'memory',
+    },
+    # SQLite's own defaults (rollback journal), for comparison
+    'default': {},
+}
+
+
+def pragmas(config):
+    """The PRAGMAs for ``config['DATABASE_PROFILE']`` merged with ``SQLITE_PRAGMAS``."""
+    name = config.get('DATABASE_PROFILE', 'concurrent')
+    if name not in PROFILES:
+        raise ValueError(f'Unknown DATABASE_PROFILE: {name!r}')
+    return dict(PROFILES[name], **(config.get('SQLITE_PRAGMAS') or {}))
+
+
+def is_file_sqlite(url):
+    url = sa.engine.make_url(url)
+    return url.drivername.startswith('sqlite') and url.database not in (None, '', ':memory:')
+
+
+def engine_options(config, url):
+    """Pool and driver options for an engine on ``url``.
+
+    In-memory databases keep the single shared connection Flask-SQLAlchemy
+    sets up for them, so only file databases get a sized pool.
+    """
+    if not is_file_sqlite(url):
+        return {}
+    options = {
+        'pool_size': config.get('DATABASE_POOL_SIZE', 5),
+        'max_overflow': config.get('DATABASE_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DATABASE_POOL_TIMEOUT', 30),
+    }
+    busy_timeout = pragmas(config).get('busy_timeout')
+    if busy_timeout is not None:
+        # pysqlite's own lock wait, which otherwise defaults to 5 s
+        options['connect_args'] = {'timeout': busy_timeout / 1000}
+    return options
+
+
+def install(engine, config):
+    """Apply the profile's PRAGMAs to every new connection of ``engine``."""
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas(config).items()]
+    if engine.dialect.name != 'sqlite' or not statements:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
@@ -0,0 +1,130 @@
+"""Streaming exports of a user's full transaction history.
+
+Rows are read with ``yield_per`` so only one chunk is held in memory at a
+time, and each chunk is encoded and handed to the response before the next
+one is fetched. Memory stays flat regardless of history size.
+"""
+import csv
+import io
+import json
+
+from sqlalchemy import func, select
+
+from models import Transaction
+
+EXPORT_COLUMNS = ('id', 'date', 'amount', 'merchant', 'category', 'description')
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def iter_chunks(session, user_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield lists of row tuples in ``EXPORT_COLUMNS`` order, oldest id first."""
+    stmt = select(
+        Transaction.id,
+        # Formatted in SQL so no datetime object is built per row
+        func.strftime('%Y-%m-%d %H:%M:%S', Transaction.date),
+        Transaction.amount,
+        Transaction.merchant,
+        Transaction.category,
+        Transaction.description,
+    ).where(Transaction.user_id == user_id).order_by(Transaction.id).execution_options(
+        yield_per=chunk_size,
+        stream_results=True,
+    )
+    result = session.execute(stmt)
+    try:
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+    finally:
+        result.close()
+
+
+def stream_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(chunks):
+    for chunk in chunks:
+        yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in chunk)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that collects bytes until the caller drains them."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_parquet(chunks):
+    """Encode each chunk as one Parquet row group (requires pyarrow)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('date', pa.timestamp('s')),
+        ('amount', pa.float64()),
+        ('merchant', pa.string()),
+        ('category', pa.string()),
+        ('description', pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            arrays = [
+                pa.array(columns[0], pa.int64()),
+                pa.array(columns[1], pa.string()).cast(pa.timestamp('s')),
+                pa.array(columns[2], pa.float64()),
+                pa.array(columns[3], pa.string()),
+                pa.array(columns[4], pa.string()),
+                pa.array(columns[5], pa.string()),
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+    'parquet': (stream_parquet, 'application/vnd.apache.parquet'),
+}
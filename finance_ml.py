@@ -0,0 +1,308 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+from merchants import MerchantIndex, normalize
+from model_store import ModelStore
+
+# sklearn is imported inside the methods that fit models, so importing this
+# module (and the app) stays cheap; scoring a loaded artifact imports it on
+# unpickle
+
+CATEGORY_MODEL_NAME = 'category'
+
+# Bump whenever category_features changes so stale artifacts are ignored
+CATEGORY_FEATURE_VERSION = 2
+
+# Returned by predict_category until a model has been trained
+DEFAULT_CATEGORY = 'Other'
+
+MERCHANT_BUCKETS = 1000
+
+MIN_TRAINING_ROWS = 10
+
+# Bump whenever anomaly_features changes so stale artifacts are ignored
+ANOMALY_FEATURE_VERSION = 1
+
+MIN_ANOMALY_ROWS = 5
+
+# Per-user anomaly models kept in memory by each worker
+ANOMALY_CACHE_SIZE = 256
+
+# Times a lookup retries when a concurrent refit prunes the version it just listed
+ANOMALY_LOAD_ATTEMPTS = 3
+
+
+def anomaly_model_name(user_id):
+    # One directory per user, so looking up a user's versions lists only their own artifacts
+    return f'anomaly/user{user_id}/model'
+
+
+def encode_merchants(merchants):
+    """Bucket normalized merchant names into MERCHANT_BUCKETS stable integer codes.
+
+    Uses CRC32 rather than ``hash()``, which is salted per process and would
+    give every gunicorn worker a different encoding for the same merchant.
+    """
+    return np.fromiter(
+        (zlib.crc32(normalize(m).encode('utf-8')) % MERCHANT_BUCKETS for m in merchants),
+        dtype=np.int64,
+        count=len(merchants),
+    )
+
+
+def category_features(amounts, merchants, dates):
+    """Build the [amount, merchant, day_of_week, month] feature matrix."""
+    days = np.asarray(dates, dtype='datetime64[D]')
+    # 1970-01-01 was a Thursday (weekday 3)
+    day_of_week = (days.astype(np.int64) + 3) % 7
+    month = days.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    return np.column_stack([
+        np.asarray(amounts, dtype=np.float64),
+        encode_merchants(merchants),
+        day_of_week,
+        month,
+    ])
+
+
+def anomaly_features(amounts, dates):
+    """Build the [amount, day_of_week, month] feature matrix."""
+    features = category_features(amounts, [''] * len(amounts), dates)
+    return features[:, [0, 2, 3]]
+
+
+# ML Models
+class FinanceMLModels:
+    def __init__(self, store=None, reload_interval=30):
+        self.store = store
+        self.reload_interval = reload_interval
+        self.category_model = None
+        self.category_model_version = None
+        self.label_encoder = None
+        self._category_bundle = None
+        # Artifacts are loaded on first use rather than at construction
+        self._last_reload_check = float('-inf')
+        # user_id -> (version, bundle, last store check)
+        self._anomaly_bundles = OrderedDict()
+        self._anomaly_lock = threading.Lock()
+        # Per-worker counts of how predict_categories resolved each row
+        self.categorization_counts = {'index_exact': 0, 'index_prefix': 0, 'model': 0}
+        self._counts_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Use the app's ``MODEL_DIR`` store and ``MODEL_RELOAD_INTERVAL``."""
+        self.reload_interval = app.config['MODEL_RELOAD_INTERVAL']
+        self.use_store(ModelStore(app.config['MODEL_DIR']))
+
+    def use_store(self, store):
+        """Switch to another artifact store, dropping every loaded model."""
+        self.store = store
+        self._category_bundle = None
+        self.category_model = None
+        self.category_model_version = None
+        self.label_encoder = None
+        self._last_reload_check = float('-inf')
+        with self._anomaly_lock:
+            self._anomaly_bundles.clear()
+
+    def _use_category_bundle(self, version, bundle):
+        from sklearn.preprocessing import LabelEncoder
+
+        label_encoder = LabelEncoder()
+        label_encoder.classes_ = bundle['classes']
+        table = bundle.get('merchant_table')
+        # Older artifacts carry the merchant index as a dict
+        merchant_index = MerchantIndex.from_arrays(**table) if table is not None \
+            else MerchantIndex(bundle.get('merchant_index'))
+        # Swap everything in one assignment so concurrent requests never see a
+        # model paired with another version's classes
+        self._category_bundle = (version, bundle['model'], label_encoder, merchant_index)
+        self.category_model_version = version
+        self.category_model = bundle['model']
+        self.label_encoder = label_encoder
+
+    def refresh_category_model(self, force=False):
+        """Pick up a newer category model artifact without restarting.
+
+        The store is checked at most once every ``reload_interval`` seconds.
+        """
+        if self.store is None:
+            return False
+        now = time.monotonic()
+        if not force and now - self._last_reload_check < self.reload_interval:
+            return False
+        self._last_reload_check = now
+
+        latest = self.store.latest_version(CATEGORY_MODEL_NAME)
+        if latest is None or latest == self.category_model_version:
+            return False
+        version, bundle = self.store.load(CATEGORY_MODEL_NAME, latest)
+        if bundle.get('feature_version') != CATEGORY_FEATURE_VERSION:
+            return False
+        self._use_category_bundle(version, bundle)
+        return True
+
+    def train_category_model(self, transactions_df):
+        """Fit the category classifier and publish it as a new artifact version.
+
+        ``transactions_df`` needs ``amount``, ``merchant``, ``category`` and
+        ``date`` columns, as returned by ``data_access.load_transactions``.
+        """
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import LabelEncoder
+
+        labelled = transactions_df[transactions_df['category'].notna()]
+        if len(labelled) < MIN_TRAINING_ROWS:
+            return False
+
+        # Prepare features
+        X = category_features(labelled['amount'].values, labelled['merchant'].values, labelled['date'].values)
+
+        # Encode categories
+        label_encoder = LabelEncoder()
+        y_encoded = label_encoder.fit_transform(labelled['category'].values)
+
+        # Train model
+        model = RandomForestClassifier(n_estimators=100, random_state=42)
+        model.fit(X, y_encoded)
+
+        # The lookup tables are stored as fixed-width arrays, which ModelStore.load
+        # maps from the file and workers share, rather than as Python objects
+        bundle = {
+            'model': model,
+            'classes': label_encoder.classes_.astype(str),
+            'merchant_table': MerchantIndex.build(labelled['merchant'].values, labelled['category'].values).arrays(),
+            'feature_version': CATEGORY_FEATURE_VERSION,
+            'trained_at': datetime.utcnow().isoformat(),
+            'n_samples': len(labelled),
+        }
+        version = self.store.save(CATEGORY_MODEL_NAME, bundle) if self.store is not None else None
+        self._use_category_bundle(version, bundle)
+        return True
+
+    def predict_category(self, amount, merchant, date):
+        # Extract date features
+        date_obj = datetime.strptime(date, '%Y-%m-%d')
+
+        return self.predict_categories([amount], [merchant], [np.datetime64(date_obj.date())])[0]
+
+    def predict_categories(self, amounts, merchants, dates):
+        """Predict categories for a whole batch.
+
+        Merchants found in the merchant index take its category; the rest
+        share a single forest evaluation.
+        """
+        self.refresh_category_model()
+        if self._category_bundle is None:
+            return np.full(len(amounts), DEFAULT_CATEGORY, dtype=object)
+        if len(amounts) == 0:
+            return np.empty(0, dtype=object)
+        _, model, label_encoder, merchant_index = self._category_bundle
+
+        categories, exact_hits, prefix_hits = merchant_index.resolve(merchants)
+        unknown = np.flatnonzero(categories == None)  # noqa: E711 (elementwise)
+        if len(unknown):
+            merchants = np.asarray(merchants, dtype=object)
+            features = category_features(np.asarray(amounts)[unknown], merchants[unknown],
+                                         np.asarray(dates)[unknown])
+            categories[unknown] = label_encoder.inverse_transform(model.predict(features))
+
+        with self._counts_lock:
+            self.categorization_counts['index_exact'] += exact_hits
+            self.categorization_counts['index_prefix'] += prefix_hits
+            self.categorization_counts['model'] += len(unknown)
+        return categories
+
+    def categorization_stats(self):
+        """Lookup counters plus the index hit rate and size, for monitoring."""
+        with self._counts_lock:
+            stats = dict(self.categorization_counts)
+        total = sum(stats.values())
+        stats['hit_rate'] = (stats['index_exact'] + stats['index_prefix']) / total if total else 0.0
+        stats['index_size'] = len(self._category_bundle[3]) if self._category_bundle is not None else 0
+        return stats
+
+    def _remember_anomaly_bundle(self, user_id, version, bundle):
+        with self._anomaly_lock:
+            self._anomaly_bundles[user_id] = (version, bundle, time.monotonic())
+            self._anomaly_bundles.move_to_end(user_id)
+            while len(self._anomaly_bundles) > ANOMALY_CACHE_SIZE:
+                self._anomaly_bundles.popitem(last=False)
+
+    def anomaly_model(self, user_id):
+        """Return the user's latest fitted anomaly bundle, or None.
+
+        Like the category model, newer versions published by another process
+        are picked up after at most ``reload_interval`` seconds.
+        """
+        with self._anomaly_lock:
+            cached = self._anomaly_bundles.get(user_id)
+            if cached is not None:
+                self._anomaly_bundles.move_to_end(user_id)
+        if cached is not None and time.monotonic() - cached[2] < self.reload_interval:
+            return cached[1]
+        if self.store is None:
+            return cached[1] if cached is not None else None
+
+        name = anomaly_model_name(user_id)
+        for _ in range(ANOMALY_LOAD_ATTEMPTS):
+            latest = self.store.latest_version(name)
+            if latest is None:
+                return None
+            if cached is not None and cached[0] == latest:
+                self._remember_anomaly_bundle(user_id, latest, cached[1])
+                return cached[1]
+            try:
+                version, bundle = self.store.load(name, latest)
+                break
+            except FileNotFoundError:
+                # Pruned by a concurrent refit after it was listed; a newer version exists
+                continue
+        else:
+            return cached[1] if cached is not None else None
+        if bundle.get('feature_version') != ANOMALY_FEATURE_VERSION:
+            return None
+        self._remember_anomaly_bundle(user_id, version, bundle)
+        return bundle
+
+    def fit_anomaly_model(self, user_id, amounts, dates, max_id):
+        """Fit and publish a user's anomaly model.
+
+        ``max_id`` is the newest transaction id included in the fit; rows
+        above it count towards the next refit. Returns the bundle, or None if
+        there is too little history.
+        """
+        if len(amounts) < MIN_ANOMALY_ROWS:
+            return None
+        from sklearn.ensemble import IsolationForest
+
+        model = IsolationForest(contamination=0.1, random_state=42)
+        model.fit(anomaly_features(amounts, dates))
+        bundle = {
+            'model': model,
+            'feature_version': ANOMALY_FEATURE_VERSION,
+            'trained_at': datetime.utcnow().isoformat(),
+            'n_samples': len(amounts),
+            'max_id': int(max_id),
+        }
+        version = None
+        if self.store is not None:
+            version = self.store.save(anomaly_model_name(user_id), bundle)
+            self.store.prune(anomaly_model_name(user_id), keep=2)
+        self._remember_anomaly_bundle(user_id, version, bundle)
+        return bundle
+
+    def score_anomalies(self, bundle, amounts, dates):
+        """Return ``(scores, is_anomaly)`` arrays for the given transactions.
+
+        Scores are the negated IsolationForest decision function, so positive
+        values are the ones the model flags.
+        """
+        if len(amounts) == 0:
+            return np.empty(0), np.empty(0, dtype=bool)
+        scores = -bundle['model'].decision_function(anomaly_features(amounts, dates))
+        return scores, scores > 0
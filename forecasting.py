@@ -0,0 +1,313 @@
+"""Daily spending forecasts for /api/predict.
+
+Each user's spending is resampled to a dense daily series (days without
+transactions count as zero) for the total and for every category. Each series
+gets an additive Holt-Winters model with damped trend and weekly seasonality.
+All series and all candidate smoothing parameters are fitted in a single
+vectorized pass over the days.
+
+Fitted states are persisted in ``ForecastState``. Later requests only fold in
+the days that completed since the last request, so the history is not
+re-scanned. A full refit happens only the first time, when a new category
+appears, or when rows are inserted with dates the state has already consumed.
+"""
+import itertools
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func
+
+from column_store import load_columns
+from models import Transaction, ForecastState
+
+SEASON = 7
+HORIZON = 30
+TREND_DAMPING = 0.98
+# Two-sided 95% normal quantile
+Z_95 = 1.959963984540054
+
+MIN_TRANSACTIONS = 30
+MIN_DAYS = 2 * SEASON
+
+TOTAL = ''
+
+PARAMETER_GRID = np.array(list(itertools.product(
+    (0.05, 0.1, 0.2, 0.3, 0.5),   # alpha (level)
+    (0.0, 0.01, 0.05),            # beta (trend)
+    (0.05, 0.1, 0.2, 0.3),        # gamma (season)
+)))
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _to_datetime(day):
+    return EPOCH + timedelta(days=int(day))
+
+
+def _day_numbers(dates):
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def _smooth(Y, first_day, alpha, beta, gamma, level, trend, seasonal):
+    """Run the Holt-Winters recursions over the columns of ``Y``.
+
+    ``Y`` has shape (..., days); the parameters and state broadcast against its
+    leading dimensions and ``seasonal`` carries a trailing axis of SEASON slots
+    indexed by absolute day number. Returns the updated state plus the sum and
+    count of one-step-ahead squared errors.
+    """
+    level = np.array(level, dtype=np.float64)
+    trend = np.array(trend, dtype=np.float64)
+    seasonal = np.array(seasonal, dtype=np.float64)
+    sse = np.zeros(np.broadcast(level, alpha).shape)
+    for t in range(Y.shape[-1]):
+        slot = (first_day + t) % SEASON
+        y = Y[..., t]
+        s = seasonal[..., slot]
+        error = y - (level + TREND_DAMPING * trend + s)
+        new_level = alpha * (y - s) + (1 - alpha) * (level + TREND_DAMPING * trend)
+        trend = beta * (new_level - level) + (1 - beta) * TREND_DAMPING * trend
+        seasonal[..., slot] = gamma * (y - new_level) + (1 - gamma) * s
+        level = new_level
+        sse = sse + error ** 2
+    return level, trend, seasonal, sse, Y.shape[-1]
+
+
+def fit(Y, first_day):
+    """Fit every row of ``Y`` (series x days) and return one state dict per row."""
+    n_series = Y.shape[0]
+    # Initialise from the first two weeks: level from their mean, seasonal
+    # slots from each weekday's deviation
+    warmup = Y[:, :MIN_DAYS]
+    level0 = warmup.mean(axis=1)
+    seasonal0 = np.zeros((n_series, SEASON))
+    slots = (first_day + np.arange(MIN_DAYS)) % SEASON
+    for slot in range(SEASON):
+        seasonal0[:, slot] = warmup[:, slots == slot].mean(axis=1) - level0
+
+    alpha, beta, gamma = (PARAMETER_GRID[:, i][None, :] for i in range(3))
+    level, trend, seasonal, sse, n = _smooth(
+        Y[:, None, :], first_day, alpha, beta, gamma,
+        level0[:, None] * np.ones_like(alpha),
+        np.zeros((n_series, len(PARAMETER_GRID))),
+        np.repeat(seasonal0[:, None, :], len(PARAMETER_GRID), axis=1),
+    )
+    best = sse.argmin(axis=1)
+    rows = np.arange(n_series)
+    return [
+        {
+            'alpha': float(PARAMETER_GRID[b, 0]),
+            'beta': float(PARAMETER_GRID[b, 1]),
+            'gamma': float(PARAMETER_GRID[b, 2]),
+            'level': float(level[r, b]),
+            'trend': float(trend[r, b]),
+            'seasonal': seasonal[r, b].tolist(),
+            'sse': float(sse[r, b]),
+            'n': int(n),
+            'last_day': int(first_day + Y.shape[1] - 1),
+        }
+        for r, b in zip(rows, best)
+    ]
+
+
+def update(state, values, first_day):
+    """Fold consecutive daily totals starting at ``first_day`` into ``state``."""
+    level, trend, seasonal, sse, n = _smooth(
+        np.asarray(values, dtype=np.float64), first_day,
+        state['alpha'], state['beta'], state['gamma'],
+        state['level'], state['trend'], state['seasonal'],
+    )
+    return dict(
+        state,
+        level=float(level),
+        trend=float(trend),
+        seasonal=seasonal.tolist(),
+        sse=state['sse'] + float(sse),
+        n=state['n'] + n,
+        last_day=int(first_day + len(values) - 1),
+    )
+
+
+def predict(state, horizon=HORIZON):
+    """Forecast the ``horizon`` days after ``state['last_day']``.
+
+    Returns daily means and standard deviations, and the standard deviation
+    of their sum. The error variances follow the level component of the model
+    (an error on day j carries into every later day through alpha).
+    """
+    h = np.arange(1, horizon + 1)
+    damped = np.cumsum(TREND_DAMPING ** h)
+    seasonal = np.asarray(state['seasonal'])
+    means = state['level'] + damped * state['trend'] + seasonal[(state['last_day'] + h) % SEASON]
+    sigma2 = state['sse'] / max(state['n'], 1)
+    alpha = state['alpha']
+    daily_sd = np.sqrt(sigma2 * (1 + (h - 1) * alpha ** 2))
+    total_sd = np.sqrt(sigma2 * np.sum((1 + alpha * (horizon - h)) ** 2))
+    return means, daily_sd, total_sd
+
+
+def _interval(mean, sd):
+    return max(mean - Z_95 * sd, 0.0), mean + Z_95 * sd
+
+
+def _load_states(session, user_id):
+    return {
+        row.series: dict(json.loads(row.state))
+        for row in session.query(ForecastState).filter(ForecastState.user_id == user_id)
+    }
+
+
+def _save_states(session, user_id, states, watermark):
+    session.query(ForecastState).filter(ForecastState.user_id == user_id).delete(synchronize_session=False)
+    session.add_all([
+        ForecastState(user_id=user_id, series=series, state=json.dumps(dict(state, watermark=watermark)))
+        for series, state in states.items()
+    ])
+
+
+def _daily_totals_since(session, user_id, first_day, last_day):
+    """Daily totals per series for days first_day..last_day inclusive."""
+    rows = session.query(
+        Transaction.category,
+        func.date(Transaction.date),
+        func.sum(Transaction.amount),
+    ).filter(
+        Transaction.user_id == user_id,
+        Transaction.date >= _to_datetime(first_day),
+        Transaction.date < _to_datetime(last_day + 1),
+    ).group_by(Transaction.category, func.date(Transaction.date)).all()
+
+    n_days = last_day - first_day + 1
+    totals = {TOTAL: np.zeros(n_days)}
+    for category, day, amount in rows:
+        offset = int(_day_numbers([day])[0]) - first_day
+        totals[TOTAL][offset] += amount
+        if category is not None:
+            totals.setdefault(category, np.zeros(n_days))[offset] += amount
+    return totals
+
+
+def _full_fit(session, user_id):
+    columns = load_columns(session, user_id)
+    days = columns.days.astype(np.int64)
+    first_day, last_day = int(days.min()), int(days.max())
+    n_days = last_day - first_day + 1
+    if n_days - 1 < MIN_DAYS:
+        return None, None, last_day
+
+    # Category series are ordered by name
+    categorized = columns.category_codes >= 0
+    names = np.array(columns.categories, dtype=object)
+    order = np.argsort(names)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    categories = names[order].tolist()
+    codes = rank[columns.category_codes[categorized]]
+    offsets = days - first_day
+    amounts = columns.amounts
+
+    Y = np.zeros((1 + len(categories), n_days))
+    Y[0] = np.bincount(offsets, weights=amounts, minlength=n_days)
+    if categories:
+        Y[1:] = np.bincount(codes * n_days + offsets[categorized], weights=amounts[categorized],
+                            minlength=len(categories) * n_days).reshape(len(categories), n_days)
+
+    # The last observed day may still be receiving transactions, so the
+    # persisted state stops the day before it
+    fitted = fit(Y[:, :-1], first_day)
+    states = dict(zip([TOTAL] + categories, fitted))
+    return states, Y[:, -1], last_day
+
+
+def forecast_user(session, user_id, horizon=HORIZON):
+    """Forecast a user's spending for the ``horizon`` days after their last transaction.
+
+    Returns None when there is not enough history.
+    """
+    count, max_id, last_date = session.query(
+        func.count(Transaction.id), func.max(Transaction.id), func.max(Transaction.date)
+    ).filter(Transaction.user_id == user_id).one()
+    if count < MIN_TRANSACTIONS:
+        return None
+    last_day = int(_day_numbers([last_date])[0])
+
+    states = _load_states(session, user_id)
+    refit = not states or TOTAL not in states
+    if not refit:
+        state_day = states[TOTAL]['last_day']
+        # Rows inserted after the last save but dated on a day the state has
+        # already consumed cannot be folded in incrementally
+        refit = session.query(Transaction.id).filter(
+            Transaction.user_id == user_id,
+            Transaction.id > states[TOTAL]['watermark'],
+            Transaction.date < _to_datetime(state_day + 1),
+        ).first() is not None
+
+    if not refit:
+        totals = _daily_totals_since(session, user_id, state_day + 1, last_day)
+        if set(totals) - set(states):
+            refit = True
+        else:
+            complete = last_day - state_day - 1
+            for series, state in states.items():
+                values = totals.get(series, np.zeros(last_day - state_day))
+                if complete > 0:
+                    states[series] = update(state, values[:complete], state_day + 1)
+            partial = {series: totals.get(series, np.zeros(1))[-1] for series in states}
+            if complete > 0:
+                _save_states(session, user_id, states, max_id)
+                session.commit()
+
+    if refit:
+        states, partial_values, last_day = _full_fit(session, user_id)
+        if states is None:
+            return None
+        partial = dict(zip(states, partial_values))
+        _save_states(session, user_id, states, max_id)
+        session.commit()
+
+    series_forecasts = {}
+    for series, state in states.items():
+        # Include the partially observed last day without persisting it
+        current = update(state, [partial[series]], last_day)
+        means, daily_sd, total_sd = predict(current, horizon)
+        series_forecasts[series] = (current, np.maximum(means, 0.0), daily_sd, total_sd)
+
+    total_state, means, daily_sd, total_sd = series_forecasts[TOTAL]
+    predicted = float(means.sum())
+    lower, upper = _interval(predicted, total_sd)
+    start = _to_datetime(last_day + 1)
+    return {
+        'predicted_next_month': round(predicted, 2),
+        # Share of the forecast not covered by the 95% interval half-width
+        'confidence': round(float(np.clip(1 - Z_95 * total_sd / predicted, 0, 1)) if predicted > 0 else 0.0, 2),
+        'lower': round(lower, 2),
+        'upper': round(upper, 2),
+        'interval': 0.95,
+        'daily_forecast': [
+            {
+                'date': (start + timedelta(days=i)).strftime('%Y-%m-%d'),
+                'amount': round(float(m), 2),
+                'lower': round(_interval(float(m), float(sd))[0], 2),
+                'upper': round(_interval(float(m), float(sd))[1], 2),
+            }
+            for i, (m, sd) in enumerate(zip(means, daily_sd))
+        ],
+        'by_category': {
+            series: {
+                'predicted_next_month': round(float(m.sum()), 2),
+                'lower': round(_interval(float(m.sum()), sd)[0], 2),
+                'upper': round(_interval(float(m.sum()), sd)[1], 2),
+            }
+            for series, (_, m, _, sd) in sorted(series_forecasts.items()) if series != TOTAL
+        },
+        'model': {
+            'method': 'holt-winters',
+            'season_length': SEASON,
+            'alpha': total_state['alpha'],
+            'beta': total_state['beta'],
+            'gamma': total_state['gamma'],
+            'fitted_through': _to_datetime(last_day).strftime('%Y-%m-%d'),
+        },
+    }
@@ -0,0 +1,50 @@
+"""gunicorn settings for production: ``gunicorn -c gunicorn.conf.py app:app``.
+
+With ``preload_app`` the master imports the app, pandas and sklearn and loads
+the latest category model once, before forking the workers. The workers then
+share those pages copy-on-write instead of each building their own copy.
+``gc.freeze()`` moves everything loaded so far out of the collector's reach,
+so collections in the workers do not write to (and so un-share) those pages.
+The merchant index and label classes are memory-mapped from the artifact
+file and are shared through the page cache either way.
+
+A model published after start-up is still loaded by each worker on its own
+(``MODEL_RELOAD_INTERVAL``) and is private to it until the next restart.
+
+Environment: PORT (8000), WEB_CONCURRENCY (4 workers) and GUNICORN_PRELOAD
+(on; set to 0 to load everything per worker). ``benchmarks/bench_worker_memory.py``
+measures the difference.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+timeout = 120
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1').lower() not in ('0', 'false', 'no')
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before any worker is forked."""
+    if not preload_app:
+        return
+    import pandas  # noqa: F401
+    import sklearn.ensemble  # noqa: F401
+
+    from app import ml_models
+
+    if ml_models.refresh_category_model(force=True):
+        server.log.info('Preloaded category model v%s', ml_models.category_model_version)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the master without closing them for it."""
+    if not preload_app:
+        return
+    from app import app, db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    for engine in app.extensions['shard_engines']:
+        engine.dispose(close=False)
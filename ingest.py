@@ -0,0 +1,156 @@
+"""Parsing of bulk transaction payloads into column arrays.
+
+JSON batches, CSV exports and OFX/QFX bank statements are all normalized to
+the same :class:`ParsedBatch`: one array per column holding the rows that
+validated, plus per-row error messages for the rows that did not. Row numbers
+are 0-based positions in the submitted payload.
+"""
+import io
+import re
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ('amount', 'merchant', 'date', 'description', 'category')
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+class ParsedBatch:
+    def __init__(self, rows, amounts, merchants, dates, descriptions, categories, errors, total):
+        self.rows = rows                    # payload row number of each valid row
+        self.amounts = amounts              # float64
+        self.merchants = merchants          # object (str)
+        self.dates = dates                  # datetime64[ns]
+        self.descriptions = descriptions    # object (str)
+        self.categories = categories        # object (str or None when it must be predicted)
+        self.errors = errors                # [{'row': n, 'error': msg}]
+        self.total = total
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def _text_column(frame, name):
+    if name not in frame:
+        return pd.Series([None] * len(frame), index=frame.index, dtype=object)
+    column = frame[name].astype(object)
+    column = column.where(column.notna(), None)
+    return column.map(lambda v: v.strip() if isinstance(v, str) else v)
+
+
+def parse_frame(frame, rejected=None):
+    """Validate a DataFrame of raw field values column by column.
+
+    ``rejected`` maps row numbers the caller already refused to the message
+    to report for them.
+    """
+    rejected = rejected or {}
+    total = len(frame)
+    frame = frame.reset_index(drop=True)
+    frame.columns = [str(c).strip().lower() for c in frame.columns]
+
+    amount_raw = frame['amount'] if 'amount' in frame else pd.Series([None] * total, dtype=object)
+    amounts = pd.to_numeric(amount_raw, errors='coerce')
+    date_raw = frame['date'] if 'date' in frame else pd.Series([None] * total, dtype=object)
+    dates = pd.to_datetime(date_raw.astype(str).str.strip(), format=DATE_FORMAT, errors='coerce')
+    merchants = _text_column(frame, 'merchant')
+    descriptions = _text_column(frame, 'description').map(lambda v: v if v is not None else '')
+    categories = _text_column(frame, 'category').map(lambda v: v or None)
+
+    bad_amount = amounts.isna().to_numpy() | ~np.isfinite(amounts.fillna(0).to_numpy())
+    bad_merchant = merchants.map(lambda v: not isinstance(v, str) or not v).to_numpy(dtype=bool)
+    bad_date = dates.isna().to_numpy()
+
+    invalid = bad_amount | bad_merchant | bad_date
+    if rejected:
+        invalid[list(rejected)] = True
+    errors = []
+    for row in np.flatnonzero(invalid):
+        if row in rejected:
+            errors.append({'row': int(row), 'error': rejected[row]})
+            continue
+        problems = []
+        if bad_amount[row]:
+            problems.append('amount must be a number')
+        if bad_merchant[row]:
+            problems.append('merchant is required')
+        if bad_date[row]:
+            problems.append('date must be YYYY-MM-DD')
+        errors.append({'row': int(row), 'error': '; '.join(problems)})
+
+    valid = ~invalid
+    return ParsedBatch(
+        rows=np.flatnonzero(valid),
+        amounts=amounts.to_numpy(dtype=np.float64)[valid],
+        merchants=merchants.to_numpy(dtype=object)[valid],
+        dates=dates.to_numpy(dtype='datetime64[ns]')[valid],
+        descriptions=descriptions.to_numpy(dtype=object)[valid],
+        categories=categories.to_numpy(dtype=object)[valid],
+        errors=errors,
+        total=total,
+    )
+
+
+def parse_records(records):
+    """Parse a list of JSON transaction objects."""
+    rejected = {}
+    cleaned = []
+    for i, record in enumerate(records):
+        if isinstance(record, dict):
+            cleaned.append({field: record.get(field) for field in FIELDS})
+        else:
+            cleaned.append({field: None for field in FIELDS})
+            rejected[i] = 'expected a JSON object'
+    return parse_frame(pd.DataFrame(cleaned, columns=FIELDS), rejected)
+
+
+def parse_csv(data):
+    """Parse CSV bytes/text with a header row naming the transaction fields."""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    frame = pd.read_csv(io.StringIO(data), dtype=str, keep_default_na=False, na_values=[''])
+    return parse_frame(frame)
+
+
+_OFX_TRANSACTION = re.compile(r'<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|(?=</BANKTRANLIST>))', re.S | re.I)
+_OFX_FIELD = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def parse_ofx(data):
+    """Parse the STMTTRN entries of an OFX/QFX statement (SGML or XML).
+
+    Debits become positive spending amounts; credits are reported as row
+    errors since the app only tracks spending.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8', errors='replace')
+
+    records = []
+    rejected = {}
+    for i, match in enumerate(_OFX_TRANSACTION.finditer(data)):
+        fields = {k.upper(): v.strip() for k, v in _OFX_FIELD.findall(match.group(1))}
+        try:
+            amount = float(fields.get('TRNAMT', ''))
+        except ValueError:
+            amount = None
+        posted = fields.get('DTPOSTED', '')[:8]
+        record = {
+            'amount': -amount if amount is not None else None,
+            'merchant': fields.get('NAME') or fields.get('PAYEE') or fields.get('MEMO'),
+            'date': f'{posted[:4]}-{posted[4:6]}-{posted[6:8]}' if len(posted) == 8 else None,
+            'description': fields.get('MEMO', ''),
+            'category': None,
+        }
+        if amount is not None and amount > 0:
+            rejected[i] = 'credit transactions are not imported'
+        records.append(record)
+
+    return parse_frame(pd.DataFrame(records, columns=FIELDS), rejected)
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+    'qfx': parse_ofx,
+}
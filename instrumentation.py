@@ -0,0 +1,239 @@
+"""Request timing, Prometheus metrics and opt-in profiling.
+
+Code on the hot paths wraps its phases in ``stage(name)``: 'db' for queries
+and row fetching, 'frame' for DataFrame construction, 'compute' for pandas
+and NumPy work, 'model' for inference and 'serialize' for JSON encoding.
+Every request reports the time it spent in each stage, plus its total, in a
+``Server-Timing`` header that browser dev tools display. The same timings feed
+per-route histograms, which ``GET /metrics`` serves in the Prometheus text
+format. Jobs record their stages under the route 'job:<name>'.
+
+Metrics are kept per process. With several gunicorn workers, each scrape
+sees the worker that answered it, so scrape the workers individually or
+aggregate with ``sum``/``rate`` across scrapes.
+
+Profiling is off unless configured. A fraction ``PROFILE_SAMPLE_RATE`` of
+requests, plus any request whose ``X-Profile`` header matches
+``PROFILE_TOKEN``, runs under cProfile. Its stats are written as a pstats file
+to ``PROFILE_DIR``, with the file named in the ``X-Profile-Id`` response
+header. Inspect one with ``python -m pstats <file>``.
+"""
+import cProfile
+import hmac
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app, g, has_app_context, has_request_context, request
+
+# Upper bounds (seconds) of the histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Profiles kept in PROFILE_DIR; older ones are deleted
+PROFILE_KEEP = 200
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values."""
+
+    def __init__(self, name, documentation, label_names, buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += seconds
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {series[-1]}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {cumulative}')
+        return lines
+
+
+class Metrics:
+    """The process's request and stage histograms plus pluggable collectors."""
+
+    def __init__(self):
+        self.requests = Histogram('finance_request_duration_seconds',
+                                  'Time to produce a response, by route.', ('route', 'method', 'status'))
+        self.stages = Histogram('finance_stage_duration_seconds',
+                                'Time spent in one stage of a request or job.', ('route', 'stage'))
+        self._collectors = []
+
+    def add_collector(self, collect):
+        """Register ``collect()``, returning (name, type, help, [(labels dict, value)]) tuples."""
+        self._collectors.append(collect)
+
+    def expose(self):
+        lines = self.requests.expose() + self.stages.expose()
+        for collect in self._collectors:
+            for name, kind, documentation, samples in collect():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(labels.keys(), labels.values())} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _route():
+    if 'metrics_route' in g:
+        return g.metrics_route
+    if has_request_context():
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    return 'background'
+
+
+def record_stage(name, seconds):
+    """Add ``seconds`` to stage ``name`` of the current request or job."""
+    if not has_app_context():
+        return
+    metrics = current_app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.stages.observe(seconds, _route(), name)
+    if has_request_context():
+        timings = g.setdefault('stage_timings', {})
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as stage ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def server_timing(timings, total):
+    entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in timings.items()]
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+def _wants_profile(config):
+    token = config['PROFILE_TOKEN']
+    if token and hmac.compare_digest(request.headers.get('X-Profile', ''), token):
+        return True
+    rate = config['PROFILE_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    if _wants_profile(current_app.config):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active on this thread
+            return
+        g.profiler = profiler
+
+
+def _stop_profiler():
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return None
+    profiler.disable()
+    directory = current_app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    endpoint = (request.endpoint or 'unmatched').replace('.', '-')
+    name = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{endpoint}-{os.getpid()}.pstats"
+    profiler.dump_stats(os.path.join(directory, name))
+    _prune_profiles(directory)
+    return name
+
+
+def _prune_profiles(directory):
+    names = sorted(n for n in os.listdir(directory) if n.endswith('.pstats'))
+    for name in names[:-PROFILE_KEEP]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def _finish_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    profile = _stop_profiler()
+    if profile is not None:
+        response.headers['X-Profile-Id'] = profile
+    # Streamed bodies (e.g. exports) are produced after this point and not included
+    total = time.perf_counter() - started
+    current_app.extensions['metrics'].requests.observe(total, _route(), request.method, str(response.status_code))
+    if current_app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = server_timing(g.get('stage_timings', {}), total)
+    return response
+
+
+def _teardown_request(exc):
+    # Requests that raised never reach after_request; do not leave the profiler running
+    if 'profiler' in g:
+        g.pop('profiler').disable()
+
+
+def process_metrics():
+    """Resident memory and CPU time of this worker."""
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    samples = [
+        ('process_cpu_seconds_total', 'counter', 'User and system CPU time of this process.',
+         [({}, usage.ru_utime + usage.ru_stime)]),
+    ]
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        samples.append(('process_resident_memory_bytes', 'gauge', 'Resident memory of this process.',
+                        [({}, resident_pages * os.sysconf('SC_PAGE_SIZE'))]))
+    except (OSError, ValueError, AttributeError):
+        # Not Linux
+        pass
+    return samples
+
+
+def init_app(app):
+    metrics = app.extensions['metrics'] = Metrics()
+    metrics.add_collector(process_metrics)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
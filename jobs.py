@@ -0,0 +1,238 @@
+"""Background jobs for model training and full-history analytics.
+
+Tasks are plain functions registered with ``@task(name)``. They take the
+job's ``user_id`` and parameters as keyword arguments and return a
+JSON-serializable result. ``submit`` records a ``Job`` row in the main
+database and hands its id to the configured backend:
+
+- 'thread': a per-worker thread pool (the default).
+- 'redis': a Redis list drained by ``flask run-worker`` processes.
+- 'inline': runs the job before ``submit`` returns. Used for tests; an app
+  in testing mode gets it in place of 'thread'.
+
+Status and results live in the job table, so any web worker can answer
+``GET /api/jobs/<id>`` and serve the last completed result of a computation
+while a newer one runs. Submitting a job that is already queued or running
+for the same key, or that already ran for the same data version, returns the
+existing job instead of starting another.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app, g
+
+from models import db, Job
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+ACTIVE = (QUEUED, RUNNING)
+
+# Finished jobs kept per key; older ones are deleted when a new one finishes,
+# but only once they have been finished this many seconds, so a caller still
+# holding a job that just finished can read it
+KEEP_FINISHED = 3
+PRUNE_AFTER = 60
+
+REDIS_QUEUE = 'finance-jobs'
+
+# Times submit_and_wait resubmits a job whose row vanished while it waited
+SUBMIT_ATTEMPTS = 3
+
+TASKS = {}
+
+
+def task(name):
+    """Register a function as the task run by jobs called ``name``."""
+    def register(fn):
+        TASKS[name] = fn
+        return fn
+    return register
+
+
+def job_key(name, user_id):
+    return f'{name}:{user_id if user_id is not None else "*"}'
+
+
+class InlineBackend:
+    def __init__(self, app):
+        self.app = app
+
+    def enqueue(self, job_id):
+        run_job(self.app, job_id)
+
+
+class ThreadBackend:
+    """Runs jobs on a thread pool owned by the current worker process."""
+
+    def __init__(self, app, max_workers=2):
+        self.app = app
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, job_id):
+        with self._lock:
+            # Created on first use so every forked gunicorn worker gets its own pool
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        self._executor.submit(run_job, self.app, job_id)
+
+
+class RedisBackend:
+    """Pushes job ids onto a Redis list for ``flask run-worker`` to execute."""
+
+    def __init__(self, app, client, queue=REDIS_QUEUE):
+        self.app = app
+        self.client = client
+        self.queue = queue
+
+    def enqueue(self, job_id):
+        self.client.lpush(self.queue, job_id)
+
+    def work(self, max_jobs=None, timeout=5):
+        """Run queued jobs until ``max_jobs`` have been handled (forever if None)."""
+        handled = 0
+        while max_jobs is None or handled < max_jobs:
+            item = self.client.brpop(self.queue, timeout=timeout)
+            if item is None:
+                continue
+            job_id = item[1].decode() if isinstance(item[1], bytes) else item[1]
+            run_job(self.app, job_id)
+            handled += 1
+        return handled
+
+
+def create_backend(app):
+    """Build the backend selected by ``JOB_BACKEND`` ('thread', 'redis' or 'inline')."""
+    kind = app.config.get('JOB_BACKEND', 'thread')
+    if kind == 'thread' and app.testing:
+        # Keep tests deterministic
+        kind = 'inline'
+    if kind == 'inline':
+        return InlineBackend(app)
+    if kind == 'thread':
+        return ThreadBackend(app, max_workers=app.config.get('JOB_THREADS', 2))
+    if kind == 'redis':
+        client = app.config.get('JOB_REDIS_CLIENT')
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("JOB_BACKEND='redis' requires the redis package") from e
+            client = redis.Redis.from_url(app.config['REDIS_URL'])
+        return RedisBackend(app, client)
+    raise ValueError(f'Unknown JOB_BACKEND: {kind!r}')
+
+
+def _is_alive(job, now):
+    # A job stuck in an active state past JOB_TIMEOUT belonged to a dead worker
+    started = job.started_at or job.created_at
+    return started >= now - timedelta(seconds=current_app.config.get('JOB_TIMEOUT', 3600))
+
+
+def submit(name, user_id=None, data_version=None, **params):
+    """Queue job ``name`` unless an equivalent one is active or already ran; returns the Job."""
+    if name not in TASKS:
+        raise ValueError(f'Unknown job: {name!r}')
+    key = job_key(name, user_id)
+    now = datetime.utcnow()
+    for job in Job.query.filter(Job.key == key).order_by(Job.created_at.desc()).limit(KEEP_FINISHED + 1):
+        if job.status in ACTIVE and _is_alive(job, now):
+            return job
+        # A failed job is retried by the next submit rather than handed back
+        if data_version is not None and job.data_version == data_version and job.status == SUCCEEDED:
+            return job
+
+    job = Job(id=uuid.uuid4().hex, name=name, user_id=user_id, key=key, params=json.dumps(params),
+              data_version=data_version, status=QUEUED, created_at=now)
+    db.session.add(job)
+    db.session.commit()
+    current_app.extensions['jobs'].enqueue(job.id)
+    db.session.expire(job)
+    return job
+
+
+def run_job(app, job_id):
+    """Execute a queued job and record its outcome; safe to call from any thread."""
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        if job is None or job.status != QUEUED:
+            return
+        key = job.key
+        # Stage timings of the task are reported under this route in /metrics
+        g.metrics_route = f'job:{job.name}'
+        job.status = RUNNING
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+        try:
+            result = TASKS[job.name](user_id=job.user_id, **json.loads(job.params))
+            job.result = json.dumps(result)
+            job.status = SUCCEEDED
+        except Exception as e:
+            logger.exception('Job %s (%s) failed', job.id, job.name)
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            job.status = FAILED
+            job.error = f'{type(e).__name__}: {e}'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        _prune(key)
+
+
+def _prune(key):
+    cutoff = datetime.utcnow() - timedelta(seconds=PRUNE_AFTER)
+    finished = Job.query.filter(Job.key == key, Job.status.in_((SUCCEEDED, FAILED))) \
+        .order_by(Job.created_at.desc()).offset(KEEP_FINISHED).all()
+    finished = [job for job in finished if job.finished_at < cutoff]
+    for job in finished:
+        db.session.delete(job)
+    db.session.commit()
+
+
+def get(job_id):
+    return db.session.get(Job, job_id)
+
+
+def latest_result(name, user_id=None):
+    """The most recent successful Job for ``name`` and user, or None."""
+    return Job.query.filter(Job.key == job_key(name, user_id), Job.status == SUCCEEDED) \
+        .order_by(Job.created_at.desc()).first()
+
+
+def wait(job_id, timeout):
+    """Poll until the job has finished or ``timeout`` seconds pass; returns the Job.
+
+    Returns None if the job's row is gone, e.g. pruned or deleted meanwhile.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.01
+    while True:
+        db.session.expire_all()
+        job = db.session.get(Job, job_id)
+        if job is None or job.status not in ACTIVE or time.monotonic() >= deadline:
+            return job
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+
+
+def submit_and_wait(name, timeout, user_id=None, data_version=None, **params):
+    """``submit`` the job and ``wait`` up to ``timeout`` seconds for it; returns the Job.
+
+    A job whose row disappears while it is waited on is submitted again, so
+    the caller always gets a Job back.
+    """
+    deadline = time.monotonic() + timeout
+    for _ in range(SUBMIT_ATTEMPTS):
+        job = submit(name, user_id=user_id, data_version=data_version, **params)
+        # From the identity key: reading job.id would reload a row that may be gone
+        job_id = db.inspect(job).identity[0]
+        waited = wait(job_id, max(deadline - time.monotonic(), 0))
+        if waited is not None:
+            return waited
+    raise RuntimeError(f'Job {name!r} for user {user_id} disappeared {SUBMIT_ATTEMPTS} times while waited on')
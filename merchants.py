@@ -0,0 +1,153 @@
+"""Merchant name normalization and the merchant -> category index.
+
+Card feeds spell one merchant many ways ("STARBUCKS #1234", "Starbucks
+Store 88", "SQ *STARBUCKS"). ``normalize`` reduces them to a single key. The
+``MerchantIndex`` maps those keys to the category the merchant was given in
+the training history. It is built by ``FinanceMLModels.train_category_model``
+and shipped inside the category artifact, so every worker gets it with the
+forest. Known merchants are then resolved with a sorted-array lookup, and
+only the rest go through the forest.
+
+The index is held as fixed-width NumPy arrays (sorted keys, category codes
+and category names) rather than a dict of Python strings. Saved that way in
+the artifact, ``ModelStore.load`` maps it straight from the file, so every
+gunicorn worker shares the same page-cache pages instead of holding its own
+copy.
+"""
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+import numpy as np
+
+# Payment processor prefixes, e.g. "SQ *BLUE BOTTLE" or "TST* PIZZA PLACE"
+_PROCESSOR_PREFIX = re.compile(r'^(?:sq|tst|pp|sp|pos|paypal)\s*\*\s*')
+# Order or terminal references after a star, e.g. "AMZN MKTP US*2K3LL1ZT0"
+_STAR_REFERENCE = re.compile(r'\*\s*[a-z0-9]*\d[a-z0-9]*')
+# Store and branch numbers: "#1234", "store 88", "no. 5" and bare 3+ digit runs
+_STORE_NUMBER = re.compile(r'#\s*\d+|\b(?:store|no|unit|location)\.?\s*\d+\b|\b\d{3,}\b')
+# Dropped without leaving a gap, so "McDonald's" == "McDonalds" and "AT&T" == "ATT"
+_JOINERS = re.compile(r"['&]")
+_SEPARATORS = re.compile(r'[^a-z0-9]+')
+
+# A merchant is indexed once it has this many labelled rows...
+MIN_COUNT = 2
+# ...and at least this share of them carry its most common category.
+# Merchants that sell across categories (e.g. a marketplace) are left to the forest
+MIN_SHARE = 0.9
+
+
+@lru_cache(maxsize=65536)
+def normalize(merchant):
+    """Canonical lookup key for a raw merchant string ('' for blank input)."""
+    if merchant is None:
+        return ''
+    key = str(merchant).lower().strip()
+    key = _PROCESSOR_PREFIX.sub('', key)
+    key = _STAR_REFERENCE.sub(' ', key)
+    key = _STORE_NUMBER.sub(' ', key)
+    key = _JOINERS.sub('', key)
+    return _SEPARATORS.sub(' ', key).strip()
+
+
+class MerchantIndex:
+    """Exact and word-prefix lookup of normalized merchant names.
+
+    Immutable once built; ``arrays()`` and ``from_arrays`` convert to and from
+    the artifact form.
+    """
+
+    def __init__(self, entries=None):
+        # normalized merchant -> category; artifacts saved before the array
+        # form still carry the index as a dict
+        entries = dict(entries or {})
+        names = sorted(set(entries.values()))
+        codes = {name: i for i, name in enumerate(names)}
+        keys = sorted(entries)
+        self._set(np.array(keys, dtype=str),
+                  np.array([codes[entries[key]] for key in keys], dtype=np.int16),
+                  np.array(names, dtype=str))
+
+    def _set(self, keys, codes, categories):
+        self.keys = keys
+        self.codes = codes
+        self.categories = categories
+        self._longest = int(np.char.count(keys, ' ').max()) + 1 if len(keys) else 0
+
+    @classmethod
+    def from_arrays(cls, keys, codes, categories):
+        """Wrap arrays from ``arrays()``, e.g. memory-mapped from an artifact, without copying."""
+        index = cls.__new__(cls)
+        index._set(keys, codes, categories)
+        return index
+
+    def arrays(self):
+        """The index as plain arrays: sorted ``keys``, ``codes`` into ``categories``."""
+        return {'keys': self.keys, 'codes': self.codes, 'categories': self.categories}
+
+    @property
+    def entries(self):
+        return dict(zip(self.keys.tolist(), self.categories[self.codes].tolist()))
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, merchants, categories, min_count=MIN_COUNT, min_share=MIN_SHARE):
+        """Index every merchant whose history agrees on one category."""
+        counts = defaultdict(Counter)
+        for merchant, category in zip(merchants, categories):
+            key = normalize(merchant)
+            if key and category is not None:
+                counts[key][category] += 1
+        entries = {}
+        for key, by_category in counts.items():
+            category, count = by_category.most_common(1)[0]
+            total = sum(by_category.values())
+            if total >= min_count and count >= min_share * total:
+                entries[key] = category
+        return cls(entries)
+
+    def _find(self, keys):
+        """Position of each of ``keys`` in the index, or -1."""
+        if not len(self.keys) or not len(keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        keys = np.asarray(keys, dtype=str)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[positions] == keys, positions, -1)
+
+    def lookup(self, merchant):
+        """Return ``(category, exact)`` for a raw merchant, or ``(None, False)``.
+
+        Falls back to the longest indexed name that the merchant starts with,
+        word by word, so "Starbucks Reserve Roastery" resolves through
+        "starbucks".
+        """
+        categories, exact_hits, _ = self.resolve([merchant])
+        return categories[0], bool(exact_hits)
+
+    def resolve(self, merchants):
+        """Look up a batch; returns (categories with None for misses, exact hits, prefix hits)."""
+        keys = [normalize(merchant) for merchant in merchants]
+        found = self._find(keys)
+        exact_hits = int((found >= 0).sum())
+
+        # Every word prefix of the misses, longest first, in one more search
+        rows, prefixes = [], []
+        for i in np.flatnonzero(found < 0):
+            words = keys[i].split(' ')
+            for length in range(min(len(words) - 1, self._longest), 0, -1):
+                rows.append(i)
+                prefixes.append(' '.join(words[:length]))
+        prefix_hits = 0
+        if prefixes:
+            prefix_found = self._find(prefixes)
+            for i, position in zip(rows, prefix_found):
+                if position >= 0 and found[i] < 0:
+                    found[i] = position
+                    prefix_hits += 1
+
+        categories = np.empty(len(keys), dtype=object)
+        hit = found >= 0
+        categories[hit] = self.categories[self.codes[found[hit]]].tolist()
+        return categories, exact_hits, prefix_hits
@@ -0,0 +1,84 @@
+"""Versioned on-disk store for fitted model artifacts.
+
+Artifacts are written uncompressed with joblib as ``<name>-v<version>.joblib``
+so that readers can open them with ``mmap_mode='r'``. NumPy arrays in the
+payload are then mapped from the file rather than read into a buffer and
+copied; estimators that rebuild their own arrays on unpickle (sklearn trees)
+still end up with a private copy.
+
+A ``/`` in a name places its versions in a subdirectory, e.g.
+``anomaly/user7/model`` is stored as ``anomaly/user7/model-v<version>.joblib``.
+Listing the versions of a name only reads its own directory, so per-user
+models kept in per-user directories are found without scanning every user's
+artifacts.
+"""
+import os
+import re
+import tempfile
+
+
+class ModelStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, name, version):
+        return os.path.join(self.directory, f'{name}-v{version}.joblib')
+
+    def _directory(self, name):
+        return os.path.dirname(self._path(name, 0))
+
+    def versions(self, name):
+        """Return the stored versions of ``name`` in ascending order."""
+        try:
+            filenames = os.listdir(self._directory(name))
+        except FileNotFoundError:
+            return []
+        pattern = re.compile(rf'^{re.escape(os.path.basename(name))}-v(\d+)\.joblib$')
+        return sorted(int(m.group(1)) for m in map(pattern.match, filenames) if m)
+
+    def latest_version(self, name):
+        versions = self.versions(name)
+        return versions[-1] if versions else None
+
+    def save(self, name, payload):
+        """Persist ``payload`` as the next version of ``name`` and return it."""
+        import joblib
+
+        directory = self._directory(name)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump(payload, tmp_path)
+            while True:
+                version = (self.latest_version(name) or 0) + 1
+                try:
+                    # link() refuses to overwrite, so two concurrent trainers
+                    # can never publish the same version number
+                    os.link(tmp_path, self._path(name, version))
+                    return version
+                except FileExistsError:
+                    continue
+        finally:
+            os.unlink(tmp_path)
+
+    def load(self, name, version=None, mmap_mode='r'):
+        """Load a version of ``name`` (the latest by default).
+
+        Returns ``(version, payload)`` or ``(None, None)`` if nothing is stored.
+        """
+        import joblib
+
+        if version is None:
+            version = self.latest_version(name)
+            if version is None:
+                return None, None
+        return version, joblib.load(self._path(name, version), mmap_mode=mmap_mode)
+
+    def prune(self, name, keep=3):
+        """Delete all but the newest ``keep`` versions of ``name``."""
+        for version in self.versions(name)[:-keep]:
+            try:
+                os.unlink(self._path(name, version))
+            except FileNotFoundError:
+                pass
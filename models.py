@@ -0,0 +1,184 @@
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+
+db = SQLAlchemy()
+
+# Database Models
+class Transaction(db.Model):
+    __table_args__ = (
+        # Keyset pagination and date-range scans
+        db.Index('ix_transaction_user_date_id', 'user_id', 'date', 'id'),
+        # Category filters within a date range
+        db.Index('ix_transaction_user_category_date', 'user_id', 'category', 'date'),
+        # Flagged-row lookups for /api/anomalies
+        db.Index('ix_transaction_user_anomaly_date', 'user_id', 'is_anomaly', 'date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    amount = db.Column(db.Float, nullable=False)
+    merchant = db.Column(db.String(200), nullable=False)
+    category = db.Column(db.String(100))
+    date = db.Column(db.DateTime, nullable=False)
+    description = db.Column(db.Text)
+    user_id = db.Column(db.Integer, default=1)
+    # Scored against the user's persisted anomaly model; NULL until one is fitted
+    anomaly_score = db.Column(db.Float)
+    is_anomaly = db.Column(db.Boolean)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'amount': self.amount,
+            'merchant': self.merchant,
+            'category': self.category,
+            'date': self.date.strftime('%Y-%m-%d %H:%M:%S'),
+            'description': self.description
+        }
+
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    income = db.Column(db.Float, default=0)
+    budget = db.Column(db.Float, default=0)
+
+class SpendingAggregate(db.Model):
+    """Running per-user, per-category, per-month sums maintained on write."""
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'category', 'month', name='uq_spending_aggregate_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    # Uncategorized transactions are bucketed under '' since NULLs never
+    # collide in a unique constraint
+    category = db.Column(db.String(100), nullable=False, default='')
+    month = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    total = db.Column(db.Float, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailySpending(db.Model):
+    """Per-user, per-category, per-day sum, count and extremes maintained on write."""
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'category', 'day', name='uq_daily_spending_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    category = db.Column(db.String(100), nullable=False, default='')
+    day = db.Column(db.String(10), nullable=False)  # YYYY-MM-DD
+    total = db.Column(db.Float, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    min_amount = db.Column(db.Float, nullable=False)
+    max_amount = db.Column(db.Float, nullable=False)
+
+
+class DataVersion(db.Model):
+    """Per-user counter bumped by every write; part of each response cache key."""
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    # Bumped by anomaly refits, which rescore rows without changing the data
+    anomaly_version = db.Column(db.Integer, default=0)
+
+
+class ForecastState(db.Model):
+    """Fitted forecaster state per user and series ('' is total spending), as JSON."""
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    series = db.Column(db.String(100), primary_key=True)
+    state = db.Column(db.Text, nullable=False)
+
+
+class Job(db.Model):
+    """A background computation and, once it succeeds, its JSON result (see ``jobs``)."""
+    __table_args__ = (
+        # Dedup of active jobs and lookup of the latest result per key
+        db.Index('ix_job_key_created', 'key', 'created_at'),
+    )
+    
+    id = db.Column(db.String(32), primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    user_id = db.Column(db.Integer)
+    # name plus user, identifying jobs that compute the same thing
+    key = db.Column(db.String(200), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')
+    # User's data version the job was submitted for, if it reads user data
+    data_version = db.Column(db.Integer)
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'data_version': self.data_version,
+            'error': self.error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S') if self.started_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
+        }
+
+
+class ReportRun(db.Model):
+    """One nightly pass computing every user's reports (see ``reports``)."""
+    id = db.Column(db.Integer, primary_key=True)
+    # Day the reports describe (YYYY-MM-DD); a resumed run keeps it
+    as_of = db.Column(db.String(10), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='running')
+    users_total = db.Column(db.Integer, nullable=False, default=0)
+    users_done = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'as_of': self.as_of,
+            'status': self.status,
+            'users_total': self.users_total,
+            'users_done': self.users_done,
+            'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
+        }
+
+
+class UserReport(db.Model):
+    """One user's reports from a ``ReportRun``, as JSON."""
+    __table_args__ = (
+        db.UniqueConstraint('run_id', 'user_id', name='uq_user_report_run_user'),
+        # Latest report of a user
+        db.Index('ix_user_report_user_run', 'user_id', 'run_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+
+def ensure_schema(engine, include=None, exclude=()):
+    """Bring an existing database up to date with the models.
+
+    ``create_all`` only creates missing tables, so nullable columns and
+    indexes added to a table that already exists are created here.
+    ``include``/``exclude`` restrict the tables by name (see ``shards``).
+    """
+    tables = [table for table in db.metadata.sorted_tables
+              if (include is None or table.name in include) and table.name not in exclude]
+    db.metadata.create_all(bind=engine, tables=tables)
+    inspector = inspect(engine)
+    for table in tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=engine.dialect)
+                with engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,239 @@
+"""Per-user reports and the nightly run that precomputes them for every user.
+
+The reports behind /api/analytics, /api/health-score,
+/api/budget-recommendations and /api/category-performance are pure
+functions of one user's data. The endpoints and :func:`user_reports` share
+them.
+
+:func:`run_nightly` (``flask run-nightly-reports``, meant for cron) computes
+them for every user. Users are split into chunks of ``chunk_size``, and the
+chunks are farmed out to a pool of ``workers`` processes. Each process reads
+its users one at a time and returns their reports as JSON. The parent
+inserts each chunk's rows as ``UserReport`` rows in one statement. Progress
+(``users_done`` of ``users_total``) is committed in the same transaction, so
+a crashed or killed run is resumed by the next invocation: users that already
+have a report in the unfinished run are skipped. Only the newest
+``REPORT_RUNS_KEEP`` finished runs are kept.
+"""
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+
+import aggregates
+import budgets
+import column_store
+import rollup
+import shards
+from instrumentation import stage
+from models import db, ReportRun, Transaction, User, UserReport
+
+RUNNING, SUCCEEDED, ABANDONED = 'running', 'succeeded', 'abandoned'
+
+CHUNK_SIZE = 100
+
+REPORT_RUNS_KEEP = 7
+
+# Settings a pool process needs to reach the same databases as the parent
+WORKER_CONFIG = ('SQLALCHEMY_DATABASE_URI', 'SHARD_COUNT', 'SHARD_DATABASE_URL', 'DATABASE_PROFILE')
+
+# The app of a pool process, created by _init_worker
+_worker_app = None
+
+
+def analytics(summary, recent_spending):
+    """The /api/analytics payload from an aggregate ``summary`` and the last 30 days' spending."""
+    if not summary['total_transactions']:
+        return {'error': 'No transactions found'}
+
+    return {
+        'total_spent': summary['total_spent'],
+        'avg_transaction': summary['avg_transaction'],
+        'total_transactions': summary['total_transactions'],
+        'category_breakdown': summary['category_breakdown'],
+        'monthly_spending': summary['monthly_spending'],
+        'recent_spending': recent_spending
+    }
+
+
+def health_score(summary):
+    """The /api/health-score payload from an aggregate ``summary``."""
+    if not summary['total_transactions']:
+        return {'score': 0, 'factors': []}
+
+    # Calculate health score factors
+    avg_transaction = summary['avg_transaction']
+    num_transactions = summary['total_transactions']
+
+    # Simple scoring algorithm
+    score = 100
+
+    # Penalize high average transaction amount
+    if avg_transaction > 100:
+        score -= 20
+
+    # Penalize high number of transactions
+    if num_transactions > 500:
+        score -= 15
+
+    # Bonus for diverse spending categories
+    unique_categories = summary['unique_categories']
+    if unique_categories > 5:
+        score += 10
+
+    score = max(0, min(100, score))
+
+    factors = [
+        f'Average transaction: ${avg_transaction:.2f}',
+        f'Total transactions: {num_transactions}',
+        f'Spending categories: {unique_categories}'
+    ]
+
+    return {'score': score, 'factors': factors}
+
+
+def budget_recommendations(columns, as_of, income=0.0, budget=0.0):
+    """The /api/budget-recommendations payload from a user's ``column_store.Columns``
+    and their monthly ``income`` and ``budget`` (see ``budgets``)."""
+    with stage('compute'):
+        return budgets.recommend(budgets.monthly_profile(columns, as_of), income, budget)
+
+
+def budget_settings(user_id):
+    """The user's monthly ``(income, budget)``, zeros when unset."""
+    user = db.session.get(User, user_id)
+    return (user.income or 0.0, user.budget or 0.0) if user is not None else (0.0, 0.0)
+
+
+def user_reports(session, user_id, as_of):
+    """Every report for one user, with recent spending counted up to day ``as_of``."""
+    from analytics import category_performance_from_rollup
+
+    summary = aggregates.read_summary(session, user_id)
+    recent_spending = aggregates.spending_between(session, user_id, start=as_of - timedelta(days=30), end=as_of)
+    columns = column_store.load_columns(session, user_id, cached=False)
+    buckets = rollup.Rollup.load(session, user_id)
+    return {
+        'analytics': analytics(summary, recent_spending),
+        'health_score': health_score(summary),
+        'budget_recommendations': budget_recommendations(columns, as_of, *budget_settings(user_id)),
+        'category_performance': {'categories': category_performance_from_rollup(buckets)},
+    }
+
+
+def compute_chunk(user_ids, as_of):
+    """``[(user_id, reports JSON)]`` for ``user_ids``; needs an app context."""
+    return [(user_id, json.dumps(user_reports(shards.session_for(user_id), user_id, as_of)))
+            for user_id in user_ids]
+
+
+def _init_worker(config):
+    global _worker_app
+    from app import create_app
+
+    _worker_app = create_app(config)
+
+
+def _compute_chunk_in_worker(user_ids, as_of):
+    with _worker_app.app_context():
+        return compute_chunk(user_ids, as_of)
+
+
+def all_user_ids():
+    """Ids of every user with a ``User`` row or any transactions, ascending."""
+    ids = {user_id for (user_id,) in db.session.query(User.id)}
+    for session in shards.all_sessions():
+        ids.update(user_id for (user_id,) in session.query(Transaction.user_id).distinct() if user_id is not None)
+    return sorted(ids)
+
+
+def _chunk_results(app, chunks, as_of, workers):
+    """Yield each chunk's results as it completes, computed in a pool of ``workers`` processes."""
+    if workers <= 1:
+        for chunk in chunks:
+            yield compute_chunk(chunk, as_of)
+        return
+
+    # Spawned rather than forked: each process opens its own connections and
+    # nothing is inherited from a parent that may be running threads
+    config = dict({key: app.config[key] for key in WORKER_CONFIG if key in app.config}, COLUMN_STORE_BYTES=0)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(config,)) as pool:
+        futures = [pool.submit(_compute_chunk_in_worker, chunk, as_of) for chunk in chunks]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def _store(run, results):
+    now = datetime.utcnow()
+    if results:
+        db.session.execute(insert(UserReport), [
+            {'run_id': run.id, 'user_id': user_id, 'body': body, 'computed_at': now}
+            for user_id, body in results
+        ])
+    run.users_done += len(results)
+    db.session.commit()
+
+
+def _prune(keep=REPORT_RUNS_KEEP):
+    finished = ReportRun.query.filter(ReportRun.status != RUNNING).order_by(ReportRun.id.desc()).offset(keep).all()
+    for run in finished:
+        UserReport.query.filter(UserReport.run_id == run.id).delete()
+        db.session.delete(run)
+    db.session.commit()
+
+
+def run_nightly(app, workers=1, chunk_size=CHUNK_SIZE, as_of=None, restart=False, progress=None):
+    """Compute and store every user's reports; returns the finished ``ReportRun``.
+
+    An unfinished run is resumed (keeping its ``as_of`` day) unless
+    ``restart`` abandons it. ``progress(run, users_per_second)`` is called
+    after each stored chunk. Needs an app context.
+    """
+    run = ReportRun.query.filter(ReportRun.status == RUNNING).order_by(ReportRun.id.desc()).first()
+    if run is not None and restart:
+        run.status = ABANDONED
+        run.finished_at = datetime.utcnow()
+        run = None
+    if run is None:
+        run = ReportRun(as_of=(as_of or date.today()).isoformat(), status=RUNNING, started_at=datetime.utcnow())
+        db.session.add(run)
+    db.session.commit()
+
+    done = {user_id for (user_id,) in db.session.query(UserReport.user_id).filter(UserReport.run_id == run.id)}
+    users = [user_id for user_id in all_user_ids() if user_id not in done]
+    run.users_total = len(done) + len(users)
+    run.users_done = len(done)
+    db.session.commit()
+
+    as_of_day = date.fromisoformat(run.as_of)
+    chunks = [users[i:i + chunk_size] for i in range(0, len(users), chunk_size)]
+    started = time.perf_counter()
+    computed = 0
+    for results in _chunk_results(app, chunks, as_of_day, workers):
+        _store(run, results)
+        computed += len(results)
+        if progress is not None:
+            progress(run, computed / max(time.perf_counter() - started, 1e-9))
+
+    run.status = SUCCEEDED
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    _prune()
+    return run
+
+
+def latest_report(user_id):
+    """The user's newest ``UserReport`` and its ``ReportRun``, or ``(None, None)``."""
+    report = UserReport.query.filter(UserReport.user_id == user_id).order_by(UserReport.run_id.desc()).first()
+    if report is None:
+        return None, None
+    return report, db.session.get(ReportRun, report.run_id)
@@ -0,0 +1,270 @@
+"""Date-range spending analytics over the daily aggregate buckets.
+
+:meth:`Rollup.load` reads a user's ``DailySpending`` rows into
+(category x day) NumPy arrays with a column per day that has spending, plus
+running sums along the day axis. A date maps to its prefix entry by a binary
+search over the sorted days, so the total and count of any window is the
+difference of two prefix entries, O(categories + log days). A
+day/week/month/quarter grouping is one subtraction over the period edges,
+O(categories x periods). Smallest and largest amounts are reduced per period
+from the daily extremes, O(days with spending in the range).
+
+:func:`range_report` turns a rollup into the /api/analytics/range payload.
+"""
+import numpy as np
+
+from aggregates import UNCATEGORIZED
+from models import DailySpending
+
+GROUPINGS = ('day', 'week', 'month', 'quarter')
+# Windows a range can be compared with: the one just before it, or the same dates a year earlier
+COMPARISONS = ('previous', 'year')
+
+
+def _day(value):
+    return np.datetime64(value, 'D')
+
+
+def period_starts(start, end, grouping):
+    """First day of every ``grouping`` period overlapping ``start``..``end``.
+
+    Weeks start on Monday and quarters in January, April, July and October.
+    """
+    start, end = _day(start), _day(end)
+    if grouping == 'day':
+        return np.arange(start, end + 1, dtype='datetime64[D]')
+    if grouping == 'week':
+        # 1970-01-01 was a Thursday
+        first = start - (start.astype(np.int64) + 3) % 7
+        return np.arange(first, end + 1, 7, dtype='datetime64[D]')
+    step = 1 if grouping == 'month' else 3
+    first = start.astype('datetime64[M]')
+    if grouping == 'quarter':
+        first -= first.astype(np.int64) % 3
+    months = np.arange(first, end.astype('datetime64[M]') + 1, step, dtype='datetime64[M]')
+    return months.astype('datetime64[D]')
+
+
+def _shift(starts, grouping):
+    """``starts`` moved ``grouping`` periods back by one."""
+    if grouping in ('day', 'week'):
+        return starts - (1 if grouping == 'day' else 7)
+    months = starts.astype('datetime64[M]') - (1 if grouping == 'month' else 3)
+    return months.astype('datetime64[D]')
+
+
+class Rollup:
+    """One user's daily buckets as sparse arrays with prefix sums.
+
+    ``categories`` are sorted, with '' for uncategorized spending. Column
+    ``i`` of the arrays is the day ``days[i]``; only days with spending have a
+    column, so a far-dated transaction costs one column, not the days between.
+    """
+
+    def __init__(self, categories, days, totals, counts, mins, maxs):
+        self.categories = list(categories)
+        self.days = days
+        self.totals = totals
+        self.counts = counts
+        # Categories without spending on a day hold +inf / -inf so they never win a min or max
+        self.mins = mins
+        self.maxs = maxs
+        shape = (len(self.categories), len(days) + 1)
+        self._total_sums = np.zeros(shape)
+        self._count_sums = np.zeros(shape, dtype=np.int64)
+        np.cumsum(totals, axis=1, out=self._total_sums[:, 1:])
+        np.cumsum(counts, axis=1, out=self._count_sums[:, 1:])
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (category, 'YYYY-MM-DD', total, count, min, max) tuples."""
+        if not rows:
+            empty = np.zeros((0, 0))
+            return cls([], np.array([], dtype='datetime64[D]'), empty, empty.astype(np.int64), empty, empty)
+        categories, days, totals, counts, mins, maxs = zip(*rows)
+        names = sorted(set(categories))
+        index = {name: i for i, name in enumerate(names)}
+        rows_at = np.fromiter((index[c] for c in categories), dtype=np.int64, count=len(categories))
+        unique_days, columns = np.unique(np.array(days, dtype='datetime64[D]'), return_inverse=True)
+        shape = (len(names), len(unique_days))
+
+        sparse_totals = np.zeros(shape)
+        sparse_counts = np.zeros(shape, dtype=np.int64)
+        sparse_mins = np.full(shape, np.inf)
+        sparse_maxs = np.full(shape, -np.inf)
+        # Buckets are unique per (category, day), so plain assignment is enough
+        sparse_totals[rows_at, columns] = totals
+        sparse_counts[rows_at, columns] = counts
+        sparse_mins[rows_at, columns] = mins
+        sparse_maxs[rows_at, columns] = maxs
+        return cls(names, unique_days, sparse_totals, sparse_counts, sparse_mins, sparse_maxs)
+
+    @classmethod
+    def load(cls, session, user_id):
+        rows = session.query(
+            DailySpending.category,
+            DailySpending.day,
+            DailySpending.total,
+            DailySpending.count,
+            DailySpending.min_amount,
+            DailySpending.max_amount,
+        ).filter(DailySpending.user_id == user_id).all()
+        return cls.from_rows(rows)
+
+    @property
+    def empty(self):
+        return not self.categories
+
+    @property
+    def start(self):
+        """The first day with spending."""
+        return None if self.empty else self.days[0]
+
+    @property
+    def end(self):
+        """The last day with spending."""
+        return None if self.empty else self.days[-1]
+
+    def _offsets(self, days):
+        """Prefix-array positions of ``days``: the number of columns before each."""
+        return np.searchsorted(self.days, np.asarray(days, dtype='datetime64[D]'))
+
+    def window(self, start, end):
+        """Per-category (totals, counts) of the days ``start``..``end``, both inclusive."""
+        lo, hi = self._offsets([_day(start), _day(end) + 1])
+        hi = max(lo, hi)
+        return (self._total_sums[:, hi] - self._total_sums[:, lo],
+                self._count_sums[:, hi] - self._count_sums[:, lo])
+
+    def periods(self, starts, end):
+        """Per-category totals, counts, mins and maxs of consecutive periods.
+
+        Period ``i`` runs from ``starts[i]`` to the day before ``starts[i + 1]``;
+        the last one ends on ``end``. Each result has shape
+        (categories, periods); periods without spending have inf/-inf extremes.
+        """
+        starts = np.asarray(starts, dtype='datetime64[D]')
+        edges = self._offsets(np.append(starts, _day(end) + 1))
+        edges = np.maximum.accumulate(edges)
+        lo, hi = edges[:-1], edges[1:]
+        totals = self._total_sums[:, hi] - self._total_sums[:, lo]
+        counts = self._count_sums[:, hi] - self._count_sums[:, lo]
+
+        shape = (len(self.categories), len(starts))
+        mins = np.full(shape, np.inf)
+        maxs = np.full(shape, -np.inf)
+        filled = hi > lo
+        if filled.any() and self.categories:
+            # reduceat over the covered columns; empty periods would repeat a neighbour's column
+            first, last = lo[filled][0], hi[filled][-1]
+            mins[:, filled] = np.minimum.reduceat(self.mins[:, first:last], lo[filled] - first, axis=1)
+            maxs[:, filled] = np.maximum.reduceat(self.maxs[:, first:last], lo[filled] - first, axis=1)
+        return totals, counts, mins, maxs
+
+
+def _amount(value):
+    return round(float(value), 2) if np.isfinite(value) else None
+
+
+def _change(current, previous):
+    return {
+        'change': round(float(current - previous), 2),
+        'change_pct': round(float((current - previous) / previous * 100), 2) if previous else None,
+    }
+
+
+def _year_earlier(day):
+    date = day.astype(object)
+    # 29 February maps to the 28th
+    return _day(date.replace(year=date.year - 1, day=min(date.day, 28) if date.month == 2 else date.day))
+
+
+def comparison_window(start, end, compare):
+    """The (first, last) day ``start``..``end`` is compared with under ``compare``.
+
+    Raises ValueError when there is no such window, i.e. a year before year 1.
+    """
+    start, end = _day(start), _day(end)
+    if compare == 'previous':
+        first = start - (end - start) - 1
+    elif start.astype('datetime64[Y]').astype(np.int64) + 1970 <= 1:
+        raise ValueError('There is no year before year 1 to compare with')
+    else:
+        first = _year_earlier(start)
+    return first, first + (end - start)
+
+
+def range_report(rollup, start, end, grouping=None, compare=None):
+    """Spending between ``start`` and ``end`` (inclusive dates).
+
+    With ``grouping`` (one of GROUPINGS) the range is split into calendar
+    periods; the first and last may be partial. Each period carries its change
+    from the period before it. With ``compare`` (one of COMPARISONS) the whole
+    range is compared with an earlier window of the same length.
+    """
+    start, end = _day(start), _day(end)
+    categorized = np.array([name != UNCATEGORIZED for name in rollup.categories], dtype=bool)
+    names = [name for name in rollup.categories if name != UNCATEGORIZED]
+
+    totals, counts, mins, maxs = (values[:, 0] for values in rollup.periods([start], end))
+    total, count = float(totals.sum()), int(counts.sum())
+    report = {
+        'from': str(start),
+        'to': str(end),
+        'total': round(total, 2),
+        'count': count,
+        'avg': round(total / count, 2) if count else 0.0,
+        'min': _amount(mins.min(initial=np.inf)),
+        'max': _amount(maxs.max(initial=-np.inf)),
+        'categories': {
+            name: {'total': round(float(t), 2), 'count': int(c), 'min': _amount(lo), 'max': _amount(hi)}
+            for name, t, c, lo, hi in zip(names, totals[categorized], counts[categorized],
+                                          mins[categorized], maxs[categorized])
+            if c
+        },
+    }
+
+    if grouping is not None:
+        starts = period_starts(start, end, grouping)
+        bounds = np.append(starts[1:] - 1, end)
+        # The first period is compared with the whole calendar period before it
+        before = rollup.window(_shift(starts[:1], grouping)[0], starts[0] - 1)[0].sum()
+        starts[0] = start
+        period_totals, period_counts, period_mins, period_maxs = rollup.periods(starts, end)
+        by_period = period_totals.sum(axis=0)
+        previous = np.append(before, by_period[:-1])
+        report['grouping'] = grouping
+        report['periods'] = [
+            dict({
+                'start': str(starts[i]),
+                'end': str(bounds[i]),
+                'total': round(float(by_period[i]), 2),
+                'count': int(period_counts[:, i].sum()),
+                'min': _amount(period_mins[:, i].min(initial=np.inf)),
+                'max': _amount(period_maxs[:, i].max(initial=-np.inf)),
+                'categories': {
+                    name: round(float(t), 2)
+                    for name, t, c in zip(names, period_totals[categorized, i], period_counts[categorized, i])
+                    if c
+                },
+            }, **_change(by_period[i], previous[i]))
+            for i in range(len(starts))
+        ]
+
+    if compare is not None:
+        previous_start, previous_end = comparison_window(start, end, compare)
+        previous_totals, previous_counts = rollup.window(previous_start, previous_end)
+        previous_total = float(previous_totals.sum())
+        report['comparison'] = dict({
+            'mode': compare,
+            'from': str(previous_start),
+            'to': str(previous_end),
+            'total': round(previous_total, 2),
+            'count': int(previous_counts.sum()),
+            'categories': {
+                name: dict({'total': round(float(p), 2)}, **_change(c, p))
+                for name, c, p in zip(names, totals[categorized], previous_totals[categorized])
+                if c or p
+            },
+        }, **_change(total, previous_total))
+    return report
@@ -0,0 +1,139 @@
+"""Synthetic transactions for demos, local development and benchmarks.
+
+Rows are drawn with NumPy a chunk at a time and each chunk is inserted with
+a single executemany, so seeding stays fast and memory stays flat at any
+size. Seeding is an explicit step
+(``flask seed-sample-data``); the app never writes sample rows on its own.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import insert
+
+import aggregates
+from data_access import bump_data_version
+from models import Transaction
+
+MERCHANTS = {
+    'Food & Dining': ['McDonald\'s', 'Starbucks', 'Chipotle', 'Pizza Hut', 'Subway'],
+    'Transportation': ['Uber', 'Lyft', 'Shell', 'Exxon', 'Metro'],
+    'Shopping': ['Amazon', 'Walmart', 'Target', 'Best Buy', 'Macy\'s'],
+    'Entertainment': ['Netflix', 'Spotify', 'Movie Theater', 'Concert Hall', 'Arcade'],
+    'Healthcare': ['CVS Pharmacy', 'Walgreens', 'Doctor Office', 'Dental Clinic', 'Hospital'],
+    'Utilities': ['Electric Company', 'Water Company', 'Internet Provider', 'Phone Company', 'Gas Company'],
+    'Education': ['University', 'Online Course', 'Bookstore', 'Library', 'Tutoring'],
+    'Travel': ['Airline', 'Hotel', 'Car Rental', 'Travel Agency', 'Tour Guide'],
+    'Insurance': ['Car Insurance', 'Health Insurance', 'Home Insurance', 'Life Insurance'],
+    'Other': ['ATM Withdrawal', 'Bank Transfer', 'Cash Deposit', 'Investment', 'Donation']
+}
+
+CATEGORIES = list(MERCHANTS)
+
+# Share of transactions and median amount of each category when realistic=True
+CATEGORY_PROFILES = {
+    'Food & Dining': (0.30, 18.0),
+    'Transportation': (0.17, 25.0),
+    'Shopping': (0.20, 45.0),
+    'Entertainment': (0.08, 20.0),
+    'Healthcare': (0.04, 60.0),
+    'Utilities': (0.05, 90.0),
+    'Education': (0.02, 80.0),
+    'Travel': (0.03, 250.0),
+    'Insurance': (0.03, 150.0),
+    'Other': (0.08, 100.0),
+}
+
+# Spread of the log-normal amounts around each category's median
+AMOUNT_SIGMA = 0.6
+
+# Saturdays and Sundays see this many times the transactions of a weekday
+WEEKEND_WEIGHT = 1.4
+
+INSERT_CHUNK_SIZE = 50_000
+
+
+def _draw_uniform(rng, count, days, start):
+    category_codes = rng.integers(len(CATEGORIES), size=count)
+    # Pick a merchant index within each row's category
+    merchant_counts = np.array([len(MERCHANTS[c]) for c in CATEGORIES])
+    merchant_codes = (rng.random(count) * merchant_counts[category_codes]).astype(np.int64)
+    amounts = np.round(rng.uniform(5, 500, size=count), 2)
+    offsets = rng.integers(0, days + 1, size=count)
+    return category_codes, merchant_codes, amounts, offsets
+
+
+def _draw_realistic(rng, count, days, start):
+    shares, medians = (np.array(values) for values in zip(*CATEGORY_PROFILES.values()))
+    category_codes = rng.choice(len(CATEGORIES), size=count, p=shares / shares.sum())
+
+    # Merchant popularity falls off as 1/rank within each category
+    width = max(len(merchants) for merchants in MERCHANTS.values())
+    cdf = np.ones((len(CATEGORIES), width))
+    for c, category in enumerate(CATEGORIES):
+        weights = 1.0 / np.arange(1, len(MERCHANTS[category]) + 1)
+        cdf[c, :len(weights)] = np.cumsum(weights) / weights.sum()
+    merchant_codes = (rng.random(count)[:, None] > cdf[category_codes]).sum(axis=1)
+
+    amounts = np.round(np.maximum(rng.lognormal(np.log(medians[category_codes]), AMOUNT_SIGMA), 1.0), 2)
+
+    weekdays = (np.arange(days + 1) + start.weekday()) % 7
+    day_weights = np.where(weekdays >= 5, WEEKEND_WEIGHT, 1.0)
+    offsets = rng.choice(days + 1, size=count, p=day_weights / day_weights.sum())
+    return category_codes, merchant_codes, amounts, offsets
+
+
+def iter_chunks(count=1000, user_id=1, days=365, end=None, seed=None, realistic=False,
+                chunk_size=INSERT_CHUNK_SIZE):
+    """Yield ``count`` generated transaction dicts in lists of ``chunk_size``.
+
+    Only one chunk is held in memory at a time, so this scales to millions
+    of rows. By default categories and merchants are uniform and amounts
+    uniform between 5 and 500. With ``realistic`` the categories follow
+    CATEGORY_PROFILES, popular merchants dominate, amounts are log-normal
+    around each category's median and weekends are busier.
+    """
+    rng = np.random.default_rng(seed)
+    end = end or datetime.now()
+    start = end - timedelta(days=days)
+    draw = _draw_realistic if realistic else _draw_uniform
+
+    for chunk_start in range(0, count, chunk_size):
+        n = min(chunk_size, count - chunk_start)
+        category_codes, merchant_codes, amounts, offsets = draw(rng, n, days, start)
+
+        day_dates = {offset: start + timedelta(days=int(offset)) for offset in np.unique(offsets).tolist()}
+        rows = []
+        for c, m, amount, offset in zip(category_codes.tolist(), merchant_codes.tolist(),
+                                        amounts.tolist(), offsets.tolist()):
+            category = CATEGORIES[c]
+            merchant = MERCHANTS[category][m]
+            rows.append({
+                'amount': amount,
+                'merchant': merchant,
+                'category': category,
+                'date': day_dates[offset],
+                'description': f'Transaction at {merchant}',
+                'user_id': user_id,
+            })
+        yield rows
+
+
+def generate(count=1000, user_id=1, days=365, end=None, seed=None, realistic=False):
+    """Return ``count`` transaction dicts spread over the ``days`` before ``end``.
+
+    See ``iter_chunks`` for the distributions.
+    """
+    return [row for chunk in iter_chunks(count, user_id, days, end, seed, realistic, chunk_size=max(count, 1))
+            for row in chunk]
+
+
+def seed_transactions(session, count=1000, user_id=1, days=365, seed=None, realistic=False):
+    """Insert ``count`` generated rows for ``user_id`` and commit; returns ``count``."""
+    inserted = 0
+    for chunk in iter_chunks(count, user_id=user_id, days=days, seed=seed, realistic=realistic):
+        session.execute(insert(Transaction), chunk)
+        aggregates.apply_transactions(session, chunk)
+        inserted += len(chunk)
+    bump_data_version(session, user_id)
+    session.commit()
+    return inserted
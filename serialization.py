@@ -0,0 +1,169 @@
+"""JSON encoding and compression of API responses.
+
+``init_app`` replaces Flask's JSON provider, so ``jsonify`` (and returning a
+dict or list from a view) accepts NumPy arrays, NumPy scalars and
+``datetime64`` values as well as everything Flask's default provider does.
+Views can therefore return columns straight from arrays instead of building
+a dict per row.
+
+``JSON_BACKEND`` picks the encoder:
+
+  auto     orjson when it is installed, otherwise the stdlib encoder
+  orjson   orjson; a RuntimeError at start-up if it is missing
+  stdlib   ``json`` with NumPy values converted in ``default``
+
+Both produce the same JSON for the same values: keys sorted, ``datetime64``
+as ISO 8601 (``2024-01-31T12:00:00``) and Python dates as HTTP dates, as
+Flask does. The exceptions are non-ASCII text, which orjson writes as UTF-8
+rather than escaping, and NaN and infinity, which it writes as null. Values
+orjson rejects (integers over 64 bits, ``NaT``) are encoded by the stdlib
+encoder instead of failing the request. orjson 3.8 aborts the process on
+``NaT`` inside a ``datetime64`` array, so views must not put missing dates
+in one; transaction dates are never null.
+
+Non-streamed text and JSON responses of at least ``COMPRESS_MIN_BYTES`` are
+compressed when the client accepts it: brotli if the ``brotli`` package is
+installed and preferred by the client, otherwise gzip. ``COMPRESS_MIN_BYTES``
+of 0 disables compression, e.g. behind a proxy that already compresses.
+Compressed responses carry a weak ETag; If-None-Match is compared weakly, so
+304s work for either representation.
+"""
+import gzip
+
+import numpy as np
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+from instrumentation import stage
+
+BACKENDS = ('auto', 'orjson', 'stdlib')
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+def _datetime64_strings(values):
+    # Through datetime objects so the format matches orjson's (microseconds
+    # only when non-zero); NaT becomes None
+    return [None if v is None else v.isoformat() for v in values.astype('datetime64[us]').tolist()]
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, extended to NumPy arrays, scalars and ``datetime64``."""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, np.ndarray):
+            if o.dtype.kind == 'M':
+                return _datetime64_strings(o)
+            return o.tolist()
+        if isinstance(o, np.datetime64):
+            return _datetime64_strings(np.array([o]))[0]
+        if isinstance(o, np.generic):
+            return o.item()
+        return DefaultJSONProvider.default(o)
+
+
+class OrjsonProvider(NumpyJSONProvider):
+    """:class:`NumpyJSONProvider` with the encoding done by orjson."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson
+
+        self._orjson = orjson
+        # Dates are passed to ``default`` so they keep Flask's format
+        self._options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _encode(self, obj, indent=False):
+        options = self._options
+        if self.sort_keys:
+            options |= self._orjson.OPT_SORT_KEYS
+        if indent:
+            options |= self._orjson.OPT_INDENT_2
+        try:
+            return self._orjson.dumps(obj, default=self.default, option=options)
+        except self._orjson.JSONEncodeError:
+            return super().dumps(obj, indent=2 if indent else None).encode()
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Encoder arguments only the stdlib understands
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, indent=indent) + b'\n', mimetype=self.mimetype)
+
+
+def orjson_available():
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def brotli_available():
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_provider(app):
+    """The JSON provider for ``app.config['JSON_BACKEND']``."""
+    backend = app.config['JSON_BACKEND']
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown JSON_BACKEND {backend!r}, expected one of: {', '.join(BACKENDS)}")
+    if backend == 'orjson' and not orjson_available():
+        raise RuntimeError('JSON_BACKEND=orjson requires the orjson package')
+    if backend == 'stdlib' or not orjson_available():
+        return NumpyJSONProvider(app)
+    return OrjsonProvider(app)
+
+
+def compress(data, encoding, level=6):
+    if encoding == 'br':
+        import brotli
+
+        # Same scale as gzip; brotli's default quality (11) is far slower
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _encodings():
+    return ('br', 'gzip') if brotli_available() else ('gzip',)
+
+
+def _compressible(response, min_bytes):
+    return (min_bytes > 0 and response.status_code == 200 and not response.is_streamed
+            and not response.direct_passthrough and 'Content-Encoding' not in response.headers
+            and (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+            and response.content_length is not None and response.content_length >= min_bytes)
+
+
+def _compress_response(response):
+    if not _compressible(response, current_app.config['COMPRESS_MIN_BYTES']):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(current_app.extensions['compress_encodings'])
+    if encoding is None:
+        return response
+    with stage('compress'):
+        response.set_data(compress(response.get_data(), encoding, current_app.config['COMPRESS_LEVEL']))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.json = create_provider(app)
+    app.extensions['compress_encodings'] = _encodings()
+    # Registered after instrumentation so that, with Flask running after_request
+    # hooks in reverse, the compress stage still makes it into Server-Timing
+    app.after_request(_compress_response)
@@ -0,0 +1,98 @@
+"""Routing of per-user data to database shards.
+
+Everything keyed by user (transactions, spending aggregates, data versions
+and forecast state) lives in that user's shard, chosen as
+``user_id % SHARD_COUNT``. Each shard is its own database (one SQLite file
+per shard by default), so a request only ever reads the requesting user's
+partition and writers on different shards never wait on the same lock.
+
+With ``SHARD_COUNT = 0`` (the default) there is a single database and every
+user is served from ``db.session``. Changing the shard count moves users
+between shards, so it needs a data migration.
+"""
+import os
+
+import sqlalchemy as sa
+from flask import current_app, g
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import engine_profile
+from models import db, ensure_schema
+
+# Tables partitioned by user; the rest (e.g. user) stay in the main database
+SHARDED_TABLES = ('transaction', 'spending_aggregate', 'daily_spending', 'data_version', 'forecast_state')
+
+
+def _create_engine(app, url):
+    """Engine for one shard, with the same SQLite defaults Flask-SQLAlchemy applies
+    and the app's connection profile."""
+    url = sa.engine.make_url(url)
+    options = engine_profile.engine_options(app.config, url)
+    if url.drivername.startswith('sqlite'):
+        if url.database in (None, '', ':memory:'):
+            options = {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+        elif not os.path.isabs(url.database):
+            os.makedirs(app.instance_path, exist_ok=True)
+            url = url.set(database=os.path.join(app.instance_path, url.database))
+    engine = sa.create_engine(url, **options)
+    engine_profile.install(engine, app.config)
+    return engine
+
+
+def init_app(app):
+    """Create one engine per shard from ``SHARD_DATABASE_URL`` (a ``{shard}`` template)."""
+    app.extensions['shard_engines'] = [
+        _create_engine(app, app.config['SHARD_DATABASE_URL'].format(shard=shard))
+        for shard in range(app.config.get('SHARD_COUNT', 0))
+    ]
+    app.teardown_appcontext(close_sessions)
+
+
+def engine_for_shard(shard):
+    return current_app.extensions['shard_engines'][shard]
+
+
+def shard_for(user_id, shard_count=None):
+    """The user's shard number, or None when the app is not sharded."""
+    if shard_count is None:
+        shard_count = current_app.config.get('SHARD_COUNT', 0)
+    return user_id % shard_count if shard_count else None
+
+
+def _shard_session(shard):
+    if shard is None:
+        return db.session
+    sessions = g.setdefault('shard_sessions', {})
+    if shard not in sessions:
+        sessions[shard] = Session(bind=engine_for_shard(shard))
+    return sessions[shard]
+
+
+def session_for(user_id):
+    """Session on the user's shard, shared for the rest of the app context."""
+    return _shard_session(shard_for(user_id))
+
+
+def all_sessions():
+    """One session per shard (just ``db.session`` when unsharded)."""
+    shard_count = current_app.config.get('SHARD_COUNT', 0)
+    if not shard_count:
+        return [db.session]
+    return [_shard_session(shard) for shard in range(shard_count)]
+
+
+def close_sessions(exc=None):
+    for session in g.pop('shard_sessions', {}).values():
+        session.close()
+
+
+def ensure_schemas():
+    """Create or upgrade the schema of the main database and every shard."""
+    shard_count = current_app.config.get('SHARD_COUNT', 0)
+    if not shard_count:
+        ensure_schema(db.engine)
+        return
+    ensure_schema(db.engine, exclude=SHARDED_TABLES)
+    for shard in range(shard_count):
+        ensure_schema(engine_for_shard(shard), include=SHARDED_TABLES)
@@ -601,7 +601,7 @@ async function loadBudgetOptimization() {
             <div class="budget-item">
                 <h6><i class="fas fa-target me-2"></i>${rec.category}</h6>
                 <p>${rec.recommendation}</p>
-                <div class="optimization-savings">Potential savings: $${rec.potential_savings}</div>
+                <div class="optimization-savings">Potential savings: $${rec.potential_savings}/month</div>
             </div>
         `).join('');
         
@@ -133,29 +133,46 @@ function setupEventListeners() {
 // Load dashboard data
 async function loadDashboardData() {
     try {
-        // Load analytics data
-        const analyticsResponse = await fetch('/api/analytics');
-        const analyticsData = await analyticsResponse.json();
+        // Every section of the dashboard comes from one request
+        const response = await fetch('/api/dashboard-summary');
+        const data = await response.json();
         
-        if (analyticsData.error) {
-            console.error('Error loading analytics:', analyticsData.error);
+        if (data.error) {
+            console.error('Error loading dashboard:', data.error);
             return;
         }
         
-        // Update overview cards
-        updateOverviewCards(analyticsData);
-        
-        // Update charts
-        updateCharts(analyticsData);
+        // Sections still being computed or that failed are skipped rather
+        // than breaking the rest of the dashboard
+        if (sectionReady(data.analytics)) {
+            updateOverviewCards(data.analytics);
+            updateCharts(data.analytics);
+        }
+        if (sectionReady(data.health_score)) {
+            renderHealthScore(data.health_score);
+        }
+        if (data.anomalies) {
+            renderAnomalyCount(data.anomalies);
+        }
         
-        // Load transactions
-        await loadTransactions();
+        // Update transactions
+        if (Array.isArray(data.transactions)) {
+            transactions = data.transactions;
+            updateTransactionsTable(transactions);
+        }
         
-        // Load AI insights
-        await loadAIInsights();
+        // Update AI insights; the forecast shows its own pending/failed message
+        if (data.predict) {
+            renderPredictions(data.predict);
+        }
+        if (sectionReady(data.budget_recommendations)) {
+            renderRecommendations(data.budget_recommendations);
+        }
         
-        // Load category performance
-        await loadCategoryPerformance();
+        // Update category performance
+        if (sectionReady(data.category_performance)) {
+            renderCategoryPerformance(data.category_performance);
+        }
         
     } catch (error) {
         console.error('Error loading dashboard data:', error);
@@ -163,6 +180,11 @@ async function loadDashboardData() {
     }
 }
 
+// A dashboard section holds {error}, {pending} or {failed} until it has data
+function sectionReady(section) {
+    return Boolean(section) && !section.error && !section.pending && !section.failed;
+}
+
 // Update overview cards
 function updateOverviewCards(data) {
     // Total spent
@@ -176,12 +198,6 @@ function updateOverviewCards(data) {
     if (avgTransactionElement) {
         avgTransactionElement.textContent = '$' + data.avg_transaction.toFixed(2);
     }
-    
-    // Load health score
-    loadHealthScore();
-    
-    // Load anomaly count
-    loadAnomalyCount();
 }
 
 // Update charts with new data
@@ -267,106 +283,116 @@ async function loadAIInsights() {
 async function loadPredictions() {
     try {
         const response = await fetch('/api/predict');
-        const data = await response.json();
-        
-        const predictionsContent = document.getElementById('predictionsContent');
-        if (!predictionsContent) return;
-        
-        if (data.error) {
-            predictionsContent.innerHTML = `
-                <div class="text-center text-muted">
-                    <i class="fas fa-info-circle fa-2x mb-2"></i>
-                    <p>${data.error}</p>
-                </div>
-            `;
-            return;
-        }
-        
+        renderPredictions(await response.json());
+    } catch (error) {
+        console.error('Error loading predictions:', error);
+    }
+}
+
+function renderPredictions(data) {
+    const predictionsContent = document.getElementById('predictionsContent');
+    if (!predictionsContent) return;
+    
+    // The forecast is computed in the background; the first visit may not have it yet
+    const message = data.pending ? 'Your forecast is being prepared.' :
+        data.failed ? 'Forecast unavailable.' : data.error;
+    if (message) {
         predictionsContent.innerHTML = `
-            <div class="prediction-item">
-                <h6><i class="fas fa-chart-line me-2"></i>Next Month Prediction</h6>
-                <p>Based on your spending patterns, you're expected to spend:</p>
-                <div class="prediction-amount">$${data.predicted_next_month.toLocaleString()}</div>
-                <span class="badge bg-success">${(data.confidence * 100).toFixed(0)}% Confidence</span>
+            <div class="text-center text-muted">
+                <i class="fas fa-info-circle fa-2x mb-2"></i>
+                <p>${message}</p>
             </div>
         `;
-        
-    } catch (error) {
-        console.error('Error loading predictions:', error);
+        return;
     }
+    
+    predictionsContent.innerHTML = `
+        <div class="prediction-item">
+            <h6><i class="fas fa-chart-line me-2"></i>Next Month Prediction</h6>
+            <p>Based on your spending patterns, you're expected to spend:</p>
+            <div class="prediction-amount">$${data.predicted_next_month.toLocaleString()}</div>
+            <span class="badge bg-success">${(data.confidence * 100).toFixed(0)}% Confidence</span>
+        </div>
+    `;
 }
 
 // Load recommendations
 async function loadRecommendations() {
     try {
         const response = await fetch('/api/budget-recommendations');
-        const data = await response.json();
-        
-        const recommendationsContent = document.getElementById('recommendationsContent');
-        if (!recommendationsContent) return;
-        
-        if (data.recommendations.length === 0) {
-            recommendationsContent.innerHTML = `
-                <div class="text-center text-muted">
-                    <i class="fas fa-thumbs-up fa-2x mb-2"></i>
-                    <p>Great job! Your spending looks well-balanced.</p>
-                </div>
-            `;
-            return;
-        }
-        
-        recommendationsContent.innerHTML = data.recommendations.map(rec => `
-            <div class="recommendation-item">
-                <h6><i class="fas fa-lightbulb me-2"></i>${rec.category}</h6>
-                <p>${rec.recommendation}</p>
-                <div class="savings-amount">Potential savings: $${rec.potential_savings}</div>
-            </div>
-        `).join('');
-        
+        renderRecommendations(await response.json());
     } catch (error) {
         console.error('Error loading recommendations:', error);
     }
 }
 
+function renderRecommendations(data) {
+    const recommendationsContent = document.getElementById('recommendationsContent');
+    if (!recommendationsContent) return;
+    
+    if (data.recommendations.length === 0) {
+        recommendationsContent.innerHTML = `
+            <div class="text-center text-muted">
+                <i class="fas fa-thumbs-up fa-2x mb-2"></i>
+                <p>Great job! Your spending looks well-balanced.</p>
+            </div>
+        `;
+        return;
+    }
+    
+    recommendationsContent.innerHTML = data.recommendations.map(rec => `
+        <div class="recommendation-item">
+            <h6><i class="fas fa-lightbulb me-2"></i>${rec.category}</h6>
+            <p>${rec.recommendation}</p>
+            <div class="savings-amount">Potential savings: $${rec.potential_savings}/month</div>
+        </div>
+    `).join('');
+}
+
 // Load health score
 async function loadHealthScore() {
     try {
         const response = await fetch('/api/health-score');
-        const data = await response.json();
-        
-        const healthScoreElement = document.getElementById('healthScore');
-        if (healthScoreElement) {
-            healthScoreElement.textContent = data.score;
-            
-            // Add color coding
-            if (data.score >= 80) {
-                healthScoreElement.className = 'h5 mb-0 font-weight-bold text-success';
-            } else if (data.score >= 60) {
-                healthScoreElement.className = 'h5 mb-0 font-weight-bold text-warning';
-            } else {
-                healthScoreElement.className = 'h5 mb-0 font-weight-bold text-danger';
-            }
-        }
+        renderHealthScore(await response.json());
     } catch (error) {
         console.error('Error loading health score:', error);
     }
 }
 
+function renderHealthScore(data) {
+    const healthScoreElement = document.getElementById('healthScore');
+    if (healthScoreElement) {
+        healthScoreElement.textContent = data.score;
+        
+        // Add color coding
+        if (data.score >= 80) {
+            healthScoreElement.className = 'h5 mb-0 font-weight-bold text-success';
+        } else if (data.score >= 60) {
+            healthScoreElement.className = 'h5 mb-0 font-weight-bold text-warning';
+        } else {
+            healthScoreElement.className = 'h5 mb-0 font-weight-bold text-danger';
+        }
+    }
+}
+
 // Load anomaly count
 async function loadAnomalyCount() {
     try {
         const response = await fetch('/api/anomalies');
-        const data = await response.json();
-        
-        const anomalyCountElement = document.getElementById('anomalyCount');
-        if (anomalyCountElement) {
-            anomalyCountElement.textContent = data.anomalies.length;
-        }
+        renderAnomalyCount(await response.json());
     } catch (error) {
         console.error('Error loading anomalies:', error);
     }
 }
 
+function renderAnomalyCount(data) {
+    const anomalyCountElement = document.getElementById('anomalyCount');
+    if (anomalyCountElement) {
+        // A new user's anomaly model may still be fitting
+        anomalyCountElement.textContent = data.anomalies ? data.anomalies.length : '...';
+    }
+}
+
 // Add new transaction
 async function addTransaction() {
     const amount = document.getElementById('amount').value;
@@ -505,65 +531,7 @@ function showNotification(message, type = 'info') {
 async function loadCategoryPerformance() {
     try {
         const response = await fetch('/api/category-performance');
-        const data = await response.json();
-        
-        const categoryPerformanceContent = document.getElementById('categoryPerformanceContent');
-        if (!categoryPerformanceContent) return;
-        
-        if (data.categories.length === 0) {
-            categoryPerformanceContent.innerHTML = `
-                <div class="text-center text-muted">
-                    <i class="fas fa-info-circle fa-2x mb-2"></i>
-                    <p>No category data available for performance analysis.</p>
-                </div>
-            `;
-            return;
-        }
-        
-        categoryPerformanceContent.innerHTML = `
-            <div class="row">
-                ${data.categories.map(category => `
-                    <div class="col-lg-4 col-md-6 mb-3">
-                        <div class="performance-card ${getPerformanceCardClass(category.rating)}">
-                            <div class="performance-header">
-                                <h6>${category.category}</h6>
-                                <span class="performance-badge badge-${getPerformanceBadgeClass(category.rating)}">
-                                    ${category.rating}
-                                </span>
-                            </div>
-                            <div class="performance-metrics">
-                                <div class="metric">
-                                    <span class="metric-label">Total Spent:</span>
-                                    <span class="metric-value">$${category.total_spent.toLocaleString()}</span>
-                                </div>
-                                <div class="metric">
-                                    <span class="metric-label">Avg Amount:</span>
-                                    <span class="metric-value">$${category.avg_amount.toFixed(2)}</span>
-                                </div>
-                                <div class="metric">
-                                    <span class="metric-label">Frequency:</span>
-                                    <span class="metric-value">${category.frequency.toFixed(1)}/week</span>
-                                </div>
-                                <div class="metric">
-                                    <span class="metric-label">Trend:</span>
-                                    <span class="metric-value trend-${category.trend}">
-                                        <i class="fas fa-arrow-${category.trend === 'up' ? 'up' : category.trend === 'down' ? 'down' : 'right'}"></i>
-                                        ${category.trend}
-                                    </span>
-                                </div>
-                            </div>
-                            <div class="performance-score">
-                                <div class="score-bar">
-                                    <div class="score-fill" style="width: ${category.performance_score}%"></div>
-                                </div>
-                                <span class="score-text">${category.performance_score}/100</span>
-                            </div>
-                        </div>
-                    </div>
-                `).join('')}
-            </div>
-        `;
-        
+        renderCategoryPerformance(await response.json());
     } catch (error) {
         console.error('Error loading category performance:', error);
         const categoryPerformanceContent = document.getElementById('categoryPerformanceContent');
@@ -578,7 +546,65 @@ async function loadCategoryPerformance() {
     }
 }
 
-// Get performance card CSS class
+function renderCategoryPerformance(data) {
+    const categoryPerformanceContent = document.getElementById('categoryPerformanceContent');
+    if (!categoryPerformanceContent) return;
+    
+    if (data.categories.length === 0) {
+        categoryPerformanceContent.innerHTML = `
+            <div class="text-center text-muted">
+                <i class="fas fa-info-circle fa-2x mb-2"></i>
+                <p>No category data available for performance analysis.</p>
+            </div>
+        `;
+        return;
+    }
+    
+    categoryPerformanceContent.innerHTML = `
+        <div class="row">
+            ${data.categories.map(category => `
+                <div class="col-lg-4 col-md-6 mb-3">
+                    <div class="performance-card ${getPerformanceCardClass(category.rating)}">
+                        <div class="performance-header">
+                            <h6>${category.category}</h6>
+                            <span class="performance-badge badge-${getPerformanceBadgeClass(category.rating)}">
+                                ${category.rating}
+                            </span>
+                        </div>
+                        <div class="performance-metrics">
+                            <div class="metric">
+                                <span class="metric-label">Total Spent:</span>
+                                <span class="metric-value">$${category.total_spent.toLocaleString()}</span>
+                            </div>
+                            <div class="metric">
+                                <span class="metric-label">Avg Amount:</span>
+                                <span class="metric-value">$${category.avg_amount.toFixed(2)}</span>
+                            </div>
+                            <div class="metric">
+                                <span class="metric-label">Frequency:</span>
+                                <span class="metric-value">${category.frequency.toFixed(1)}/week</span>
+                            </div>
+                            <div class="metric">
+                                <span class="metric-label">Trend:</span>
+                                <span class="metric-value trend-${category.trend}">
+                                    <i class="fas fa-arrow-${category.trend === 'up' ? 'up' : category.trend === 'down' ? 'down' : 'right'}"></i>
+                                    ${category.trend}
+                                </span>
+                            </div>
+                        </div>
+                        <div class="performance-score">
+                            <div class="score-bar">
+                                <div class="score-fill" style="width: ${category.performance_score}%"></div>
+                            </div>
+                            <span class="score-text">${category.performance_score}/100</span>
+                        </div>
+                    </div>
+                </div>
+            `).join('')}
+        </div>
+    `;
+}
+
 function getPerformanceCardClass(rating) {
     const classes = {
         'Excellent': 'performance-excellent',
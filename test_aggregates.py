@@ -0,0 +1,87 @@
+import unittest
+from datetime import datetime
+from app import create_app, db, Transaction
+from models import SpendingAggregate, DailySpending
+import aggregates
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+class AggregateStoreTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        Transaction.query.delete()
+        SpendingAggregate.query.delete()
+        DailySpending.query.delete()
+    
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+    
+    def _add(self, rows):
+        transactions = [Transaction(amount=a, merchant='Test', category=c, date=d, user_id=u)
+                        for a, c, d, u in rows]
+        db.session.add_all(transactions)
+        aggregates.apply_transactions(db.session, transactions)
+        db.session.commit()
+    
+    def test_summary_tracks_inserts(self):
+        self._add([
+            (10.0, 'Shopping', datetime(2024, 1, 5), 1),
+            (20.0, 'Shopping', datetime(2024, 1, 20), 1),
+            (5.0, None, datetime(2024, 2, 1), 1),
+            (99.0, 'Travel', datetime(2024, 2, 1), 2),
+        ])
+        self._add([(30.0, 'Travel', datetime(2024, 2, 3), 1)])
+        
+        summary = aggregates.read_summary(db.session, user_id=1)
+        self.assertEqual(summary['total_transactions'], 4)
+        self.assertAlmostEqual(summary['total_spent'], 65.0)
+        self.assertAlmostEqual(summary['avg_transaction'], 16.25)
+        self.assertEqual(summary['category_breakdown'], {'Shopping': 30.0, 'Travel': 30.0})
+        self.assertEqual(summary['monthly_spending'], {'2024-01': 30.0, '2024-02': 35.0})
+        self.assertEqual(summary['unique_categories'], 2)
+        self.assertEqual(aggregates.verify(db.session), [])
+    
+    def test_verify_detects_drift_and_rebuild_repairs_it(self):
+        self._add([(10.0, 'Shopping', datetime(2024, 1, 5), 1)])
+        db.session.add(Transaction(amount=7.0, merchant='Test', category='Shopping',
+                                   date=datetime(2024, 1, 6), user_id=1))
+        db.session.commit()
+        
+        mismatches = aggregates.verify(db.session)
+        self.assertEqual(len(mismatches), 1)
+        self.assertEqual(mismatches[0]['expected_count'], 2)
+        self.assertEqual(mismatches[0]['stored_count'], 1)
+        
+        aggregates.rebuild(db.session)
+        db.session.commit()
+        self.assertEqual(aggregates.verify(db.session), [])
+        self.assertAlmostEqual(aggregates.read_summary(db.session, 1)['total_spent'], 17.0)
+
+    def test_daily_buckets_track_extremes(self):
+        self._add([
+            (10.0, 'Shopping', datetime(2024, 1, 5, 9), 1),
+            (4.0, 'Shopping', datetime(2024, 1, 5, 18), 1),
+        ])
+        self._add([(25.0, 'Shopping', datetime(2024, 1, 5, 20), 1), (3.0, None, datetime(2024, 1, 6), 1)])
+        
+        bucket = DailySpending.query.filter_by(user_id=1, category='Shopping', day='2024-01-05').one()
+        self.assertEqual((bucket.total, bucket.count, bucket.min_amount, bucket.max_amount), (39.0, 3, 4.0, 25.0))
+        self.assertEqual(aggregates.verify_daily(db.session), [])
+        self.assertEqual(aggregates.spending_between(db.session, 1, datetime(2024, 1, 6)), 3.0)
+        
+        db.session.add(Transaction(amount=1.0, merchant='Test', category='Shopping',
+                                   date=datetime(2024, 1, 5), user_id=1))
+        db.session.commit()
+        self.assertEqual([m['day'] for m in aggregates.verify_daily(db.session)], ['2024-01-05'])
+        aggregates.rebuild(db.session)
+        db.session.commit()
+        self.assertEqual(aggregates.verify_daily(db.session), [])
+        self.assertEqual(DailySpending.query.filter_by(day='2024-01-05').one().min_amount, 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
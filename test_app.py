@@ -1,13 +1,27 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
 import json
-from app import app, db, Transaction
+from datetime import datetime, timedelta
+from app import create_app, db, Transaction, ml_models
+from finance_ml import anomaly_model_name
+from model_store import ModelStore
+from data_access import get_data_version, get_anomaly_version
+import anomalies
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TRUST_USER_HEADER': True})
 
 class FinanceAnalyzerTestCase(unittest.TestCase):
     
     def setUp(self):
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         self.app = app.test_client()
+        self.model_dir = tempfile.TemporaryDirectory()
+        ml_models.use_store(ModelStore(self.model_dir.name))
+        if app.extensions['response_cache'] is not None:
+            app.extensions['response_cache'].clear()
         
         with app.app_context():
             db.create_all()
@@ -16,6 +30,7 @@ class FinanceAnalyzerTestCase(unittest.TestCase):
         with app.app_context():
             db.session.remove()
             db.drop_all()
+        self.model_dir.cleanup()
     
     def test_home_page(self):
         response = self.app.get('/')
@@ -38,6 +53,70 @@ class FinanceAnalyzerTestCase(unittest.TestCase):
         data = json.loads(response.data)
         self.assertIsInstance(data, list)
     
+    def test_api_transactions_keyset_pagination(self):
+        batch = [{'amount': 10.0 + i, 'merchant': 'Store %d' % i, 'date': '2024-01-%02d' % (i % 28 + 1),
+                  'category': 'Shopping' if i % 2 else 'Travel'} for i in range(25)]
+        self.app.post('/api/transactions/batch', data=json.dumps(batch), content_type='application/json')
+        
+        seen = []
+        url = '/api/transactions?limit=10'
+        while url:
+            response = self.app.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = json.loads(response.data)
+            self.assertLessEqual(len(page), 10)
+            seen.extend(page)
+            link = response.headers.get('Link')
+            url = link[1:link.index('>')] if link else None
+        
+        ids = [t['id'] for t in seen]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), 25)
+        dates = [t['date'] for t in seen]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+    
+    def test_api_transactions_filters(self):
+        batch = [
+            {'amount': 5.0, 'merchant': 'Starbucks #12', 'date': '2024-01-05', 'category': 'Food & Dining'},
+            {'amount': 50.0, 'merchant': 'Starbucks #40', 'date': '2024-02-05', 'category': 'Food & Dining'},
+            {'amount': 75.0, 'merchant': 'Uber', 'date': '2024-02-06', 'category': 'Transportation'}
+        ]
+        self.app.post('/api/transactions/batch', data=json.dumps(batch), content_type='application/json')
+        
+        data = json.loads(self.app.get('/api/transactions?merchant=starbucks&from=2024-02-01&to=2024-02-05').data)
+        self.assertEqual([t['amount'] for t in data], [50.0])
+        data = json.loads(self.app.get('/api/transactions?category=Transportation&min_amount=70&max_amount=80').data)
+        self.assertEqual([t['merchant'] for t in data], ['Uber'])
+        
+        # LIKE wildcards in the merchant filter match literally
+        self.app.post('/api/transactions', data=json.dumps({'amount': 9.0, 'merchant': '100% Juice_Bar', 'date': '2024-02-07'}),
+                      content_type='application/json')
+        for merchant, expected in (('%', ['100% Juice_Bar']), ('_', ['100% Juice_Bar']), ('\\', []), ('s%40', [])):
+            data = json.loads(self.app.get('/api/transactions', query_string={'merchant': merchant}).data)
+            self.assertEqual([t['merchant'] for t in data], expected, merchant)
+        for query in ('min_amount=abc', 'max_amount=1e', 'min_amount=10&max_amount=lots'):
+            self.assertEqual(self.app.get('/api/transactions?' + query).status_code, 400, query)
+    
+    def test_api_transactions_invalid_cursor(self):
+        response = self.app.get('/api/transactions?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_api_transactions_columns(self):
+        batch = [{'amount': 10.0 + i, 'merchant': 'Store %d' % i, 'date': '2024-01-%02d' % (i % 28 + 1)}
+                 for i in range(15)]
+        self.app.post('/api/transactions/batch', data=json.dumps(batch), content_type='application/json')
+        
+        rows = self.app.get('/api/transactions?limit=10')
+        columns = self.app.get('/api/transactions?limit=10&format=columns')
+        self.assertEqual(columns.headers['X-Next-Cursor'], rows.headers['X-Next-Cursor'])
+        data = json.loads(columns.data)
+        for field in ('id', 'amount', 'merchant', 'category', 'description'):
+            self.assertEqual(data[field], [t[field] for t in json.loads(rows.data)], field)
+        self.assertEqual(data['date'], [t['date'].replace(' ', 'T') for t in json.loads(rows.data)])
+        
+        self.assertEqual(json.loads(self.app.get('/api/transactions?format=columns&category=None').data)['id'], [])
+        self.assertEqual(self.app.get('/api/transactions?format=table').status_code, 400)
+    
     def test_api_analytics(self):
         response = self.app.get('/api/analytics')
         self.assertEqual(response.status_code, 200)
@@ -61,6 +140,70 @@ class FinanceAnalyzerTestCase(unittest.TestCase):
         self.assertIn('message', data)
         self.assertIn('predicted_category', data)
     
+    def test_add_transactions_batch(self):
+        batch = [
+            {'amount': 12.5, 'merchant': 'Starbucks', 'date': '2024-01-01'},
+            {'amount': 'abc', 'merchant': 'Uber', 'date': '2024-01-02'},
+            {'amount': 30.0, 'merchant': 'Amazon', 'date': '2024-01-03', 'category': 'Shopping'}
+        ]
+        
+        response = self.app.post('/api/transactions/batch',
+                               data=json.dumps(batch),
+                               content_type='application/json')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['inserted'], 2)
+        self.assertEqual(data['failed'], 1)
+        self.assertEqual([r['status'] for r in data['results']], ['created', 'error', 'created'])
+        self.assertEqual(data['results'][2]['category'], 'Shopping')
+        self.assertFalse(data['results'][2]['predicted'])
+    
+    def test_add_transactions_batch_rejects_non_list(self):
+        response = self.app.post('/api/transactions/batch',
+                               data=json.dumps({'amount': 5}),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_upload_transactions_csv(self):
+        csv_data = b'date,amount,merchant,description\n2024-02-01,12.50,Starbucks,coffee\n2024-02-02,8.00,Shell,\n'
+        response = self.app.post('/api/transactions/upload',
+                               data={'file': (io.BytesIO(csv_data), 'statement.csv')},
+                               content_type='multipart/form-data')
+        
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['inserted'], 2)
+        self.assertEqual(data['failed'], 0)
+    
+    def test_upload_transactions_unsupported_format(self):
+        response = self.app.post('/api/transactions/upload',
+                               data={'file': (io.BytesIO(b'x'), 'statement.pdf')},
+                               content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_export_transactions_csv(self):
+        self.app.post('/api/transactions/batch',
+                      data=json.dumps([{'amount': 12.5, 'merchant': 'Starbucks', 'date': '2024-01-01'}]),
+                      content_type='application/json')
+        
+        response = self.app.get('/api/transactions/export?format=csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+        lines = response.data.decode().splitlines()
+        self.assertEqual(lines[0], 'id,date,amount,merchant,category,description')
+        self.assertIn('2024-01-01 00:00:00,12.5,Starbucks', lines[-1])
+    
+    def test_export_transactions_ndjson(self):
+        response = self.app.get('/api/transactions/export?format=ndjson')
+        self.assertEqual(response.status_code, 200)
+        for line in response.data.decode().splitlines():
+            self.assertIn('merchant', json.loads(line))
+    
+    def test_export_transactions_unsupported_format(self):
+        response = self.app.get('/api/transactions/export?format=xml')
+        self.assertEqual(response.status_code, 400)
+    
     def test_api_predict(self):
         response = self.app.get('/api/predict')
         self.assertEqual(response.status_code, 200)
@@ -74,6 +217,71 @@ class FinanceAnalyzerTestCase(unittest.TestCase):
         self.assertIsInstance(data, dict)
         self.assertIn('anomalies', data)
     
+    def test_api_anomalies_scored_on_insert(self):
+        batch = [{'amount': 20.0 + i % 5, 'merchant': 'Grocer', 'date': '2024-03-%02d' % (i % 28 + 1)}
+                 for i in range(60)]
+        batch.append({'amount': 5000.0, 'merchant': 'Jeweler', 'date': '2024-03-15'})
+        self.app.post('/api/transactions/batch', data=json.dumps(batch), content_type='application/json')
+        
+        # First request fits the model and scores the history
+        data = json.loads(self.app.get('/api/anomalies').data)
+        self.assertIn('Jeweler', [a['merchant'] for a in data['anomalies']])
+        self.assertTrue(all(a['anomaly_score'] > 0 for a in data['anomalies']))
+        
+        # Later inserts are scored against the persisted model without a refit
+        self.app.post('/api/transactions/batch',
+                      data=json.dumps([{'amount': 9000.0, 'merchant': 'Yacht Club', 'date': '2024-03-16'}]),
+                      content_type='application/json')
+        with app.app_context():
+            row = Transaction.query.filter_by(merchant='Yacht Club').one()
+            self.assertTrue(row.is_anomaly)
+        self.assertEqual(ml_models.store.versions(anomaly_model_name(1)), [1])
+        data = json.loads(self.app.get('/api/anomalies').data)
+        self.assertIn('Yacht Club', [a['merchant'] for a in data['anomalies']])
+    
+    def test_anomaly_refit_keeps_the_data_version(self):
+        batch = [{'amount': 20.0 + i % 5, 'merchant': 'Grocer', 'date': '2024-03-%02d' % (i % 28 + 1)}
+                 for i in range(60)]
+        self.app.post('/api/transactions/batch', data=json.dumps(batch), content_type='application/json')
+        self.app.get('/api/anomalies')
+        self.assertEqual(self.app.get('/api/anomalies').headers['X-Cache'], 'HIT')
+        self.app.get('/api/analytics')
+        
+        with app.app_context():
+            version, anomaly_version = get_data_version(db.session, 1), get_anomaly_version(db.session, 1)
+            anomalies.refit(db.session, ml_models, 1)
+            self.assertEqual(get_data_version(db.session, 1), version)
+            self.assertEqual(get_anomaly_version(db.session, 1), anomaly_version + 1)
+        
+        # Only the responses showing anomaly flags are invalidated
+        self.assertEqual(self.app.get('/api/analytics').headers['X-Cache'], 'HIT')
+        self.assertEqual(self.app.get('/api/anomalies').headers['X-Cache'], 'MISS')
+    
+    def test_cached_endpoint_etag_and_invalidation(self):
+        self.app.post('/api/transactions/batch',
+                      data=json.dumps([{'amount': 12.5, 'merchant': 'Starbucks', 'date': '2024-01-01'}]),
+                      content_type='application/json')
+        
+        first = self.app.get('/api/analytics')
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        etag = first.headers['ETag']
+        
+        second = self.app.get('/api/analytics')
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        
+        not_modified = self.app.get('/api/analytics', headers={'If-None-Match': etag})
+        self.assertEqual(not_modified.status_code, 304)
+        
+        # Any write bumps the data version, so the old ETag no longer matches
+        self.app.post('/api/transactions',
+                      data=json.dumps({'amount': 50.0, 'merchant': 'Uber', 'date': '2024-01-02'}),
+                      content_type='application/json')
+        refreshed = self.app.get('/api/analytics', headers={'If-None-Match': etag})
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual(refreshed.headers['X-Cache'], 'MISS')
+        self.assertEqual(json.loads(refreshed.data)['total_transactions'], 2)
+    
     def test_api_budget_recommendations(self):
         response = self.app.get('/api/budget-recommendations')
         self.assertEqual(response.status_code, 200)
@@ -81,6 +289,40 @@ class FinanceAnalyzerTestCase(unittest.TestCase):
         self.assertIsInstance(data, dict)
         self.assertIn('recommendations', data)
     
+    def test_api_budget_settings_and_simulate(self):
+        today = datetime.now()
+        batch = [{'amount': 100.0 + 20 * months, 'merchant': 'Grocer', 'category': 'Food & Dining',
+                  'date': (today - timedelta(days=30 * months + 15)).strftime('%Y-%m-%d')} for months in range(6)]
+        self.app.post('/api/transactions/batch', data=json.dumps(batch), content_type='application/json')
+        self.assertEqual(json.loads(self.app.get('/api/budget').data), {'income': 0.0, 'budget': 0.0})
+        
+        before = json.loads(self.app.get('/api/budget-recommendations').data)
+        self.assertEqual(before['target_source'], 'baseline')
+        
+        response = self.app.put('/api/budget', data=json.dumps({'budget': 50}), content_type='application/json')
+        self.assertEqual(json.loads(response.data), {'income': 0.0, 'budget': 50.0})
+        self.assertEqual(self.app.put('/api/budget', data=json.dumps({'income': -5}),
+                                      content_type='application/json').status_code, 400)
+        # The cached recommendations are recomputed against the new budget
+        after = json.loads(self.app.get('/api/budget-recommendations').data)
+        self.assertEqual((after['target'], after['target_source']), (50.0, 'budget'))
+        self.assertEqual(after['recommendations'][0]['category'], 'Food & Dining')
+        
+        scenarios = [{'Food & Dining': amount} for amount in range(0, 200, 10)]
+        response = self.app.post('/api/budget/simulate', data=json.dumps({'scenarios': scenarios, 'income': 500}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(len(data['scenarios']), 20)
+        self.assertEqual((data['income'], data['budget']), (500, 50.0))
+        self.assertEqual([s['within_budget'] for s in data['scenarios']].count(True), 6)
+        
+        for body, status in (({'scenarios': []}, 400), ({'scenarios': [{'Food & Dining': 'x'}]}, 400),
+                             ({'scenarios': [{}], 'budget': -1}, 400),
+                             ({'scenarios': [{}] * 1001}, 413)):
+            response = self.app.post('/api/budget/simulate', data=json.dumps(body), content_type='application/json')
+            self.assertEqual(response.status_code, status, body)
+    
     def test_api_health_score(self):
         response = self.app.get('/api/health-score')
         self.assertEqual(response.status_code, 200)
@@ -88,6 +330,107 @@ class FinanceAnalyzerTestCase(unittest.TestCase):
         self.assertIsInstance(data, dict)
         self.assertIn('score', data)
         self.assertIn('factors', data)
+    
+    def test_api_analytics_range(self):
+        batch = [
+            {'amount': 40.0, 'merchant': 'Grocer', 'date': '2024-01-20', 'category': 'Food & Dining'},
+            {'amount': 10.0, 'merchant': 'Grocer', 'date': '2024-02-03', 'category': 'Food & Dining'},
+            {'amount': 90.0, 'merchant': 'Airline', 'date': '2024-02-20', 'category': 'Travel'}
+        ]
+        self.app.post('/api/transactions/batch', data=json.dumps(batch), content_type='application/json')
+        
+        data = json.loads(self.app.get('/api/analytics/range').data)
+        self.assertEqual((data['from'], data['to'], data['total'], data['count']),
+                         ('2024-01-20', '2024-02-20', 140.0, 3))
+        
+        query = 'from=2024-02-01&to=2024-02-29&group=week&compare=previous'
+        data = json.loads(self.app.get('/api/analytics/range?' + query).data)
+        self.assertEqual(data['total'], 100.0)
+        self.assertEqual(data['categories']['Travel']['max'], 90.0)
+        self.assertEqual([p['start'] for p in data['periods']],
+                         ['2024-02-01', '2024-02-05', '2024-02-12', '2024-02-19', '2024-02-26'])
+        self.assertEqual(data['comparison']['total'], 40.0)
+        self.assertEqual(data['comparison']['change'], 60.0)
+        
+        for query in ('from=2024-03-01&to=2024-02-01', 'group=fortnight', 'compare=never', 'from=2024-13-01',
+                      'from=1900-01-01&to=2024-01-01&group=day', 'from=0001-01-01&to=9999-12-31',
+                      'from=0001-01-01&to=0001-03-01&compare=year'):
+            self.assertEqual(self.app.get('/api/analytics/range?' + query).status_code, 400, query)
+    
+    def test_dashboard_summary_matches_endpoints(self):
+        batch = [{'amount': 20.0 + i % 7, 'merchant': 'Grocer %d' % (i % 3),
+                  'date': '2024-%02d-%02d' % (i % 4 + 1, i % 28 + 1), 'category': 'Food & Dining' if i % 2 else 'Shopping'} for i in range(80)]
+        self.app.post('/api/transactions/batch', data=json.dumps(batch), content_type='application/json')
+    
+        response = self.app.get('/api/dashboard-summary')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(set(data), {'analytics', 'health_score', 'transactions', 'anomalies',
+                                     'budget_recommendations', 'category_performance', 'predict'})
+        for section, url in (('analytics', '/api/analytics'), ('health_score', '/api/health-score'),
+                             ('transactions', '/api/transactions'), ('anomalies', '/api/anomalies'),
+                             ('budget_recommendations', '/api/budget-recommendations'),
+                             ('category_performance', '/api/category-performance'), ('predict', '/api/predict')):
+            self.assertEqual(data[section], json.loads(self.app.get(url).data), section)
+    
+    def test_dashboard_summary_sections(self):
+        data = json.loads(self.app.get('/api/dashboard-summary?sections=health_score,transactions').data)
+        self.assertEqual(set(data), {'health_score', 'transactions'})
+    
+        response = self.app.get('/api/dashboard-summary?sections=analytics,bogus')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bogus', json.loads(response.data)['error'])
+    
+    def test_requests_are_scoped_to_the_user(self):
+        for user_id, merchant in ((1, 'Mine'), (2, 'Theirs')):
+            self.app.post('/api/transactions', headers={'X-User-Id': str(user_id)},
+                          data=json.dumps({'amount': 10.0, 'merchant': merchant, 'date': '2024-01-02'}),
+                          content_type='application/json')
+        
+        # Requests without the header are served as DEFAULT_USER_ID
+        self.assertEqual([t['merchant'] for t in json.loads(self.app.get('/api/transactions').data)], ['Mine'])
+        theirs = self.app.get('/api/transactions', headers={'X-User-Id': '2'})
+        self.assertEqual([t['merchant'] for t in json.loads(theirs.data)], ['Theirs'])
+    
+    def test_user_header_needs_to_be_trusted(self):
+        untrusted = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'}).test_client()
+        self.assertEqual(untrusted.get('/api/transactions', headers={'X-User-Id': '2'}).status_code, 403)
+        self.assertEqual(untrusted.put('/api/budget', headers={'X-User-Id': '2'}, json={'budget': 1.0}).status_code, 403)
+        self.assertEqual(untrusted.get('/api/transactions').status_code, 200)
+    
+    def test_seed_sample_data_command(self):
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=['seed-sample-data', '--count', '250', '--seed', '7'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Inserted 250', result.output)
+        
+        result = runner.invoke(args=['seed-sample-data', '--if-empty'])
+        self.assertIn('nothing to do', result.output)
+        
+        data = json.loads(self.app.get('/api/analytics').data)
+        self.assertEqual(data['total_transactions'], 250)
+    
+    def test_sample_data_chunks(self):
+        import sample_data
+        end = datetime(2024, 6, 30)
+        chunks = list(sample_data.iter_chunks(2500, end=end, seed=3, realistic=True, chunk_size=1000))
+        self.assertEqual([len(chunk) for chunk in chunks], [1000, 1000, 500])
+        rows = [row for chunk in chunks for row in chunk]
+        self.assertTrue(all(end - timedelta(days=365) <= row['date'] <= end for row in rows))
+        self.assertTrue(all(row['merchant'] in sample_data.MERCHANTS[row['category']] for row in rows))
+        # Food & Dining is the most common category in the realistic profile
+        counts = {c: sum(row['category'] == c for row in rows) for c in sample_data.CATEGORIES}
+        self.assertEqual(max(counts, key=counts.get), 'Food & Dining')
+        # A single chunk is the same draw as generate()
+        self.assertEqual(sample_data.generate(500, end=end, seed=3),
+                         next(sample_data.iter_chunks(500, end=end, seed=3)))
+    
+    def test_import_does_not_load_heavy_modules(self):
+        code = ('import sys, app; '
+                'print(sorted(m for m in ("pandas", "sklearn", "nltk", "joblib") if m in sys.modules))')
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.stdout.strip(), '[]')
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
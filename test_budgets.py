@@ -0,0 +1,136 @@
+import math
+import unittest
+from datetime import date
+
+import numpy as np
+
+import budgets
+from column_store import Columns
+
+def _columns(rows):
+    """Columns from (category, 'YYYY-MM-DD', amount) rows."""
+    categories = sorted({c for c, _, _ in rows if c is not None})
+    return Columns(
+        np.array([round(a * 100) for _, _, a in rows], dtype=np.int32),
+        np.array([np.datetime64(d, 'D').astype(np.int64) for _, d, _ in rows], dtype=np.int32),
+        np.zeros(len(rows), dtype=np.int32), ['m'],
+        np.array([categories.index(c) if c is not None else -1 for c, _, _ in rows], dtype=np.int16),
+        categories,
+    )
+
+ROWS = [
+    # Rent is flat, Food grows by 100 a month, Travel only in one month
+    ('Rent', '2024-01-01', 1000.0), ('Rent', '2024-02-01', 1000.0), ('Rent', '2024-03-01', 1000.0),
+    ('Food', '2024-01-05', 50.0), ('Food', '2024-01-20', 50.0),
+    ('Food', '2024-02-10', 200.0), ('Food', '2024-03-03', 300.0),
+    ('Travel', '2024-02-14', 600.0),
+    (None, '2024-02-15', 999.0),
+    # The current, incomplete month is left out
+    ('Food', '2024-04-02', 5000.0),
+]
+
+class MonthlyProfileTestCase(unittest.TestCase):
+    
+    def test_profile(self):
+        profile = budgets.monthly_profile(_columns(ROWS), date(2024, 4, 10), months=3)
+        self.assertEqual(profile.categories, ['Food', 'Rent', 'Travel'])
+        self.assertEqual(profile.months, ['2024-01', '2024-02', '2024-03'])
+        self.assertEqual(profile.spending.tolist(), [[100, 200, 300], [1000, 1000, 1000], [0, 600, 0]])
+        self.assertEqual(profile.baseline.tolist(), [200, 1000, 200])
+        np.testing.assert_allclose(profile.trend, [100, 0, 0], atol=1e-9)
+        np.testing.assert_allclose(profile.projected, [300, 1000, 200])
+        self.assertAlmostEqual(profile.volatility[2], np.std([0, 600, 0], ddof=1))
+    
+    def test_window_ends_with_the_last_month_with_spending(self):
+        profile = budgets.monthly_profile(_columns(ROWS[:3]), date(2026, 1, 1), months=2)
+        self.assertEqual(profile.months, ['2024-02', '2024-03'])
+        self.assertTrue(budgets.monthly_profile(_columns([(None, '2024-01-01', 5.0)]), date(2024, 2, 1)).empty)
+
+    def test_short_history_is_not_padded(self):
+        rows = [('Food', '2024-02-10', 600.0), ('Food', '2024-03-10', 600.0)]
+        profile = budgets.monthly_profile(_columns(rows), date(2024, 4, 10))
+        self.assertEqual(profile.months, ['2024-02', '2024-03'])
+        self.assertEqual(profile.spending.tolist(), [[600, 600]])
+        self.assertEqual((profile.baseline[0], profile.trend[0]), (600, 0))
+        self.assertEqual(budgets.recommend(profile)['recommendations'], [])
+        # Spending only in the current, incomplete month
+        self.assertTrue(budgets.monthly_profile(_columns(rows), date(2024, 2, 20)).empty)
+
+class RecommendTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        self.profile = budgets.monthly_profile(_columns(ROWS), date(2024, 4, 10), months=3)
+    
+    def test_without_budget_only_growth_is_cut(self):
+        result = budgets.recommend(self.profile)
+        self.assertEqual(result['target_source'], 'baseline')
+        self.assertEqual([(r['category'], r['potential_savings'], r['suggested_budget'])
+                          for r in result['recommendations']], [('Food', 100.0, 200.0)])
+        self.assertEqual(result['categories']['Food']['trend'], 100.0)
+    
+    def test_budget_excess_is_spread_and_capped(self):
+        result = budgets.recommend(self.profile, income=3000.0, budget=1200.0)
+        self.assertEqual((result['target'], result['target_source'], result['projected_spending']),
+                         (1200.0, 'budget', 1500.0))
+        savings = {r['category']: r['potential_savings'] for r in result['recommendations']}
+        self.assertAlmostEqual(sum(savings.values()), 300.0, places=1)
+        # Travel is the most volatile, so it gives up more per dollar than Rent
+        self.assertGreater(savings['Travel'] / 200, savings['Rent'] / 1000)
+        self.assertEqual(result['shortfall'], 0.0)
+        
+        capped = budgets.recommend(self.profile, budget=100.0)
+        self.assertTrue(all(r['suggested_budget'] >= r['projected_spending'] * (1 - budgets.MAX_CUT) - 0.01
+                            for r in capped['recommendations']))
+        self.assertAlmostEqual(capped['shortfall'], 1500 - 100 - 750, places=1)
+        
+        # Income alone sets the target at income less savings
+        self.assertEqual(budgets.recommend(self.profile, income=1000.0)['target'], 800.0)
+
+class SimulateTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        self.profile = budgets.monthly_profile(_columns(ROWS), date(2024, 4, 10), months=3)
+    
+    def test_matrix_matches_per_scenario_formulas(self):
+        rng = np.random.default_rng(0)
+        scenarios = [{name: float(rng.uniform(0, 1.5) * projected) for name, projected
+                      in zip(self.profile.categories, self.profile.projected) if rng.random() < 0.8}
+                     for _ in range(200)]
+        result = budgets.simulate(self.profile, scenarios, income=2000.0, budget=1400.0)
+        self.assertEqual(len(result['scenarios']), 200)
+        
+        for scenario, scored in zip(scenarios, result['scenarios']):
+            on_track, overrun, allocated = 1.0, 0.0, 0.0
+            for name, mean, sd in zip(self.profile.categories, self.profile.projected, self.profile.volatility):
+                amount = scenario.get(name, mean)
+                allocated += amount
+                if sd:
+                    z = (amount - mean) / sd
+                    cdf = 0.5 * (1 + math.erf(z / math.sqrt(2)))
+                    overrun += sd * math.exp(-z * z / 2) / math.sqrt(2 * math.pi) - (amount - mean) * (1 - cdf)
+                else:
+                    cdf = 1.0 if amount >= mean else 0.0
+                    overrun += max(mean - amount, 0)
+                on_track *= cdf
+            self.assertAlmostEqual(scored['allocated'], allocated, places=1)
+            self.assertAlmostEqual(scored['expected_overrun'], overrun, places=1)
+            self.assertAlmostEqual(scored['probability_on_track'], on_track, places=3)
+            self.assertEqual(scored['within_budget'], allocated <= 1400.0)
+        
+        best = result['scenarios'][result['best']]
+        self.assertTrue(best['within_budget'])
+        self.assertEqual(best['expected_savings'], max(s['expected_savings'] for s in result['scenarios']
+                                                       if s['within_budget']))
+    
+    def test_new_categories_and_validation(self):
+        result = budgets.simulate(self.profile, [{'Pets': 50.0}, {}])
+        self.assertEqual(result['categories'], ['Food', 'Rent', 'Travel', 'Pets'])
+        self.assertEqual([s['allocated'] for s in result['scenarios']], [1550.0, 1500.0])
+        self.assertIsNone(result['scenarios'][0]['expected_savings'])
+        
+        for bad in ([{'Food': -1}], [{'Food': 'lots'}], [{'Food': float('inf')}], [[100]]):
+            with self.assertRaises(ValueError):
+                budgets.simulate(self.profile, bad)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import time
+import unittest
+
+from werkzeug.datastructures import MultiDict
+
+import cache
+
+class CacheBackendTestCase(unittest.TestCase):
+    
+    def test_lru_evicts_least_recently_used(self):
+        lru = cache.LRUCache(max_entries=2, ttl=60)
+        lru.set('a', b'1')
+        lru.set('b', b'2')
+        lru.get('a')
+        lru.set('c', b'3')
+        self.assertEqual(lru.get('a'), b'1')
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(len(lru), 2)
+    
+    def test_lru_expires_entries(self):
+        lru = cache.LRUCache(max_entries=2, ttl=0.01)
+        lru.set('a', b'1')
+        time.sleep(0.02)
+        self.assertIsNone(lru.get('a'))
+    
+    def test_redis_backend_with_local_stand_in(self):
+        backend = cache.create_backend({'CACHE_BACKEND': 'local-redis', 'CACHE_TTL': 60})
+        backend.set('k', b'value')
+        self.assertEqual(backend.get('k'), b'value')
+        backend.client.set('unrelated', b'x')
+        backend.clear()
+        self.assertIsNone(backend.get('k'))
+        self.assertEqual(backend.client.get('unrelated'), b'x')
+    
+    def test_disabled_backend(self):
+        self.assertIsNone(cache.create_backend({'CACHE_BACKEND': 'none'}))
+    
+    def test_cache_key_covers_args_and_version(self):
+        args = MultiDict([('b', '2'), ('a', '1')])
+        key = cache.cache_key(1, 'get_analytics', args, 3, ttl=300)
+        self.assertEqual(key, cache.cache_key(1, 'get_analytics', MultiDict([('a', '1'), ('b', '2')]), 3, ttl=300))
+        self.assertNotEqual(key, cache.cache_key(1, 'get_analytics', args, 4, ttl=300))
+        self.assertNotEqual(key, cache.cache_key(2, 'get_analytics', args, 3, ttl=300))
+        self.assertNotEqual(key, cache.cache_key(1, 'get_health_score', args, 3, ttl=300))
+    
+    def test_entry_round_trip(self):
+        entry = cache.encode_entry(200, 'application/json', b'{"a":\n1}')
+        self.assertEqual(cache.decode_entry(entry), (200, 'application/json', b'{"a":\n1}'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from app import create_app, db, Transaction
+from column_store import ColumnStore, load_columns
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+class ColumnStoreTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        Transaction.query.delete()
+        app.extensions['column_store'].clear()
+    
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+    
+    def _add(self, rows, user_id=1):
+        db.session.add_all([Transaction(amount=a, merchant=m, category=c, date=d, user_id=user_id)
+                            for a, m, c, d in rows])
+        db.session.commit()
+    
+    def test_columns_are_encoded(self):
+        self._add([
+            (12.34, 'Starbucks', 'Food & Dining', datetime(2024, 3, 1, 8, 30)),
+            (40.0, 'Uber', None, datetime(1969, 12, 31, 23, 59)),
+            (7.5, 'Starbucks', 'Food & Dining', datetime(2024, 3, 2)),
+        ])
+        self._add([(99.0, 'Amazon', 'Shopping', datetime(2024, 3, 3))], user_id=2)
+        
+        columns = load_columns(db.session, 1)
+        self.assertEqual(len(columns), 3)
+        self.assertEqual(columns.cents.dtype, np.int32)
+        self.assertEqual(columns.amounts.tolist(), [12.34, 40.0, 7.5])
+        self.assertEqual(columns.days.tolist(), [19783, -1, 19784])
+        self.assertEqual([columns.merchants[c] for c in columns.merchant_codes], ['Starbucks', 'Uber', 'Starbucks'])
+        self.assertEqual(columns.category_codes.tolist(), [0, -1, 0])
+        self.assertEqual(columns.categories, ['Food & Dining'])
+        self.assertAlmostEqual(columns.category_totals()[0], 19.84)
+    
+    def test_new_rows_are_appended_from_the_watermark(self):
+        store = ColumnStore(max_bytes=10 ** 9)
+        self._add([(10.0, 'A', 'Travel', datetime(2024, 1, 1))])
+        first = store.get(db.session, 1)
+        self._add([(20.0, 'B', 'Shopping', datetime(2024, 1, 2)), (5.0, 'A', 'Travel', datetime(2024, 1, 3))])
+        second = store.get(db.session, 1)
+        
+        # Earlier views are unaffected by later appends
+        self.assertEqual(first.amounts.tolist(), [10.0])
+        self.assertEqual(second.amounts.tolist(), [10.0, 20.0, 5.0])
+        self.assertEqual(second.categories, ['Travel', 'Shopping'])
+        self.assertEqual((store.hits, store.misses), (1, 1))
+        self.assertEqual(store.stats()['rows'], 3)
+    
+    def test_replaced_database_is_reloaded(self):
+        store = app.extensions['column_store']
+        self._add([(10.0, 'A', 'Travel', datetime(2024, 1, 1)), (11.0, 'A', 'Travel', datetime(2024, 1, 2))])
+        store.get(db.session, 1)
+        
+        Transaction.query.delete()
+        db.session.commit()
+        self._add([(3.0, 'C', None, datetime(2024, 2, 1))])
+        self.assertEqual(store.get(db.session, 1).amounts.tolist(), [3.0])
+    
+    def test_least_recently_used_users_are_evicted(self):
+        for user_id in (1, 2, 3):
+            self._add([(1.0, 'A', 'Travel', datetime(2024, 1, 1))], user_id=user_id)
+        store = ColumnStore(max_bytes=10 ** 9)
+        for user_id in (1, 2, 3):
+            store.get(db.session, user_id)
+        one_user = store.stats()['bytes'] // 3
+        
+        store.max_bytes = 2 * one_user
+        store.get(db.session, 1)
+        stats = store.stats()
+        self.assertEqual(stats['users'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], store.max_bytes)
+        # User 2 was the least recently used
+        self.assertEqual(list(store._entries), [3, 1])
+
+if __name__ == '__main__':
+    unittest.main()
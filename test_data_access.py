@@ -0,0 +1,49 @@
+import unittest
+from datetime import datetime
+from app import create_app, db, Transaction
+from data_access import load_transactions
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+class DataAccessTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        Transaction.query.delete()
+    
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+    
+    def test_empty_frame_is_typed(self):
+        df = load_transactions(db.session, user_id=1)
+        self.assertTrue(df.empty)
+        self.assertEqual(str(df['date'].dtype), 'datetime64[ns]')
+        self.assertEqual(str(df['amount'].dtype), 'float64')
+    
+    def test_columns_and_user_scoping(self):
+        db.session.add_all([
+            Transaction(amount=12.5, merchant='Starbucks', category='Food & Dining',
+                        date=datetime(2024, 3, 1, 8, 30, 15), user_id=1),
+            Transaction(amount=40.0, merchant='Uber', category='Transportation',
+                        date=datetime(2024, 3, 2), user_id=1),
+            Transaction(amount=99.0, merchant='Amazon', category='Shopping',
+                        date=datetime(2024, 3, 3), user_id=2),
+        ])
+        db.session.commit()
+        
+        df = load_transactions(db.session, user_id=1, columns=['amount', 'category', 'date'])
+        self.assertEqual(list(df.columns), ['amount', 'category', 'date'])
+        self.assertEqual(df['amount'].tolist(), [12.5, 40.0])
+        self.assertEqual(df['category'].tolist(), ['Food & Dining', 'Transportation'])
+        self.assertEqual(df['date'].iloc[0].to_pydatetime(), datetime(2024, 3, 1, 8, 30, 15))
+    
+    def test_unknown_column_rejected(self):
+        with self.assertRaises(ValueError):
+            load_transactions(db.session, user_id=1, columns=['amount', 'nope'])
+
+if __name__ == '__main__':
+    unittest.main()
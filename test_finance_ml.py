@@ -0,0 +1,136 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from finance_ml import FinanceMLModels, DEFAULT_CATEGORY, encode_merchants, category_features, anomaly_model_name
+from model_store import ModelStore
+
+def _training_frame(n=60):
+    merchants = {'Starbucks': 'Food & Dining', 'Uber': 'Transportation', 'Amazon': 'Shopping'}
+    rows = []
+    start = datetime(2024, 1, 1)
+    for i in range(n):
+        merchant = list(merchants)[i % 3]
+        rows.append({'amount': 10.0 + (i % 3) * 40, 'merchant': merchant,
+                     'category': merchants[merchant], 'date': start + timedelta(days=i)})
+    df = pd.DataFrame(rows)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+class FinanceMLTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ModelStore(self.tmp.name)
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def test_merchant_encoding_is_stable_across_processes(self):
+        code = 'from finance_ml import encode_merchants; print(encode_merchants(["Starbucks", "Uber"]).tolist())'
+        outputs = set()
+        for seed in ('1', '2'):
+            env = dict(os.environ, PYTHONHASHSEED=seed)
+            result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                    env=env, cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+            outputs.add(result.stdout.strip())
+        self.assertEqual(outputs, {str(encode_merchants(['Starbucks', 'Uber']).tolist())})
+    
+    def test_date_features(self):
+        features = category_features([5.0], ['Uber'], [pd.Timestamp('2024-03-17').to_datetime64()])
+        # 2024-03-17 is a Sunday
+        self.assertEqual(features[0, 2], 6)
+        self.assertEqual(features[0, 3], 3)
+    
+    def test_untrained_model_falls_back(self):
+        models = FinanceMLModels(store=self.store)
+        self.assertEqual(models.predict_category(10.0, 'Starbucks', '2024-01-01'), DEFAULT_CATEGORY)
+    
+    def test_trained_model_is_versioned_and_hot_swapped(self):
+        # A worker started before training picks the artifact up on its next check
+        worker = FinanceMLModels(store=ModelStore(self.tmp.name), reload_interval=0)
+        self.assertIsNone(worker.category_model_version)
+        
+        trainer = FinanceMLModels(store=self.store)
+        self.assertTrue(trainer.train_category_model(_training_frame()))
+        self.assertEqual(self.store.versions('category'), [1])
+        
+        worker.refresh_category_model()
+        self.assertEqual(worker.category_model_version, 1)
+        self.assertEqual(worker.predict_category(10.0, 'Starbucks', '2024-01-01'), 'Food & Dining')
+        
+        trainer.train_category_model(_training_frame(90))
+        worker.predict_category(10.0, 'Starbucks', '2024-01-01')
+        self.assertEqual(worker.category_model_version, 2)
+        
+        self.store.prune('category', keep=1)
+        self.assertEqual(self.store.versions('category'), [2])
+    
+    def test_known_merchants_skip_the_forest(self):
+        models = FinanceMLModels(store=self.store)
+        models.train_category_model(_training_frame())
+        model = models.category_model
+        with mock.patch.object(model, 'predict', wraps=model.predict) as predict:
+            categories = models.predict_categories(
+                [10.0, 50.0, 20.0], ['STARBUCKS #42', 'Uber Trip', 'Unknown Bakery'],
+                [pd.Timestamp('2024-01-01').to_datetime64()] * 3)
+        self.assertEqual(categories[:2].tolist(), ['Food & Dining', 'Transportation'])
+        # Only the unseen merchant went through the forest
+        self.assertEqual(len(predict.call_args[0][0]), 1)
+        
+        stats = models.categorization_stats()
+        self.assertEqual((stats['index_exact'], stats['index_prefix'], stats['model']), (1, 1, 1))
+        self.assertEqual(stats['index_size'], 3)
+        
+        # The index ships with the artifact
+        worker = FinanceMLModels(store=ModelStore(self.tmp.name))
+        self.assertEqual(worker.predict_category(90.0, 'Amazon.com', '2024-01-01'), 'Shopping')
+    
+    def test_lookup_tables_are_mapped_from_the_artifact(self):
+        FinanceMLModels(store=self.store).train_category_model(_training_frame())
+        worker = FinanceMLModels(store=ModelStore(self.tmp.name))
+        worker.refresh_category_model()
+        merchant_index = worker._category_bundle[3]
+        for array in (worker.label_encoder.classes_, merchant_index.keys, merchant_index.codes):
+            self.assertIsInstance(array, np.memmap)
+        self.assertEqual(worker.predict_category(10.0, 'Starbucks', '2024-01-01'), 'Food & Dining')
+    
+    def test_artifacts_with_a_dict_index_still_load(self):
+        models = FinanceMLModels(store=self.store)
+        models.train_category_model(_training_frame())
+        _, bundle = self.store.load('category', mmap_mode=None)
+        bundle['merchant_index'] = {'starbucks': 'Food & Dining'}
+        del bundle['merchant_table']
+        self.store.save('category', bundle)
+        
+        models.refresh_category_model(force=True)
+        self.assertEqual(models.category_model_version, 2)
+        self.assertEqual(models.categorization_stats()['index_size'], 1)
+    
+    def test_anomaly_lookup_survives_a_concurrent_prune(self):
+        amounts = np.arange(20, 40, dtype=float)
+        dates = np.arange('2024-01-01', '2024-01-21', dtype='datetime64[D]')
+        trainer = FinanceMLModels(store=self.store)
+        for _ in range(3):
+            trainer.fit_anomaly_model(7, amounts, dates, max_id=20)
+        # Each user's versions live in their own directory
+        self.assertEqual(sorted(os.listdir(os.path.join(self.tmp.name, 'anomaly', 'user7'))),
+                         ['model-v2.joblib', 'model-v3.joblib'])
+        self.assertEqual(self.store.versions(anomaly_model_name(7)), [2, 3])
+        
+        worker = FinanceMLModels(store=ModelStore(self.tmp.name), reload_interval=0)
+        # Version 1 was listed just before the refit that published version 3 pruned it
+        with mock.patch.object(worker.store, 'latest_version', side_effect=[1, 3]):
+            bundle = worker.anomaly_model(7)
+        self.assertEqual(bundle['max_id'], 20)
+        self.assertEqual(worker._anomaly_bundles[7][0], 3)
+
+if __name__ == '__main__':
+    unittest.main()
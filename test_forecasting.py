@@ -0,0 +1,130 @@
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app import create_app, db, Transaction
+from models import ForecastState
+import forecasting
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+START = datetime(2024, 1, 1)
+# Monday-to-Sunday spending pattern
+WEEKLY = [10.0, 10.0, 10.0, 10.0, 40.0, 80.0, 20.0]
+
+
+class ForecasterTestCase(unittest.TestCase):
+
+    def test_recovers_weekly_pattern(self):
+        days = 10 * 7
+        first_day = forecasting._day_numbers([START])[0]
+        Y = np.array([[WEEKLY[d % 7] for d in range(days)]])
+        state = forecasting.fit(Y, first_day)[0]
+        means, daily_sd, total_sd = forecasting.predict(state, horizon=14)
+
+        expected = [WEEKLY[d % 7] for d in range(days, days + 14)]
+        np.testing.assert_allclose(means, expected, atol=1.0)
+        self.assertLess(total_sd, 5.0)
+
+    def test_update_matches_fit_on_same_days(self):
+        rng = np.random.default_rng(0)
+        y = rng.gamma(2.0, 20.0, size=60)
+        first_day = 19723
+        state = forecasting.fit(y[None, :40], first_day)[0]
+        updated = forecasting.update(state, y[40:], first_day + 40)
+
+        # One uninterrupted pass over all 60 days with the same parameters
+        level, trend, seasonal, sse, n = forecasting._smooth(
+            y, first_day, state['alpha'], state['beta'], state['gamma'],
+            *self._initial_state(y, first_day))
+        self.assertEqual(updated['last_day'], first_day + 59)
+        self.assertEqual(updated['n'], n)
+        self.assertAlmostEqual(updated['level'], float(level))
+        self.assertAlmostEqual(updated['trend'], float(trend))
+        self.assertAlmostEqual(updated['sse'], float(sse))
+        np.testing.assert_allclose(updated['seasonal'], seasonal)
+
+    def _initial_state(self, y, first_day):
+        warmup = y[:forecasting.MIN_DAYS]
+        level0 = warmup.mean()
+        slots = (first_day + np.arange(forecasting.MIN_DAYS)) % forecasting.SEASON
+        seasonal0 = np.array([warmup[slots == s].mean() - level0 for s in range(forecasting.SEASON)])
+        return level0, 0.0, seasonal0
+
+
+class ForecastUserTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        Transaction.query.delete()
+        ForecastState.query.delete()
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _add_days(self, first, count, user_id=1):
+        db.session.add_all([
+            Transaction(amount=WEEKLY[d % 7], merchant='Test', category='Shopping',
+                        date=START + timedelta(days=d, hours=12), user_id=user_id)
+            for d in range(first, first + count)
+        ])
+        db.session.commit()
+
+    def _state_day(self):
+        states = forecasting._load_states(db.session, 1)
+        return states[forecasting.TOTAL]['last_day']
+
+    def test_insufficient_history(self):
+        self._add_days(0, 10)
+        self.assertIsNone(forecasting.forecast_user(db.session, 1))
+        self.assertEqual(ForecastState.query.count(), 0)
+
+    def test_forecast_and_incremental_update(self):
+        self._add_days(0, 56)
+        result = forecasting.forecast_user(db.session, 1)
+
+        self.assertEqual(result['interval'], 0.95)
+        self.assertEqual(len(result['daily_forecast']), forecasting.HORIZON)
+        self.assertEqual(result['daily_forecast'][0]['date'], '2024-02-26')
+        self.assertIn('Shopping', result['by_category'])
+        self.assertLessEqual(result['lower'], result['predicted_next_month'])
+        self.assertLessEqual(result['predicted_next_month'], result['upper'])
+        self.assertTrue(0 <= result['confidence'] <= 1)
+        # The last observed day is held back from the persisted state
+        self.assertEqual(self._state_day(), forecasting._day_numbers([START])[0] + 54)
+
+        self._add_days(56, 7)
+        result = forecasting.forecast_user(db.session, 1)
+        self.assertEqual(result['daily_forecast'][0]['date'], '2024-03-04')
+        self.assertEqual(self._state_day(), forecasting._day_numbers([START])[0] + 61)
+
+    def test_incremental_path_skips_full_fit(self):
+        self._add_days(0, 56)
+        forecasting.forecast_user(db.session, 1)
+        self._add_days(56, 3)
+
+        with mock.patch.object(forecasting, '_full_fit', wraps=forecasting._full_fit) as full_fit:
+            forecasting.forecast_user(db.session, 1)
+        full_fit.assert_not_called()
+
+    def test_backdated_rows_trigger_refit(self):
+        self._add_days(0, 56)
+        forecasting.forecast_user(db.session, 1)
+        db.session.add(Transaction(amount=500.0, merchant='Test', category='Shopping',
+                                   date=START + timedelta(days=3), user_id=1))
+        db.session.commit()
+
+        with mock.patch.object(forecasting, '_full_fit', wraps=forecasting._full_fit) as full_fit:
+            forecasting.forecast_user(db.session, 1)
+        full_fit.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+import ingest
+
+OFX_STATEMENT = b'''OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240305120000[-5:EST]<TRNAMT>-42.10<FITID>1<NAME>WALMART #123<MEMO>Groceries
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240306<TRNAMT>1000.00<FITID>2<NAME>PAYROLL
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240307<TRNAMT>-5.00<FITID>3<NAME>Metro</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+'''
+
+class IngestTestCase(unittest.TestCase):
+    
+    def test_parse_records_reports_row_errors(self):
+        parsed = ingest.parse_records([
+            {'amount': '12.5', 'merchant': ' Starbucks ', 'date': '2024-01-01'},
+            {'amount': 5, 'merchant': 'Uber', 'date': '01/02/2024'},
+            'not an object',
+        ])
+        self.assertEqual(parsed.total, 3)
+        self.assertEqual(parsed.rows.tolist(), [0])
+        self.assertEqual(parsed.amounts.tolist(), [12.5])
+        self.assertEqual(parsed.merchants.tolist(), ['Starbucks'])
+        self.assertEqual(parsed.errors, [
+            {'row': 1, 'error': 'date must be YYYY-MM-DD'},
+            {'row': 2, 'error': 'expected a JSON object'},
+        ])
+    
+    def test_parse_ofx_debits(self):
+        parsed = ingest.parse_ofx(OFX_STATEMENT)
+        self.assertEqual(parsed.total, 3)
+        self.assertEqual(parsed.merchants.tolist(), ['WALMART #123', 'Metro'])
+        self.assertEqual(parsed.amounts.tolist(), [42.10, 5.00])
+        self.assertEqual(str(parsed.dates[0])[:10], '2024-03-05')
+        self.assertEqual(parsed.descriptions.tolist(), ['Groceries', ''])
+        self.assertEqual(parsed.errors, [{'row': 1, 'error': 'credit transactions are not imported'}])
+
+if __name__ == '__main__':
+    unittest.main()
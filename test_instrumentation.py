@@ -0,0 +1,87 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+from app import create_app, db, ml_models
+from model_store import ModelStore
+import instrumentation
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'CACHE_BACKEND': 'none'})
+
+
+class InstrumentationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.tmp = tempfile.TemporaryDirectory()
+        ml_models.use_store(ModelStore(os.path.join(self.tmp.name, 'models')))
+        app.config.update(PROFILE_DIR=os.path.join(self.tmp.name, 'profiles'), PROFILE_TOKEN=None,
+                          PROFILE_SAMPLE_RATE=0.0)
+        with app.app_context():
+            db.create_all()
+        self.client.post('/api/transactions/batch', content_type='application/json', data=json.dumps(
+            [{'amount': 10.0 + i, 'merchant': 'Store', 'category': 'Shopping', 'date': '2024-01-%02d' % (i + 1)}
+             for i in range(20)]))
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+        self.tmp.cleanup()
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/transactions')
+        entries = dict(entry.split(';dur=') for entry in response.headers['Server-Timing'].split(', '))
+        self.assertEqual(set(entries), {'db', 'rows', 'serialize', 'total'})
+        self.assertGreaterEqual(float(entries['total']), float(entries['db']))
+
+        response = self.client.get('/api/budget-recommendations')
+        self.assertIn('db;dur=', response.headers['Server-Timing'])
+        self.assertIn('compute;dur=', response.headers['Server-Timing'])
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/transactions')
+        self.client.get('/api/category-performance')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.mimetype.startswith('text/plain'))
+        text = response.get_data(as_text=True)
+        self.assertIn('# TYPE finance_request_duration_seconds histogram', text)
+        self.assertIn('finance_request_duration_seconds_count{route="/api/transactions",method="GET",status="200"}',
+                      text)
+        self.assertIn('finance_stage_duration_seconds_count{route="/api/transactions",stage="db"}', text)
+        # Background jobs report under their own route
+        self.assertIn('finance_stage_duration_seconds_count{route="job:category-performance",stage="compute"}', text)
+        self.assertIn('finance_categorizations_total{source="model"}', text)
+        self.assertIn('# TYPE finance_column_store_bytes gauge', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = instrumentation.Histogram('t', 'test', ('route',), buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(seconds, '/x')
+        lines = histogram.expose()
+        self.assertIn('t_bucket{route="/x",le="0.1"} 1', lines)
+        self.assertIn('t_bucket{route="/x",le="1.0"} 3', lines)
+        self.assertIn('t_bucket{route="/x",le="+Inf"} 4', lines)
+        self.assertIn('t_count{route="/x"} 4', lines)
+        self.assertIn('t_sum{route="/x"} 6.05', lines)
+
+    def test_profiling_requires_token(self):
+        response = self.client.get('/api/analytics', headers={'X-Profile': 'secret'})
+        self.assertNotIn('X-Profile-Id', response.headers)
+
+        app.config['PROFILE_TOKEN'] = 'secret'
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/analytics', headers={'X-Profile': 'wrong'}).headers)
+        response = self.client.get('/api/analytics', headers={'X-Profile': 'secret'})
+        path = os.path.join(app.config['PROFILE_DIR'], response.headers['X-Profile-Id'])
+        functions = {name for _, _, name in pstats.Stats(path).stats}
+        self.assertIn('get_analytics', functions)
+
+    def test_sampled_profiling(self):
+        app.config['PROFILE_SAMPLE_RATE'] = 1.0
+        self.assertIn('X-Profile-Id', self.client.get('/api/health-score').headers)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,229 @@
+import json
+import tempfile
+import unittest
+
+from app import create_app, db, ml_models
+from cache import LocalRedis, LRUCache
+from model_store import ModelStore
+from models import Job
+import jobs
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'CACHE_BACKEND': 'none',
+                  'TRUST_USER_HEADER': True})
+
+calls = []
+
+@jobs.task('test-echo')
+def echo_task(user_id, value=None):
+    calls.append(value)
+    return {'user_id': user_id, 'value': value}
+
+
+class RecordingBackend:
+    """Queues job ids without running them, like a busy worker."""
+
+    def __init__(self):
+        self.queued = []
+
+    def enqueue(self, job_id):
+        self.queued.append(job_id)
+
+
+class VanishingBackend:
+    """Deletes the first job it is handed, as a prune racing a waiting request would,
+    and runs the rest inline."""
+
+    def __init__(self, inline):
+        self.inline = inline
+        self.deleted = []
+
+    def enqueue(self, job_id):
+        if self.deleted:
+            return self.inline.enqueue(job_id)
+        with db.engine.begin() as connection:
+            connection.execute(db.delete(Job).where(Job.id == job_id))
+        self.deleted.append(job_id)
+
+
+class JobsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.model_dir = tempfile.TemporaryDirectory()
+        ml_models.use_store(ModelStore(self.model_dir.name))
+        self.backend = app.extensions['jobs']
+        del calls[:]
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        app.extensions['jobs'] = self.backend
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+        self.model_dir.cleanup()
+
+    def _post(self, amount, category='Groceries', user_id=1):
+        return self.client.post('/api/transactions', headers={'X-User-Id': str(user_id)},
+                                data=json.dumps({'amount': amount, 'merchant': 'Store', 'category': category,
+                                                 'date': '2024-01-02'}),
+                                content_type='application/json')
+
+    def test_submit_deduplicates(self):
+        with app.app_context():
+            first = jobs.submit('test-echo', user_id=1, data_version=1, value='a')
+            self.assertEqual(first.status, jobs.SUCCEEDED)
+            self.assertEqual(json.loads(first.result), {'user_id': 1, 'value': 'a'})
+            # Same data version: the finished job is reused
+            self.assertEqual(jobs.submit('test-echo', user_id=1, data_version=1, value='a').id, first.id)
+            self.assertEqual(calls, ['a'])
+
+            # An active job is reused whatever the version
+            app.extensions['jobs'] = RecordingBackend()
+            queued = jobs.submit('test-echo', user_id=1, data_version=2, value='b')
+            self.assertEqual(jobs.submit('test-echo', user_id=1, data_version=3).id, queued.id)
+            self.assertNotEqual(jobs.submit('test-echo', user_id=2, data_version=3).id, queued.id)
+
+            jobs.run_job(app, queued.id)
+            self.assertEqual(jobs.latest_result('test-echo', user_id=1).id, queued.id)
+            self.assertRaises(ValueError, jobs.submit, 'no-such-job')
+
+    def test_stale_result_served_while_recompute_runs(self):
+        self._post(10.0)
+        response = self.client.get('/api/category-performance')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Result-Stale', response.headers)
+        self.assertEqual(response.get_json()['categories'][0]['total_spent'], 10.0)
+
+        self._post(5.0)
+        app.extensions['jobs'] = recording = RecordingBackend()
+        response = self.client.get('/api/category-performance')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Result-Stale'], '1')
+        self.assertEqual(response.get_json()['categories'][0]['total_spent'], 10.0)
+        self.assertEqual(recording.queued, [response.headers['X-Job-Id']])
+
+        # The recompute is only queued once
+        self.client.get('/api/category-performance')
+        self.assertEqual(len(recording.queued), 1)
+
+        jobs.run_job(app, recording.queued[0])
+        response = self.client.get('/api/category-performance')
+        self.assertNotIn('X-Result-Stale', response.headers)
+        self.assertEqual(response.get_json()['categories'][0]['total_spent'], 15.0)
+
+    def test_stale_result_is_not_revalidated(self):
+        app.extensions['response_cache'] = LRUCache()
+        try:
+            self._post(10.0)
+            self.client.get('/api/category-performance')
+            self._post(5.0)
+            app.extensions['jobs'] = recording = RecordingBackend()
+            stale = self.client.get('/api/category-performance')
+            self.assertEqual(stale.headers['X-Result-Stale'], '1')
+
+            jobs.run_job(app, recording.queued[0])
+            response = self.client.get('/api/category-performance', headers={'If-None-Match': stale.headers['ETag']})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()['categories'][0]['total_spent'], 15.0)
+            fresh = self.client.get('/api/category-performance', headers={'If-None-Match': response.headers['ETag']})
+            self.assertEqual(fresh.status_code, 304)
+        finally:
+            app.extensions['response_cache'] = None
+
+    def test_pending_dashboard_section_is_not_revalidated(self):
+        app.extensions['response_cache'] = LRUCache()
+        app.config['JOB_WAIT_TIMEOUT'] = 0
+        try:
+            self._post(10.0)
+            app.extensions['jobs'] = recording = RecordingBackend()
+            pending = self.client.get('/api/dashboard-summary?sections=predict')
+            self.assertIn('pending', pending.get_json()['predict'])
+
+            jobs.run_job(app, recording.queued[0])
+            response = self.client.get('/api/dashboard-summary?sections=predict',
+                                       headers={'If-None-Match': pending.headers['ETag']})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('pending', response.get_json()['predict'])
+        finally:
+            app.config['JOB_WAIT_TIMEOUT'] = 10
+            app.extensions['response_cache'] = None
+
+    def test_first_result_times_out_with_202(self):
+        self._post(10.0)
+        app.extensions['jobs'] = recording = RecordingBackend()
+        app.config['JOB_WAIT_TIMEOUT'] = 0
+        try:
+            response = self.client.get('/api/category-performance')
+        finally:
+            app.config['JOB_WAIT_TIMEOUT'] = 10
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.get_json()['status'], jobs.QUEUED)
+        self.assertEqual(response.headers['Location'], f'/api/jobs/{recording.queued[0]}')
+
+    def test_vanished_job_is_resubmitted(self):
+        self._post(10.0)
+        app.extensions['jobs'] = vanishing = VanishingBackend(self.backend)
+        response = self.client.get('/api/category-performance')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['categories'][0]['total_spent'], 10.0)
+        self.assertEqual(len(vanishing.deleted), 1)
+        with app.app_context():
+            self.assertIsNone(jobs.wait(vanishing.deleted[0], timeout=0))
+
+    def test_job_endpoints(self):
+        self._post(10.0)
+        response = self.client.post('/api/jobs', data=json.dumps({'name': 'category-performance'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        job_url = response.headers['Location']
+
+        data = self.client.get(job_url).get_json()
+        self.assertEqual(data['status'], jobs.SUCCEEDED)
+        self.assertEqual(data['result']['categories'][0]['total_spent'], 10.0)
+        self.assertEqual(self.client.get(job_url, headers={'X-User-Id': '2'}).status_code, 404)
+        self.assertEqual(self.client.get('/api/jobs/missing').status_code, 404)
+
+        listed = self.client.get('/api/jobs').get_json()['jobs']
+        self.assertIn(data['id'], [job['id'] for job in listed])
+        self.assertEqual(self.client.get('/api/jobs', headers={'X-User-Id': '2'}).get_json()['jobs'], [])
+
+        response = self.client.post('/api/jobs', data=json.dumps({'name': 'train-category-model'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_job_records_error(self):
+        with app.app_context():
+            job = jobs.submit('test-echo', user_id=1, unexpected=True)
+            self.assertEqual(job.status, jobs.FAILED)
+            self.assertIn('TypeError', job.error)
+
+    def test_failed_job_is_retried(self):
+        with app.app_context():
+            failed = jobs.submit('test-echo', user_id=1, data_version=1, unexpected=True)
+            self.assertEqual(failed.status, jobs.FAILED)
+            retried = jobs.submit('test-echo', user_id=1, data_version=1, value='a')
+            self.assertNotEqual(retried.id, failed.id)
+            self.assertEqual(retried.status, jobs.SUCCEEDED)
+
+
+class RedisBackendTestCase(unittest.TestCase):
+
+    def test_worker_runs_queued_jobs(self):
+        redis_app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+                                'JOB_BACKEND': 'redis', 'JOB_REDIS_CLIENT': LocalRedis()})
+        backend = redis_app.extensions['jobs']
+        self.assertIsInstance(backend, jobs.RedisBackend)
+        with redis_app.app_context():
+            db.create_all()
+            job = jobs.submit('test-echo', user_id=1, value='queued')
+            self.assertEqual(job.status, jobs.QUEUED)
+
+            self.assertEqual(backend.work(max_jobs=1, timeout=1), 1)
+            job = jobs.wait(job.id, timeout=1)
+            self.assertEqual(job.status, jobs.SUCCEEDED)
+            self.assertEqual(json.loads(job.result)['value'], 'queued')
+            db.drop_all()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+from merchants import MerchantIndex, normalize
+
+
+class NormalizeTestCase(unittest.TestCase):
+
+    def test_variants_share_a_key(self):
+        for raw in ('Starbucks', 'STARBUCKS #1234', 'Starbucks Store 88', 'SQ *STARBUCKS', ' starbucks. '):
+            self.assertEqual(normalize(raw), 'starbucks', raw)
+        self.assertEqual(normalize("McDonald's 00451"), 'mcdonalds')
+        self.assertEqual(normalize('AMZN Mktp US*2K3LL1ZT0'), 'amzn mktp us')
+        self.assertEqual(normalize('AT&T'), 'att')
+
+    def test_short_numbers_are_kept(self):
+        self.assertEqual(normalize('7-Eleven'), '7 eleven')
+        self.assertEqual(normalize('Pier 1 Imports'), 'pier 1 imports')
+
+    def test_blank(self):
+        self.assertEqual(normalize(None), '')
+        self.assertEqual(normalize('  #12 '), '')
+
+
+class MerchantIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = MerchantIndex.build(
+            ['Starbucks', 'STARBUCKS #1', 'Uber', 'Uber', 'Amazon', 'Amazon', 'Amazon', 'Netflix', None],
+            ['Food & Dining', 'Food & Dining', 'Transportation', 'Transportation',
+             'Shopping', 'Shopping', 'Entertainment', 'Entertainment', 'Other'],
+        )
+
+    def test_build_keeps_consistent_merchants(self):
+        # Amazon is split between categories and Netflix was seen only once
+        self.assertEqual(self.index.entries, {'starbucks': 'Food & Dining', 'uber': 'Transportation'})
+
+    def test_lookup(self):
+        self.assertEqual(self.index.lookup('Starbucks #99'), ('Food & Dining', True))
+        self.assertEqual(self.index.lookup('Uber Eats Pending'), ('Transportation', False))
+        self.assertEqual(self.index.lookup('Amazon'), (None, False))
+
+        categories, exact, prefix = self.index.resolve(['uber', 'UBER TRIP', 'Lyft'])
+        self.assertEqual(categories.tolist(), ['Transportation', 'Transportation', None])
+        self.assertEqual((exact, prefix), (1, 1))
+    
+    def test_array_round_trip(self):
+        arrays = self.index.arrays()
+        self.assertEqual(arrays['keys'].tolist(), ['starbucks', 'uber'])
+        self.assertEqual(arrays['codes'].dtype, np.int16)
+        copy = MerchantIndex.from_arrays(**arrays)
+        self.assertEqual(copy.entries, self.index.entries)
+        self.assertEqual(copy.lookup('Uber Eats'), ('Transportation', False))
+        
+        empty = MerchantIndex()
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.resolve(['Uber'])[0].tolist(), [None])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import reports
+import sample_data
+from app import create_app, db, initialize_database
+from models import ReportRun, User, UserReport
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TRUST_USER_HEADER': True})
+
+def _seed(user_ids, count=200):
+    for user_id in user_ids:
+        sample_data.seed_transactions(db.session, count, user_id=user_id, seed=user_id)
+
+def _interrupt(run, users_per_second):
+    raise KeyboardInterrupt
+
+class ReportFunctionsTestCase(unittest.TestCase):
+    
+    def test_health_score(self):
+        summary = {'total_transactions': 600, 'avg_transaction': 150.0, 'unique_categories': 6}
+        self.assertEqual(reports.health_score(summary)['score'], 75)
+        self.assertEqual(reports.health_score({'total_transactions': 0}), {'score': 0, 'factors': []})
+    
+    def test_analytics_without_transactions(self):
+        self.assertEqual(reports.analytics({'total_transactions': 0}, 0.0), {'error': 'No transactions found'})
+
+class NightlyReportsTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        app.extensions['response_cache'].clear()
+        self.client = app.test_client()
+    
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+    
+    def test_reports_match_the_endpoints(self):
+        _seed([1, 2])
+        # A user with no transactions still gets (empty) reports
+        db.session.add(User(id=3, username='new', email='new@example.com'))
+        db.session.commit()
+        
+        run = reports.run_nightly(app, chunk_size=2)
+        self.assertEqual((run.status, run.users_total, run.users_done), ('succeeded', 3, 3))
+        self.assertEqual(run.as_of, date.today().isoformat())
+        
+        for user_id in (1, 2):
+            headers = {'X-User-Id': str(user_id)}
+            stored = self.client.get('/api/reports/nightly', headers=headers).get_json()
+            self.assertEqual(stored['run']['id'], run.id)
+            self.assertEqual(stored['analytics'], self.client.get('/api/analytics', headers=headers).get_json())
+            for name, url in (('health_score', '/api/health-score'),
+                              ('budget_recommendations', '/api/budget-recommendations'),
+                              ('category_performance', '/api/category-performance')):
+                self.assertEqual(stored[name], self.client.get(url, headers=headers).get_json(), name)
+        
+        empty = self.client.get('/api/reports/nightly', headers={'X-User-Id': '3'}).get_json()
+        self.assertEqual(empty['budget_recommendations'], {'recommendations': []})
+        self.assertEqual(self.client.get('/api/reports/nightly', headers={'X-User-Id': '4'}).status_code, 404)
+    
+    def test_interrupted_run_is_resumed(self):
+        _seed([1, 2, 3, 4, 5], count=20)
+        with self.assertRaises(KeyboardInterrupt):
+            reports.run_nightly(app, chunk_size=2, as_of=date(2024, 1, 1), progress=_interrupt)
+        interrupted = ReportRun.query.one()
+        self.assertEqual((interrupted.status, interrupted.users_done), ('running', 2))
+        
+        seen = []
+        run = reports.run_nightly(app, chunk_size=2, progress=lambda run, rate: seen.append(run.users_done))
+        self.assertEqual(run.id, interrupted.id)
+        # The resumed run keeps the day it was started for and only computes the rest
+        self.assertEqual(run.as_of, '2024-01-01')
+        self.assertEqual(seen, [4, 5])
+        self.assertEqual(sorted(user_id for (user_id,) in db.session.query(UserReport.user_id)), [1, 2, 3, 4, 5])
+    
+    def test_restart_and_pruning(self):
+        _seed([1], count=20)
+        with self.assertRaises(KeyboardInterrupt):
+            reports.run_nightly(app, progress=_interrupt)
+        
+        runs = [reports.run_nightly(app, restart=True).id for _ in range(reports.REPORT_RUNS_KEEP + 1)]
+        self.assertEqual([run.id for run in ReportRun.query.order_by(ReportRun.id)], runs[1:])
+        self.assertEqual(UserReport.query.count(), reports.REPORT_RUNS_KEEP)
+
+class ProcessPoolTestCase(unittest.TestCase):
+    
+    def test_pool_matches_inline_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pool_app = create_app({'TESTING': True,
+                                   'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'reports.db')}"})
+            with pool_app.app_context():
+                initialize_database()
+                _seed([1, 2, 3, 4, 5], count=50)
+                inline = reports.run_nightly(pool_app, workers=1, as_of=date(2024, 6, 1)).id
+                pooled = reports.run_nightly(pool_app, workers=2, chunk_size=2, as_of=date(2024, 6, 1)).id
+                
+                bodies = {}
+                for report in UserReport.query.all():
+                    bodies.setdefault(report.run_id, {})[report.user_id] = json.loads(report.body)
+                self.assertEqual(len(bodies[pooled]), 5)
+                self.assertEqual(bodies[pooled], bodies[inline])
+                db.session.remove()
+                db.engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
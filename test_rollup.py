@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+
+from rollup import Rollup, period_starts, range_report
+
+ROWS = [
+    ('Food', '2023-12-31', 50.0, 1, 50.0, 50.0),
+    ('Food', '2024-01-01', 10.0, 1, 10.0, 10.0),
+    ('Food', '2024-01-15', 30.0, 2, 5.0, 25.0),
+    ('Travel', '2024-02-10', 100.0, 1, 100.0, 100.0),
+    ('', '2024-03-31', 7.0, 1, 7.0, 7.0),
+]
+
+class RollupTestCase(unittest.TestCase):
+    
+    def test_period_starts(self):
+        self.assertEqual([str(d) for d in period_starts('2024-01-10', '2024-01-22', 'week')],
+                         ['2024-01-08', '2024-01-15', '2024-01-22'])
+        self.assertEqual([str(d) for d in period_starts('2024-02-10', '2024-11-01', 'quarter')],
+                         ['2024-01-01', '2024-04-01', '2024-07-01', '2024-10-01'])
+        self.assertEqual([str(d) for d in period_starts('2024-01-31', '2024-03-01', 'month')],
+                         ['2024-01-01', '2024-02-01', '2024-03-01'])
+    
+    def test_window_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        days = np.datetime64('2024-01-01') + rng.integers(0, 200, size=2000)
+        categories = rng.choice(['A', 'B', 'C', ''], size=2000)
+        amounts = np.round(rng.uniform(1, 100, size=2000), 2)
+        buckets = {}
+        for category, day, amount in zip(categories, days, amounts):
+            total, count, low, high = buckets.get((category, str(day)), (0.0, 0, np.inf, -np.inf))
+            buckets[(category, str(day))] = (total + amount, count + 1, min(low, amount), max(high, amount))
+        rollup = Rollup.from_rows([key + value for key, value in buckets.items()])
+        
+        for _ in range(50):
+            start, end = sorted(np.datetime64('2023-12-01') + rng.integers(0, 260, size=2))
+            mask = (days >= start) & (days <= end)
+            totals, counts = rollup.window(start, end)
+            self.assertAlmostEqual(totals.sum(), amounts[mask].sum(), places=6)
+            self.assertEqual(counts.sum(), mask.sum())
+            report = range_report(rollup, start, end, grouping='week')
+            self.assertEqual(sum(p['count'] for p in report['periods']), mask.sum())
+            if mask.any():
+                self.assertEqual(report['min'], amounts[mask].min())
+                self.assertEqual(report['max'], amounts[mask].max())
+    
+    def test_report_groups_and_compares(self):
+        report = range_report(Rollup.from_rows(ROWS), '2024-01-10', '2024-03-31', grouping='month', compare='previous')
+        self.assertEqual(report['total'], 137.0)
+        self.assertEqual(report['count'], 4)
+        self.assertEqual(report['min'], 5.0)
+        # Uncategorized spending counts in the totals but not per category
+        self.assertEqual(set(report['categories']), {'Food', 'Travel'})
+        
+        periods = report['periods']
+        self.assertEqual([(p['start'], p['end']) for p in periods],
+                         [('2024-01-10', '2024-01-31'), ('2024-02-01', '2024-02-29'), ('2024-03-01', '2024-03-31')])
+        self.assertEqual([p['total'] for p in periods], [30.0, 100.0, 7.0])
+        # January is compared with the whole of December
+        self.assertEqual(periods[0]['change'], -20.0)
+        self.assertEqual(periods[1]['change_pct'], 233.33)
+        
+        comparison = report['comparison']
+        self.assertEqual((comparison['from'], comparison['to']), ('2023-10-20', '2024-01-09'))
+        self.assertEqual(comparison['total'], 60.0)
+        self.assertEqual(comparison['change'], 77.0)
+        self.assertIsNone(comparison['categories']['Travel']['change_pct'])
+    
+    def test_year_comparison_and_empty_rollup(self):
+        report = range_report(Rollup.from_rows(ROWS), '2024-12-31', '2025-01-01', compare='year')
+        self.assertEqual((report['comparison']['from'], report['comparison']['to']), ('2023-12-31', '2024-01-01'))
+        self.assertEqual(report['comparison']['total'], 60.0)
+        
+        empty = range_report(Rollup.from_rows([]), '2024-01-01', '2024-01-31', grouping='week')
+        self.assertEqual(empty['total'], 0.0)
+        self.assertIsNone(empty['min'])
+        self.assertEqual(len(empty['periods']), 5)
+        
+        with self.assertRaises(ValueError):
+            range_report(Rollup.from_rows(ROWS), '0001-01-01', '0001-03-01', compare='year')
+    
+    def test_far_dated_spending_adds_one_column(self):
+        rollup = Rollup.from_rows(ROWS + [('Food', '9999-12-31', 5.0, 1, 5.0, 5.0)])
+        self.assertEqual(rollup.totals.shape, (3, 6))
+        self.assertEqual((str(rollup.start), str(rollup.end)), ('2023-12-31', '9999-12-31'))
+        totals, counts = rollup.window('2024-01-02', '9999-12-31')
+        self.assertEqual((totals.sum(), counts.sum()), (142.0, 5))
+        report = range_report(rollup, '9999-10-01', '9999-12-31', grouping='month')
+        self.assertEqual([p['max'] for p in report['periods']], [None, None, 5.0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import gzip
+import json
+import unittest
+from datetime import date
+
+import numpy as np
+
+import serialization
+from app import create_app, db
+
+app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+VALUES = {
+    'ids': np.arange(3, dtype=np.int64)[::-1],
+    'amounts': np.array([1.5, 2.25], dtype=np.float32),
+    'dates': np.array(['2024-01-31T12:00:00', '2024-02-01T00:00:00.5'], dtype='datetime64[ms]'),
+    'day': np.datetime64('2024-03-01'),
+    'missing': np.datetime64('NaT'),
+    'count': np.int16(7),
+    'flag': np.bool_(True),
+    'grid': np.zeros((2, 2), dtype=np.uint8),
+    'created': date(2024, 1, 2),
+}
+
+EXPECTED = {
+    'ids': [2, 1, 0],
+    'amounts': [1.5, 2.25],
+    'dates': ['2024-01-31T12:00:00', '2024-02-01T00:00:00.500000'],
+    'day': '2024-03-01T00:00:00',
+    'missing': None,
+    'count': 7,
+    'flag': True,
+    'grid': [[0, 0], [0, 0]],
+    # Python dates keep Flask's format
+    'created': 'Tue, 02 Jan 2024 00:00:00 GMT',
+}
+
+class ProviderTestCase(unittest.TestCase):
+    
+    def test_backends_encode_numpy_values_alike(self):
+        backends = ['stdlib'] + (['orjson'] if serialization.orjson_available() else [])
+        for backend in backends:
+            provider = serialization.create_provider(create_app({'TESTING': True, 'JSON_BACKEND': backend}))
+            self.assertEqual(json.loads(provider.dumps(VALUES)), EXPECTED, backend)
+            self.assertEqual(json.loads(provider.response(VALUES).get_data()), EXPECTED, backend)
+    
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_app({'TESTING': True, 'JSON_BACKEND': 'simplejson'})
+
+class CompressionTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        db.create_all()
+        app.extensions['response_cache'].clear()
+        self.client = app.test_client()
+        batch = [{'amount': 10.0 + i, 'merchant': 'Store %d' % i, 'date': '2024-01-%02d' % (i % 28 + 1)}
+                 for i in range(50)]
+        self.client.post('/api/transactions/batch', json=batch)
+    
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+    
+    def test_large_responses_are_compressed(self):
+        plain = self.client.get('/api/transactions')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        
+        compressed = self.client.get('/api/transactions', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed.headers['Vary'])
+        self.assertIn('compress;dur=', compressed.headers['Server-Timing'])
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        
+        # The compressed representation gets a weak ETag that still revalidates
+        etag = compressed.headers['ETag']
+        self.assertEqual(etag, 'W/' + plain.headers['ETag'])
+        self.assertEqual(self.client.get('/api/transactions', headers={'If-None-Match': etag}).status_code, 304)
+        
+        small = self.client.get('/api/transactions?limit=1', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', small.headers)
+    
+    def test_compression_can_be_disabled(self):
+        app.config['COMPRESS_MIN_BYTES'] = 0
+        try:
+            response = self.client.get('/api/transactions', headers={'Accept-Encoding': 'gzip'})
+        finally:
+            app.config['COMPRESS_MIN_BYTES'] = 1024
+        self.assertNotIn('Content-Encoding', response.headers)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import tempfile
+import unittest
+
+from sqlalchemy import text
+
+from app import create_app, db, ml_models
+from model_store import ModelStore
+import shards
+
+app = create_app({
+    'TESTING': True,
+    'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    'SHARD_COUNT': 2,
+    'SHARD_DATABASE_URL': 'sqlite://',
+    'TRUST_USER_HEADER': True,
+})
+
+class ShardedAppTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.model_dir = tempfile.TemporaryDirectory()
+        ml_models.use_store(ModelStore(self.model_dir.name))
+        app.extensions['response_cache'].clear()
+        with app.app_context():
+            shards.ensure_schemas()
+
+    def tearDown(self):
+        with app.app_context():
+            for shard in range(app.config['SHARD_COUNT']):
+                db.metadata.drop_all(bind=shards.engine_for_shard(shard))
+            db.drop_all()
+        self.model_dir.cleanup()
+
+    def _post(self, user_id, amount, merchant):
+        return self.client.post('/api/transactions', headers={'X-User-Id': str(user_id)},
+                                data=json.dumps({'amount': amount, 'merchant': merchant, 'date': '2024-01-02'}),
+                                content_type='application/json')
+
+    def _get(self, user_id, url):
+        return json.loads(self.client.get(url, headers={'X-User-Id': str(user_id)}).data)
+
+    def test_rows_land_on_the_users_shard(self):
+        self._post(2, 10.0, 'Even')
+        self._post(3, 20.0, 'Odd')
+        self._post(5, 30.0, 'Odd too')
+
+        with app.app_context():
+            counts = {}
+            for shard in range(2):
+                engine = shards.engine_for_shard(shard)
+                with engine.connect() as conn:
+                    counts[shard] = dict(conn.execute(text(
+                        'SELECT user_id, COUNT(*) FROM "transaction" GROUP BY user_id')).all())
+            main_tables = set(db.inspect(db.engine).get_table_names())
+        self.assertEqual(counts, {0: {2: 1}, 1: {3: 1, 5: 1}})
+        self.assertNotIn('transaction', main_tables)
+
+    def test_endpoints_only_see_the_requesting_user(self):
+        self._post(3, 20.0, 'Odd')
+        self._post(5, 30.0, 'Odd too')
+        self._post(5, 40.0, 'Odd too')
+
+        self.assertEqual([t['merchant'] for t in self._get(3, '/api/transactions')], ['Odd'])
+        self.assertEqual(self._get(5, '/api/analytics')['total_transactions'], 2)
+        self.assertEqual(self._get(3, '/api/analytics')['total_transactions'], 1)
+        self.assertEqual(self._get(7, '/api/transactions'), [])
+
+    def test_invalid_user_header(self):
+        response = self.client.get('/api/analytics', headers={'X-User-Id': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', json.loads(response.data))
+
+    def test_cli_commands_cover_every_shard(self):
+        runner = app.test_cli_runner()
+        for user_id in (1, 2):
+            result = runner.invoke(args=['seed-sample-data', '--count', '50', '--user-id', str(user_id)])
+            self.assertEqual(result.exit_code, 0, result.output)
+
+        result = runner.invoke(args=['rebuild-aggregates'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('matches', result.output)
+        self.assertEqual(self._get(1, '/api/analytics')['total_transactions'], 50)
+        self.assertEqual(self._get(2, '/api/analytics')['total_transactions'], 50)
+
+if __name__ == '__main__':
+    unittest.main()
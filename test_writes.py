@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app import create_app, db, Transaction
+import aggregates
+import engine_profile
+
+
+def _row(amount, merchant='Test', user_id=1):
+    return {'amount': amount, 'merchant': merchant, 'category': 'Shopping', 'date': datetime(2024, 1, 2),
+            'description': '', 'user_id': user_id, 'anomaly_score': None, 'is_anomaly': None}
+
+
+class WriteQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmp.name, 'test.db')}",
+            'MODEL_DIR': os.path.join(self.tmp.name, 'models'),
+            'CACHE_BACKEND': 'none',
+            'WRITE_QUEUE_ENABLED': True,
+        })
+        self.queue = self.app.extensions['write_queue']
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_profile_pragmas_applied(self):
+        with self.app.app_context(), db.engine.connect() as conn:
+            self.assertEqual(conn.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+            self.assertEqual(conn.execute(text('PRAGMA busy_timeout')).scalar(), 5000)
+        with self.assertRaises(ValueError):
+            engine_profile.pragmas({'DATABASE_PROFILE': 'fast'})
+
+    def test_concurrent_posts_share_commits(self):
+        client = self.app.test_client()
+        barrier = threading.Barrier(16)
+        statuses = []
+
+        def post(i):
+            barrier.wait()
+            response = client.post('/api/transactions', data=json.dumps(
+                {'amount': 10.0 + i, 'merchant': 'Store', 'date': '2024-01-02'}), content_type='application/json')
+            statuses.append(response.status_code)
+
+        threads = [threading.Thread(target=post, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses, [200] * 16)
+        self.assertEqual(self.queue.batches, 16)
+        self.assertLessEqual(self.queue.commits, 16)
+        with self.app.app_context():
+            self.assertEqual(Transaction.query.count(), 16)
+            self.assertEqual(aggregates.verify(db.session), [])
+
+    def test_failed_batch_does_not_fail_its_group(self):
+        # Queue three batches before the writer starts so they are grouped
+        from concurrent.futures import Future
+        futures = [Future() for _ in range(3)]
+        for future, rows in zip(futures, ([_row(1.0)], [_row(2.0, merchant=None)], [_row(3.0), _row(4.0)])):
+            self.queue._queue.put((1, rows, future))
+        self.queue._ensure_started()
+
+        self.assertEqual(len(futures[0].result(timeout=5)), 1)
+        self.assertRaises(IntegrityError, futures[1].result, timeout=5)
+        self.assertEqual(len(futures[2].result(timeout=5)), 2)
+        with self.app.app_context():
+            self.assertEqual(sorted(t.amount for t in Transaction.query), [1.0, 3.0, 4.0])
+
+if __name__ == '__main__':
+    unittest.main()